@@ -0,0 +1,67 @@
+"""Measure package import time and enforce a regression budget.
+
+Usage:
+    python benchmarks/bench_import_time.py [--budget-ms 30] [--repeat 5]
+
+Runs ``python -X importtime`` in fresh interpreters for a bare ``import
+pgsql_upserter`` and for first use of the main entry point, and reports the best
+cumulative time of the package. Exits with status 1 when the bare import exceeds
+the budget, so it can run as a CI check.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+STATEMENTS = {
+    'import pgsql_upserter': "import pgsql_upserter",
+    'first use (execute_upsert_workflow)': "import pgsql_upserter; pgsql_upserter.execute_upsert_workflow",
+}
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _import_times(statement: str) -> tuple[float, list[tuple[float, str]]]:
+    """Run statement under -X importtime; returns (package ms, top-level modules by cumulative ms)."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               capture_output=True, text=True, check=True)
+    total_us = 0
+    top_level = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            top_level.append((cumulative_us / 1000, module))
+            if module.split('.')[0] == 'pgsql_upserter':
+                total_us += cumulative_us
+    return total_us / 1000, top_level
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=30.0, help="budget for the bare package import")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    results = {}
+    for label, statement in STATEMENTS.items():
+        runs = [_import_times(statement) for _ in range(args.repeat)]
+        best_ms, top_level = min(runs, key=lambda run: run[0])
+        results[label] = best_ms
+        print(f"{label:>38}: {best_ms:7.1f} ms")
+        for module_ms, module in sorted(top_level, reverse=True)[:args.top]:
+            print(f"{'':>40}{module_ms:7.1f} ms  {module}")
+
+    bare_ms = results['import pgsql_upserter']
+    if bare_ms > args.budget_ms:
+        print(f"FAIL: import pgsql_upserter took {bare_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+        sys.exit(1)
+    print(f"OK: import pgsql_upserter within {args.budget_ms:.1f} ms budget")
+
+
+if __name__ == '__main__':
+    main()
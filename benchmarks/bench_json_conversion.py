@@ -0,0 +1,66 @@
+"""Measure client-side conversion cost of JSON-heavy rows.
+
+Usage:
+    python benchmarks/bench_json_conversion.py [--rows 20000] [--items 50]
+
+Runs without a database: times the staging conversion of rows with one dict and
+one JSON-string jsonb column, for each available JSON backend, with and without
+trusting the JSON-string column.
+"""
+
+import argparse
+import json
+import time
+
+from pgsql_upserter import json_codec
+from pgsql_upserter.temp_staging import _convert_rows, _serialize_copy_chunk
+
+COLUMN_TYPES = {'id': 'integer', 'payload': 'jsonb', 'payload_text': 'jsonb'}
+COLUMNS = list(COLUMN_TYPES)
+
+
+def _make_rows(count: int, items: int) -> list[dict]:
+    document = {
+        'creative': {'title': 'Summer sale', 'tags': ['a', 'b', 'c']},
+        'assets': [{'id': i, 'url': f"https://cdn.example.com/{i}.png", 'w': 1080, 'h': 1080} for i in range(items)],
+    }
+    text = json.dumps(document)
+    return [{'id': i, 'payload': document, 'payload_text': text} for i in range(count)]
+
+
+def _best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--items', type=int, default=50, help="assets per JSON document")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = _make_rows(args.rows, args.items)
+    original_backend = json_codec.get_backend()
+    backends = [name for name in json_codec.JSON_BACKENDS if name == 'json' or original_backend == 'orjson']
+
+    try:
+        for backend in backends:
+            json_codec.set_backend(backend)
+            for trusted in ((), ('payload_text',)):
+                convert = _best_of(args.repeat, lambda: _convert_rows(rows, COLUMNS, COLUMN_TYPES, trusted))
+                serialize = _best_of(args.repeat, lambda: _serialize_copy_chunk(
+                    rows, COLUMNS, COLUMN_TYPES, trusted_json_columns=trusted))
+                label = f"{backend}{' + trusted' if trusted else ''}"
+                print(f"{label:>16}: convert {convert:.3f}s ({args.rows / convert:,.0f} rows/s), "
+                      f"convert+COPY serialize {serialize:.3f}s ({args.rows / serialize:,.0f} rows/s)")
+    finally:
+        json_codec.set_backend(original_backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare INSERT...ON CONFLICT and MERGE execution strategies.
+
+Usage:
+    python benchmarks/bench_merge_vs_on_conflict.py [--rows 100000] [--repeat 3]
+
+Connects with the usual PG* environment variables and creates (and drops)
+a scratch table ``pgsql_upserter_bench``. MERGE requires PostgreSQL 15+.
+"""
+
+import argparse
+import logging
+import time
+
+from pgsql_upserter.config import create_connection_from_env
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+BENCH_TABLE = "pgsql_upserter_bench"
+
+
+def _make_rows(count: int, offset: int) -> list[dict]:
+    return [
+        {
+            'account_id': str(i % 1000),
+            'campaign_id': f"camp_{i}",
+            'date_start': '2025-08-31',
+            'impressions': i * 10,
+            'clicks': i,
+            'spend': i / 100,
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def _reset_table(connection) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            DROP TABLE IF EXISTS {BENCH_TABLE};
+            CREATE TABLE {BENCH_TABLE} (
+                account_id text,
+                campaign_id text,
+                date_start date,
+                impressions bigint,
+                clicks bigint,
+                spend numeric,
+                UNIQUE (campaign_id, date_start)
+            )
+        """)
+    connection.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger('pgsql_upserter').setLevel(logging.WARNING)
+    connection = create_connection_from_env()
+
+    # Half of each batch updates existing rows, half inserts new ones
+    seed_rows = _make_rows(args.rows, 0)
+    batch_rows = _make_rows(args.rows, args.rows // 2)
+
+    try:
+        for strategy in ('on_conflict', 'merge'):
+            timings = []
+            for _ in range(args.repeat):
+                _reset_table(connection)
+                execute_upsert_workflow(connection, seed_rows, BENCH_TABLE, execution_strategy=strategy)
+
+                start = time.perf_counter()
+                result = execute_upsert_workflow(connection, batch_rows, BENCH_TABLE, execution_strategy=strategy)
+                timings.append(time.perf_counter() - start)
+
+            best = min(timings)
+            print(f"{strategy:>12}: best {best:.3f}s over {args.repeat} runs "
+                  f"({args.rows / best:,.0f} rows/s; {result.rows_inserted} inserted, "
+                  f"{result.rows_updated} updated)")
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        connection.commit()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Compare round-trip-bound upsert paths under simulated network latency.
+
+Usage:
+    python benchmarks/bench_pipeline_latency.py [--rows 1000] [--repeat 5] [--rtt-ms 0 2 10 40]
+
+Connects through a local TCP proxy that delays traffic in both directions by
+half the round-trip time, standing in for ``tc netem`` (which needs root). The
+proxy forwards to the server given by the usual PG* environment variables (a
+Unix socket directory in PGHOST works); user, database and password are taken
+from the environment by libpq. Creates (and drops) a scratch table
+``pgsql_upserter_bench``.
+
+Compared paths: the statement-by-statement workflow, the workflow with
+``server_routine=True`` and the psycopg 3 pipeline backend (skipped when psycopg
+is not installed). All of them use a cached plan.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import threading
+import time
+
+import psycopg2
+
+from pgsql_upserter.plan_cache import build_plan
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+BENCH_TABLE = "pgsql_upserter_bench"
+
+
+class LatencyProxy:
+    """TCP proxy delaying every chunk by ``delay`` seconds in each direction, preserving order."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        started = threading.Event()
+        threading.Thread(target=self._serve, args=(started,), daemon=True).start()
+        started.wait()
+
+    def _serve(self, started: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    async def _open_upstream(self):
+        host = os.environ.get('PGHOST', 'localhost')
+        port = os.environ.get('PGPORT', '5432')
+        if host.startswith('/'):
+            return await asyncio.open_unix_connection(f"{host}/.s.PGSQL.{port}")
+        return await asyncio.open_connection(host, int(port))
+
+    async def _pipe(self, reader, writer) -> None:
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        async def send() -> None:
+            while (item := await chunks.get()) is not None:
+                deadline, data = item
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.ensure_future(send())
+        try:
+            while data := await reader.read(65536):
+                chunks.put_nowait((time.monotonic() + self.delay, data))
+        finally:
+            chunks.put_nowait(None)
+            await sender
+
+    async def _handle(self, client_reader, client_writer) -> None:
+        upstream_reader, upstream_writer = await self._open_upstream()
+        try:
+            await asyncio.gather(self._pipe(client_reader, upstream_writer),
+                                 self._pipe(upstream_reader, client_writer),
+                                 return_exceptions=True)
+        except asyncio.CancelledError:
+            pass
+
+    async def _shutdown(self) -> None:
+        self.server.close()
+        # Closed client connections drain within the delay; cut off anything left
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.delay + 1)
+            for task in pending:
+                task.cancel()
+
+    def close(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def _make_rows(count: int, offset: int) -> list[dict]:
+    return [
+        {
+            'campaign_id': f"camp_{i}",
+            'date_start': '2025-08-31',
+            'impressions': i * 10,
+            'clicks': i,
+            'spend': i / 100,
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def _reset_table(connection) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            DROP TABLE IF EXISTS {BENCH_TABLE};
+            CREATE TABLE {BENCH_TABLE} (
+                campaign_id text,
+                date_start date,
+                impressions bigint,
+                clicks bigint,
+                spend numeric,
+                PRIMARY KEY (campaign_id, date_start)
+            )
+        """)
+    connection.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rtt-ms', type=float, nargs='+', default=[0, 2, 10, 40])
+    args = parser.parse_args()
+
+    logging.getLogger('pgsql_upserter').setLevel(logging.WARNING)
+    try:
+        import psycopg
+        from pgsql_upserter.pipeline import execute_pipelined_upsert
+    except ImportError:
+        psycopg = None
+        print("psycopg 3 is not installed, skipping the pipeline backend")
+
+    # Half of each batch updates existing rows, half inserts new ones
+    batch_rows = _make_rows(args.rows, args.rows // 2)
+
+    for rtt_ms in args.rtt_ms:
+        proxy = LatencyProxy(rtt_ms / 2000)
+        conninfo = {'host': '127.0.0.1', 'port': proxy.port, 'sslmode': 'disable'}
+        connection = psycopg2.connect(**conninfo)
+        paths = {
+            'statements': lambda plan: execute_upsert_workflow(
+                connection, batch_rows, BENCH_TABLE, plan=plan, initial_load='never'),
+            'server_routine': lambda plan: execute_upsert_workflow(
+                connection, batch_rows, BENCH_TABLE, plan=plan, initial_load='never', server_routine=True),
+        }
+        if psycopg is not None:
+            pipeline_connection = psycopg.connect(**conninfo)
+            paths['pipeline'] = lambda plan: execute_pipelined_upsert(
+                pipeline_connection, batch_rows, BENCH_TABLE, plan=plan)
+
+        try:
+            for name, run in paths.items():
+                timings = []
+                for _ in range(args.repeat):
+                    _reset_table(connection)
+                    execute_upsert_workflow(connection, _make_rows(args.rows, 0), BENCH_TABLE)
+                    plan = build_plan(connection, BENCH_TABLE)
+                    connection.commit()
+
+                    start = time.perf_counter()
+                    result = run(plan)
+                    timings.append(time.perf_counter() - start)
+
+                print(f"rtt {rtt_ms:>5.1f}ms {name:>15}: median {statistics.median(timings) * 1000:8.1f}ms "
+                      f"over {args.repeat} runs ({result.rows_inserted} inserted, {result.rows_updated} updated)")
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            connection.commit()
+            connection.close()
+            if psycopg is not None:
+                pipeline_connection.close()
+            proxy.close()
+
+
+if __name__ == '__main__':
+    main()
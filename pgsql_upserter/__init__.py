@@ -1,77 +1,244 @@
-"""PostgreSQL dynamic upsert utility with automatic schema introspection."""
+"""PostgreSQL dynamic upsert utility with automatic schema introspection.
 
+Importing the package has no side effects: public names are resolved from their
+submodules on first access, no ``.env`` file is read and no logging handler is
+installed. Call ``configure_logging()`` for the package's console output.
+"""
+
+import importlib
 import logging
 
-from .config import create_connection_from_env, test_connection, validate_permissions
-from .schema_inspector import inspect_table_schema, TableSchema, ColumnInfo, UniqueConstraint
-from .column_matcher import match_columns
-from .temp_staging import create_temp_table, bulk_insert_to_temp, populate_temp_table, convert_temp_to_permanent
-from .conflict_resolver import (
-    find_conflict_strategy,
-    deduplicate_temp_table,
-    execute_upsert,
-    ConflictStrategy,
-    DeduplicationResult
-)
-from .upsert_engine import (
-    UpsertEngine,
-    UpsertResult,
-    read_csv_to_dict_list,
-)
 from .exceptions import (
     PgsqlUpserterError,
     ConnectionError,
     PermissionError,
     TableNotFoundError,
-    SchemaIntrospectionError
+    SchemaIntrospectionError,
+    ConcurrencyError,
+    ChunkedLoadError
 )
 
-# Configure package-level logging
-_package_logger = logging.getLogger(__name__)
-_package_logger.setLevel(logging.INFO)
+TYPE_CHECKING = False  # Recognized by type checkers, avoids importing typing at runtime
+if TYPE_CHECKING:
+    from .config import create_connection_from_env, test_connection, validate_permissions, load_env
+    from .schema_inspector import (
+        inspect_table_schema,
+        TableSchema,
+        ColumnInfo,
+        UniqueConstraint,
+        UniqueIndex,
+        PartitionInfo,
+    )
+    from .column_matcher import match_columns, IncrementalColumnMatcher
+    from .temp_staging import (
+        create_temp_table,
+        bulk_insert_to_temp,
+        populate_temp_table,
+        pipelined_insert_to_temp,
+        convert_temp_to_permanent,
+    )
+    from .conflict_resolver import (
+        find_conflict_strategy,
+        find_arbiter_index,
+        deduplicate_temp_table,
+        execute_upsert,
+        ConflictStrategy,
+        DeduplicationResult
+    )
+    from .plan_cache import UpsertPlan, get_plan, load_plan, save_plan
+    from .dry_run import DryRunReport, ExplainResult
+    from .quarantine import QuarantineResult, quarantine_stage
+    from .watermark import WatermarkFilter, read_watermarks
+    from .initial_load import load_into_empty_table
+    from .index_deferral import restore_deferred_indexes
+    from .session_tuning import TUNING_PROFILES
+    from .buffered import BufferedUpserter, BufferStats
+    from .server_routine import ServerRoutine, build_server_routine, drop_server_routines, run_server_routine
+    from .pipeline import execute_pipelined_upsert
+    from .upsert_engine import (
+        UpsertEngine,
+        UpsertResult,
+        execute_upsert_workflow,
+        read_csv_to_dict_list,
+    )
+    from .retry import RetryPolicy
+    from .durable_staging import purge_checkpoints
+    from .deadline import ContinuationToken, DeadlinePolicy
+    from .throttle import LoadSample, ThrottleDecision, ThrottlePolicy, sample_load
+
+# Public name -> submodule defining it, imported on first attribute access
+_LAZY_ATTRIBUTES = {
+    'create_connection_from_env': 'config',
+    'test_connection': 'config',
+    'validate_permissions': 'config',
+    'load_env': 'config',
+    'inspect_table_schema': 'schema_inspector',
+    'TableSchema': 'schema_inspector',
+    'ColumnInfo': 'schema_inspector',
+    'UniqueConstraint': 'schema_inspector',
+    'UniqueIndex': 'schema_inspector',
+    'PartitionInfo': 'schema_inspector',
+    'match_columns': 'column_matcher',
+    'IncrementalColumnMatcher': 'column_matcher',
+    'create_temp_table': 'temp_staging',
+    'bulk_insert_to_temp': 'temp_staging',
+    'populate_temp_table': 'temp_staging',
+    'pipelined_insert_to_temp': 'temp_staging',
+    'convert_temp_to_permanent': 'temp_staging',
+    'find_conflict_strategy': 'conflict_resolver',
+    'find_arbiter_index': 'conflict_resolver',
+    'deduplicate_temp_table': 'conflict_resolver',
+    'execute_upsert': 'conflict_resolver',
+    'ConflictStrategy': 'conflict_resolver',
+    'DeduplicationResult': 'conflict_resolver',
+    'UpsertPlan': 'plan_cache',
+    'get_plan': 'plan_cache',
+    'load_plan': 'plan_cache',
+    'save_plan': 'plan_cache',
+    'DryRunReport': 'dry_run',
+    'ExplainResult': 'dry_run',
+    'QuarantineResult': 'quarantine',
+    'quarantine_stage': 'quarantine',
+    'WatermarkFilter': 'watermark',
+    'read_watermarks': 'watermark',
+    'load_into_empty_table': 'initial_load',
+    'restore_deferred_indexes': 'index_deferral',
+    'TUNING_PROFILES': 'session_tuning',
+    'BufferedUpserter': 'buffered',
+    'BufferStats': 'buffered',
+    'ServerRoutine': 'server_routine',
+    'build_server_routine': 'server_routine',
+    'run_server_routine': 'server_routine',
+    'drop_server_routines': 'server_routine',
+    'execute_pipelined_upsert': 'pipeline',
+    'UpsertEngine': 'upsert_engine',
+    'UpsertResult': 'upsert_engine',
+    'execute_upsert_workflow': 'upsert_engine',
+    'read_csv_to_dict_list': 'upsert_engine',
+    'RetryPolicy': 'retry',
+    'purge_checkpoints': 'durable_staging',
+    'ContinuationToken': 'deadline',
+    'DeadlinePolicy': 'deadline',
+    'LoadSample': 'throttle',
+    'ThrottleDecision': 'throttle',
+    'ThrottlePolicy': 'throttle',
+    'sample_load': 'throttle',
+}
+
+# Library logging: silent unless the application (or configure_logging) sets it up
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # Later lookups bypass __getattr__
+    return value
+
 
-# Create console handler if no handlers exist
-if not _package_logger.handlers and not _package_logger.parent.handlers:  # type: ignore
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    _package_logger.addHandler(console_handler)
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
-# Disable propagation to prevent duplicate messages when external logging is configured
-_package_logger.propagate = False
+
+def configure_logging(level: int = logging.INFO) -> logging.Logger:
+    """Send package log messages to the console.
+
+    Installs a ``levelname - message`` stream handler on the package logger (once)
+    and stops propagation, so messages are not duplicated by root handlers.
+
+    Args:
+        level: Logging level of the package logger and its handler
+
+    Returns:
+        logging.Logger: The package logger
+    """
+    package_logger = logging.getLogger(__name__)
+    package_logger.setLevel(level)
+
+    console_handler = next((h for h in package_logger.handlers if getattr(h, '_pgsql_upserter', False)), None)
+    if console_handler is None:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+        console_handler._pgsql_upserter = True  # type: ignore[attr-defined]
+        package_logger.addHandler(console_handler)
+    console_handler.setLevel(level)
+
+    package_logger.propagate = False
+    return package_logger
 
 
 __all__ = [
     # Main API - Upsert Engine
     'UpsertEngine',
     'UpsertResult',
+    'execute_upsert_workflow',
     'read_csv_to_dict_list',
+    'BufferedUpserter',
 
     # Connection utilities
     'create_connection_from_env',
     'test_connection',
     'validate_permissions',
+    'load_env',
+    'configure_logging',
 
     # Lower-level components
     'inspect_table_schema',
     'match_columns',
+    'IncrementalColumnMatcher',
     'create_temp_table',
     'populate_temp_table',
     'bulk_insert_to_temp',
+    'pipelined_insert_to_temp',
     'convert_temp_to_permanent',
+    'quarantine_stage',
+    'read_watermarks',
+    'load_into_empty_table',
+    'restore_deferred_indexes',
+    'build_server_routine',
+    'run_server_routine',
+    'drop_server_routines',
+    'execute_pipelined_upsert',
+    'sample_load',
+    'purge_checkpoints',
 
     # Conflict resolution components
     'find_conflict_strategy',
+    'find_arbiter_index',
     'deduplicate_temp_table',
     'execute_upsert',
 
+    # Session tuning
+    'TUNING_PROFILES',
+
+    # Plan caching
+    'get_plan',
+    'load_plan',
+    'save_plan',
+
     # Data classes
     'TableSchema',
     'ColumnInfo',
     'UniqueConstraint',
+    'UniqueIndex',
+    'PartitionInfo',
     'ConflictStrategy',
     'DeduplicationResult',
+    'RetryPolicy',
+    'UpsertPlan',
+    'DryRunReport',
+    'ExplainResult',
+    'QuarantineResult',
+    'WatermarkFilter',
+    'BufferStats',
+    'ServerRoutine',
+    'ContinuationToken',
+    'DeadlinePolicy',
+    'ThrottlePolicy',
+    'ThrottleDecision',
+    'LoadSample',
 
     # Exceptions
     'PgsqlUpserterError',
@@ -79,4 +246,6 @@ __all__ = [
     'PermissionError',
     'TableNotFoundError',
     'SchemaIntrospectionError',
+    'ConcurrencyError',
+    'ChunkedLoadError',
 ]
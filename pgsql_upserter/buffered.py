@@ -0,0 +1,462 @@
+"""Long-lived buffered upserter for high-frequency micro-batches.
+
+Calling ``execute_upsert_workflow`` for a handful of rows many times per second
+pays for schema validation, temp-table DDL and a commit on every call.
+``BufferedUpserter`` accepts rows per target table and coalesces them in memory
+on the conflict key: a row whose key is already buffered is merged into the
+buffered row field by field, later values winning. Rows are flushed in one
+upsert per distinct set of keys, so every call only updates the columns its rows
+carry and the table ends up as if the rows had been applied one call at a time
+(a row never overwrites a column it lacks with NULL).
+
+A background thread flushes every buffered table, one upsert per key set, when the
+buffer reaches ``max_rows`` or ``max_bytes``, when its oldest row is ``max_age``
+seconds old, or on ``flush()``/``close()``. Rows keep arriving into a fresh
+buffer while a flush runs; once that buffer reaches ``max_buffered_rows``
+(flushing has fallen behind), ``add()`` blocks until the flush completes.
+
+A failed flush keeps its rows, merged under any newer ones, and is retried after
+``max_age``; ``flush()`` and ``close()`` raise the error. After
+``max_flush_attempts`` consecutive failures a table's rows are handed to the
+``dead_letter`` callback (or logged) and dropped, so a permanently failing table
+cannot block ``add()`` forever.
+"""
+
+import logging
+import threading
+import time
+import psycopg2
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from .plan_cache import UpsertPlan, get_plan
+from .conflict_resolver import find_conflict_strategy
+from .temp_staging import _build_column_type_map
+from .initial_load import conflict_key
+from .upsert_engine import UpsertResult, execute_upsert_workflow
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BufferStats:
+    """Counters of a BufferedUpserter since it was created."""
+    rows_received: int = 0
+    rows_coalesced: int = 0  # Merged into an already buffered row with the same conflict key
+    rows_flushed: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    flushes: int = 0
+    flush_failures: int = 0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    total_flush_seconds: float = 0.0
+    backpressure_waits: int = 0
+    backpressure_seconds: float = 0.0
+    rows_dead_lettered: int = 0  # Dropped after max_flush_attempts failed flushes
+
+    @property
+    def mean_flush_seconds(self) -> float:
+        return self.total_flush_seconds / self.flushes if self.flushes else 0.0
+
+
+@dataclass
+class _TableBuffer:
+    """Buffered rows of one target table."""
+    keyed: dict[tuple[str, ...], dict[str, Any]] = field(default_factory=dict)
+    unkeyed: list[dict[str, Any]] = field(default_factory=list)  # No conflict key, or part of it NULL
+    sizes: dict[tuple[str, ...], int] = field(default_factory=dict)
+    attempts: int = 0  # Consecutive failed flushes of requeued rows
+
+    @property
+    def rows(self) -> list[dict[str, Any]]:
+        return [*self.keyed.values(), *self.unkeyed]
+
+
+@dataclass
+class _TableInfo:
+    plan: UpsertPlan
+    conflict_columns: list[str]
+    column_type_map: dict[str, str]
+
+
+def _estimate_row_bytes(row: dict[str, Any]) -> int:
+    """Rough size of a row as sent to the server."""
+    return sum(len(str(value)) + 1 for value in row.values())
+
+
+def _group_by_columns(rows: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Split rows into groups with the same key set, in order of first appearance."""
+    groups: dict[frozenset[str], list[dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    return list(groups.values())
+
+
+class BufferedUpserter:
+    """Coalesce micro-batches per table in memory and upsert them from a background thread.
+
+    Example:
+        >>> with BufferedUpserter(conn, max_rows=5000, max_age=0.5) as upserter:
+        ...     for event in events:
+        ...         upserter.add('ads_metrics', event['rows'])
+        >>> print(upserter.stats.rows_coalesced, upserter.stats.mean_flush_seconds)
+
+    The connection is used by the flush thread only (and briefly to read the
+    schema of a table on its first ``add()``); do not use it elsewhere while the
+    upserter is open. ``close()`` does not close it.
+    """
+
+    def __init__(
+        self,
+        connection: psycopg2.extensions.connection,
+        max_rows: int = 5000,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_age: float = 1.0,
+        max_buffered_rows: int | None = None,
+        backpressure_timeout: float | None = None,
+        conflict_columns: dict[str, list[str]] | None = None,
+        schema: str = 'public',
+        max_flush_attempts: int | None = 5,
+        dead_letter: Callable[[str, list[dict[str, Any]], BaseException], None] | None = None,
+        **upsert_options: Any
+    ):
+        """Start the flush thread.
+
+        Args:
+            connection: PostgreSQL connection dedicated to the upserter
+            max_rows: Flush once this many (coalesced) rows are buffered
+            max_bytes: Flush once the buffered rows reach about this many bytes
+            max_age: Flush once the oldest buffered row is this many seconds old
+            max_buffered_rows: Block ``add()`` while this many rows are buffered
+                behind a running flush (default: 4 * max_rows)
+            backpressure_timeout: Seconds ``add()`` waits for room before raising
+                PgsqlUpserterError (default: wait indefinitely)
+            conflict_columns: Conflict columns per table; detected from the table's
+                unique indexes and the first rows added when omitted
+            schema: Schema of the target tables (default: 'public')
+            max_flush_attempts: Consecutive failed flushes after which a table's
+                buffered rows are dead-lettered and dropped (None: retry forever)
+            dead_letter: Called from the flush thread as dead_letter(table, rows,
+                error) with the dropped rows; they are only logged when omitted
+            **upsert_options: Passed to execute_upsert_workflow on every flush
+                (e.g. session_profile='latency')
+        """
+        if max_rows < 1 or max_bytes < 1 or max_age <= 0:
+            raise ValueError("max_rows, max_bytes and max_age must be positive")
+        if max_flush_attempts is not None and max_flush_attempts < 1:
+            raise ValueError("max_flush_attempts must be positive")
+        if 'plan' in upsert_options or 'dry_run' in upsert_options or 'load_id' in upsert_options:
+            raise ValueError("plan, dry_run and load_id cannot be used with a BufferedUpserter")
+
+        self.connection = connection
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_buffered_rows = max(max_buffered_rows or 4 * max_rows, max_rows)
+        self.backpressure_timeout = backpressure_timeout
+        self.schema = schema
+        self.max_flush_attempts = max_flush_attempts
+        self.dead_letter = dead_letter
+        self.upsert_options = upsert_options
+        self._conflict_columns = dict(conflict_columns or {})
+
+        self._stats = BufferStats()
+        self._tables: dict[str, _TableInfo] = {}
+        self._buffers: dict[str, _TableBuffer] = {}
+        self._buffered_rows = 0
+        self._buffered_bytes = 0
+        self._oldest_row_at: float | None = None
+        self._retry_at = 0.0
+
+        # Explicit flushes are numbered; the thread records the last one each cycle covered
+        self._flush_requests = 0
+        self._flushed_upto = 0
+        self._failed_upto = 0
+        self._last_error: BaseException | None = None
+        self._closing = False
+
+        self._condition = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="pgsql_upserter-buffer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'BufferedUpserter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def stats(self) -> BufferStats:
+        """Snapshot of the counters."""
+        with self._condition:
+            return replace(self._stats)
+
+    @property
+    def buffered_rows(self) -> int:
+        with self._condition:
+            return self._buffered_rows
+
+    def add(self, target_table: str, rows: Iterable[dict[str, Any]]) -> None:
+        """Buffer rows for a target table, coalescing them on its conflict key.
+
+        Blocks while flushing has fallen behind (see max_buffered_rows).
+
+        Raises:
+            PgsqlUpserterError: If the upserter is closed, the table cannot be
+                inspected or no room frees up within backpressure_timeout
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        table = self._tables.get(target_table) or self._register_table(target_table, rows)
+
+        with self._condition:
+            if self._closing:
+                raise PgsqlUpserterError("BufferedUpserter is closed")
+            self._wait_for_room()
+
+            buffer = self._buffers.setdefault(target_table, _TableBuffer())
+            for row in rows:
+                self._buffer_row(buffer, table, row)
+            self._stats.rows_received += len(rows)
+            if self._oldest_row_at is None:
+                # Start the age timer of the flush thread
+                self._oldest_row_at = time.monotonic()
+                self._condition.notify_all()
+            elif self._buffered_rows >= self.max_rows or self._buffered_bytes >= self.max_bytes:
+                self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Flush everything added so far and wait for it to be written.
+
+        Raises:
+            PgsqlUpserterError: If the flush fails or does not finish within timeout
+        """
+        with self._condition:
+            if not self._thread.is_alive():
+                raise PgsqlUpserterError("BufferedUpserter is closed")
+            self._flush_requests += 1
+            request = self._flush_requests
+            self._condition.notify_all()
+            finished = self._condition.wait_for(
+                lambda: self._flushed_upto >= request or self._failed_upto >= request, timeout)
+            if not finished:
+                raise PgsqlUpserterError(f"Flush did not finish within {timeout}s")
+            if self._flushed_upto < request:
+                raise PgsqlUpserterError(f"Flush failed: {self._last_error}") from self._last_error
+
+    def close(self, timeout: float | None = None) -> None:
+        """Flush the remaining rows and stop the flush thread.
+
+        Raises:
+            PgsqlUpserterError: If the final flush fails; its rows are not written
+        """
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+        with self._condition:
+            if self._buffered_rows:
+                raise PgsqlUpserterError(
+                    f"BufferedUpserter closed with {self._buffered_rows} rows not written: "
+                    f"{self._last_error}") from self._last_error
+
+    def _register_table(self, target_table: str, rows: list[dict[str, Any]]) -> _TableInfo:
+        """Read the table plan and pick the conflict key rows are coalesced on."""
+        with self._db_lock:
+            try:
+                plan = get_plan(self.connection, target_table, self.schema)
+                self.connection.commit()
+            except PgsqlUpserterError:
+                self.connection.rollback()
+                raise
+            except psycopg2.Error as e:
+                self.connection.rollback()
+                raise PgsqlUpserterError(f"Failed to inspect '{self.schema}.{target_table}': {e}") from e
+        return self._update_table(target_table, plan, rows)
+
+    def _update_table(self, target_table: str, plan: UpsertPlan, rows: list[dict[str, Any]]) -> _TableInfo:
+        conflict_columns = self._conflict_columns.get(target_table)
+        if conflict_columns is None:
+            present = {key for row in rows[:100] for key in row}
+            matched = [col for col in plan.table_schema.valid_columns if col in present]
+            conflict_columns = find_conflict_strategy(plan.table_schema, matched).columns
+        table = _TableInfo(
+            plan=plan,
+            conflict_columns=conflict_columns,
+            column_type_map=_build_column_type_map(conflict_columns, plan.table_schema)
+        )
+        self._tables[target_table] = table
+        return table
+
+    def _buffer_row(self, buffer: _TableBuffer, table: _TableInfo, row: dict[str, Any]) -> None:
+        key = conflict_key(row, table.conflict_columns, table.column_type_map) if table.conflict_columns else None
+        if key is None:
+            buffer.unkeyed.append(row)
+            size = _estimate_row_bytes(row)
+            self._buffered_rows += 1
+            self._buffered_bytes += size
+            return
+
+        existing = buffer.keyed.get(key)
+        if existing is None:
+            buffer.keyed[key] = dict(row)
+            size = _estimate_row_bytes(row)
+            self._buffered_rows += 1
+        else:
+            existing.update(row)
+            size = _estimate_row_bytes(existing)
+            self._buffered_bytes -= buffer.sizes[key]
+            self._stats.rows_coalesced += 1
+        buffer.sizes[key] = size
+        self._buffered_bytes += size
+
+    def _wait_for_room(self) -> None:
+        """Wait (releasing the condition) while the buffer behind a running flush is full."""
+        if self._buffered_rows < self.max_buffered_rows:
+            return
+        start = time.monotonic()
+        self._stats.backpressure_waits += 1
+        self._condition.notify_all()
+        has_room = self._condition.wait_for(
+            lambda: self._buffered_rows < self.max_buffered_rows or self._closing, self.backpressure_timeout)
+        self._stats.backpressure_seconds += time.monotonic() - start
+        if not has_room:
+            raise PgsqlUpserterError(f"Buffer still holds {self._buffered_rows} rows after "
+                                     f"{self.backpressure_timeout}s; flushing cannot keep up")
+        if self._closing:
+            raise PgsqlUpserterError("BufferedUpserter is closed")
+
+    def _seconds_until_due(self) -> float | None:
+        """Seconds until the next flush is due (0 for now), or None when idle."""
+        now = time.monotonic()
+        if self._flush_requests > max(self._flushed_upto, self._failed_upto) or self._closing:
+            return 0.0
+        if not self._buffered_rows:
+            return None
+        due = max(self._oldest_row_at + self.max_age, self._retry_at)
+        if self._buffered_rows >= self.max_rows or self._buffered_bytes >= self.max_bytes:
+            due = self._retry_at
+        return max(0.0, due - now)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while (wait := self._seconds_until_due()) != 0.0:
+                    self._condition.wait(wait)
+                if self._closing and not self._buffered_rows:
+                    self._flushed_upto = self._flush_requests
+                    self._condition.notify_all()
+                    return
+
+                buffers, self._buffers = self._buffers, {}
+                self._buffered_rows = self._buffered_bytes = 0
+                self._oldest_row_at = None
+                covered = self._flush_requests
+                closing = self._closing
+                # Room for new rows while this batch is written
+                self._condition.notify_all()
+
+            failed, error, seconds, results = self._flush_buffers(buffers)
+            dead = {}
+            if self.max_flush_attempts is not None:
+                dead = {table: buffer for table, buffer in failed.items()
+                        if buffer.attempts >= self.max_flush_attempts}
+                for target_table, buffer in dead.items():
+                    del failed[target_table]
+                    self._dead_letter(target_table, buffer.rows, error)
+
+            with self._condition:
+                self._stats.flushes += 1
+                self._stats.last_flush_seconds = seconds
+                self._stats.max_flush_seconds = max(self._stats.max_flush_seconds, seconds)
+                self._stats.total_flush_seconds += seconds
+                for row_count, result in results:
+                    self._stats.rows_flushed += row_count
+                    self._stats.rows_inserted += result.rows_inserted
+                    self._stats.rows_updated += result.rows_updated
+
+                self._stats.rows_dead_lettered += sum(len(buffer.rows) for buffer in dead.values())
+                if failed or dead:
+                    self._stats.flush_failures += 1
+                    self._last_error = error
+                    self._failed_upto = covered
+                    self._retry_at = time.monotonic() + self.max_age
+                    self._requeue(failed)
+                else:
+                    self._flushed_upto = covered
+                self._condition.notify_all()
+
+                if closing:
+                    return
+
+    def _flush_buffers(
+        self,
+        buffers: dict[str, _TableBuffer]
+    ) -> tuple[dict[str, _TableBuffer], BaseException | None, float, list[tuple[int, UpsertResult]]]:
+        """Upsert each buffered table, one call per key set.
+
+        Returns:
+            Tuple of (buffers of the rows that failed, last error, seconds, results)
+        """
+        start = time.perf_counter()
+        failed, error, results = {}, None, []
+        for target_table, buffer in buffers.items():
+            for rows in _group_by_columns(buffer.rows):
+                try:
+                    with self._db_lock:
+                        table = self._tables[target_table]
+                        plan = get_plan(self.connection, target_table, self.schema, table.plan)
+                        if plan is not table.plan:
+                            self._update_table(target_table, plan, rows)
+                        result = execute_upsert_workflow(
+                            self.connection,
+                            rows,
+                            target_table,
+                            conflict_columns=self._conflict_columns.get(target_table),
+                            schema=self.schema,
+                            plan=plan,
+                            **self.upsert_options
+                        )
+                    results.append((len(rows), result))
+                    logger.debug(f"Flushed {len(rows)} buffered rows into '{self.schema}.{target_table}'")
+                except Exception as e:
+                    try:
+                        self.connection.rollback()
+                    except psycopg2.Error:
+                        pass
+                    logger.warning(f"Failed to flush {len(rows)} buffered rows into "
+                                   f"'{self.schema}.{target_table}': {e}")
+                    # Groups are disjoint on the conflict key, so only the failed ones are retried
+                    retry = failed.setdefault(target_table, _TableBuffer(attempts=buffer.attempts + 1))
+                    retry.unkeyed.extend(rows)
+                    error = e
+        return failed, error, time.perf_counter() - start, results
+
+    def _dead_letter(self, target_table: str, rows: list[dict[str, Any]], error: BaseException | None) -> None:
+        logger.error(f"Dropping {len(rows)} buffered rows for '{self.schema}.{target_table}' after "
+                     f"{self.max_flush_attempts} failed flushes: {error}")
+        if self.dead_letter is not None:
+            try:
+                self.dead_letter(target_table, rows, error)
+            except Exception as e:
+                logger.error(f"Dead-letter callback failed for '{self.schema}.{target_table}': {e}")
+
+    def _requeue(self, failed: dict[str, _TableBuffer]) -> None:
+        """Put the rows of a failed flush back, under any rows added since."""
+        newer = self._buffers
+        self._buffers = {}
+        self._buffered_rows = self._buffered_bytes = 0
+        for target_table, buffer in [*failed.items(), *newer.items()]:
+            table = self._tables[target_table]
+            merged = self._buffers.setdefault(target_table, _TableBuffer())
+            merged.attempts = max(merged.attempts, buffer.attempts)
+            for row in buffer.rows:
+                self._buffer_row(merged, table, row)
+        self._oldest_row_at = time.monotonic() - self.max_age if self._buffered_rows else None
@@ -1,20 +1,157 @@
 """Column matching utilities for PostgreSQL upsert operations."""
 
 import logging
+from collections.abc import Iterable, Iterator
 from typing import Any
 
 from .schema_inspector import TableSchema
 
 logger = logging.getLogger(__name__)
 
+NEW_COLUMN_MODES = ('widen', 'report')
+
+
+class IncrementalColumnMatcher:
+    """Match data keys against a table schema as rows stream through.
+
+    The column plan is built from the target schema and whatever rows are observed
+    first (typically a sampled prefix). Keys first seen later are detected on the
+    fly: in "widen" mode, keys matching a table column are appended to
+    ``matched_columns`` so subsequent batches stage them; in "report" mode they are
+    only recorded in ``late_columns`` and ``missing_columns``.
+
+    Keys are matched case-insensitively through a lowercase index of the table
+    columns computed once. Rows whose keys differ in case from the table columns
+    are re-keyed by ``track()``.
+
+    ``staged_columns`` is ``matched_columns`` plus staging-only ``extra_columns``
+    (e.g. a delete flag the table does not have). Both lists are updated in place,
+    so a staging function holding them sees widened columns on its next batch.
+    """
+
+    def __init__(
+        self,
+        table_schema: TableSchema,
+        ignore_columns: list[str] | None = None,
+        on_new_columns: str = 'widen',
+        extra_columns: list[str] | None = None
+    ):
+        if on_new_columns not in NEW_COLUMN_MODES:
+            raise ValueError(f"Invalid on_new_columns: {on_new_columns!r}")
+
+        self.table_schema = table_schema
+        self.on_new_columns = on_new_columns
+
+        # Get valid table columns (excludes auto-generated), indexed by lowercase name
+        self._table_index = {col.lower(): col for col in table_schema.valid_columns}
+
+        # Normalize ignore_columns to lowercase (PostgreSQL standard), plus auto-generated columns
+        self._ignore_set = {col.lower() for col in ignore_columns or []}
+        self._ignore_set.update(col.name.lower() for col in table_schema.columns if col.is_auto_generated)
+
+        self.matched_columns: list[str] = []
+        self.staged_columns: list[str] = list(extra_columns or [])
+        self.ignored_columns: list[str] = []
+        self.missing_columns: list[str] = []
+        self.late_columns: list[str] = []
+        self.column_map: dict[str, str] = {}  # table column -> data key
+        self._seen_keys: set[str] = set(self.staged_columns)
+        self._renames: dict[str, str] = {}  # data key -> table column, where they differ
+        self._unstaged: set[str] = set()  # late table columns left out in "report" mode
+        self._plan_fixed = False
+
+    def _classify(self, key: str) -> None:
+        """Categorize a data key seen for the first time."""
+        self._seen_keys.add(key)
+        key_lower = key.lower()
+
+        # Check if column should be ignored
+        if key_lower in self._ignore_set:
+            self.ignored_columns.append(key)
+            return
+
+        table_column = self._table_index.get(key_lower)
+        if table_column is None:
+            self.missing_columns.append(key)
+            logger.debug(f"Column '{key}' does not exist in table "
+                         f"'{self.table_schema.schema_name}.{self.table_schema.table_name}'")
+            return
+
+        if table_column in self._unstaged:
+            self.missing_columns.append(key)
+            return
+
+        if table_column in self.column_map:
+            # Another key already matched this column (e.g. 'Spend' and 'spend'): an alias
+            if key != table_column:
+                self._renames[key] = table_column
+            logger.debug(f"Column '{key}' is an alias of '{self.column_map.get(table_column, table_column)}'")
+            return
+
+        if self._plan_fixed:
+            self.late_columns.append(key)
+            if self.on_new_columns == 'report':
+                self.missing_columns.append(key)
+                self._unstaged.add(table_column)
+                logger.warning(f"Column '{key}' first appeared after the column plan was fixed, not staged")
+                return
+            logger.info(f"Column '{key}' first appeared after the column plan was fixed, staging it from now on")
+
+        self.column_map[table_column] = key
+        self.matched_columns.append(table_column)
+        self.staged_columns.append(table_column)
+        if key != table_column:
+            self._renames[key] = table_column
+
+    def observe(self, row: dict[str, Any]) -> None:
+        """Record the keys of one row."""
+        if self._seen_keys.issuperset(row):
+            return
+        for key in row:
+            if key not in self._seen_keys:
+                self._classify(key)
+
+    def observe_rows(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Record the keys of several rows (e.g. the sampled prefix)."""
+        for row in rows:
+            self.observe(row)
+
+    def fix_plan(self) -> None:
+        """Mark the column plan as fixed; keys seen afterwards count as late columns."""
+        self._plan_fixed = True
+
+    def track(self, rows: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """Yield rows while detecting unseen keys, re-keyed to table column names if needed."""
+        self.fix_plan()
+        observe = self.observe
+        renames = self._renames
+        for row in rows:
+            observe(row)
+            if renames and not renames.keys().isdisjoint(row):
+                row = {renames.get(key, key): value for key, value in row.items()}
+            yield row
+
+    def result(self) -> dict[str, Any]:
+        """Current matching result in the same shape as ``match_columns``."""
+        return {
+            'matched_columns': list(self.matched_columns),
+            'ignored_columns': list(self.ignored_columns),
+            'missing_columns': list(self.missing_columns),
+            'column_map': dict(self.column_map)
+        }
+
 
 def match_columns(
     data_list: list[dict[str, Any]],
     table_schema: TableSchema,
     ignore_columns: list[str] | None = None
-) -> dict[str, list[str]]:
+) -> dict[str, Any]:
     """Match data columns against table schema with union approach.
 
+    Data keys match table columns case-insensitively; ``matched_columns`` holds the
+    table column names and ``column_map`` maps each of them to its data key. Pass
+    both to bulk_insert_to_temp/pipelined_insert_to_temp, which read rows by data key.
+
     Args:
         data_list: List of dictionaries containing data to be inserted
         table_schema: Table schema information from schema inspector
@@ -22,62 +159,13 @@ def match_columns(
 
     Returns:
         Dict with keys: matched_columns, ignored_columns, missing_columns
-        Each containing respective lists of column names
+        Each containing respective lists of column names, plus column_map
     """
-    # Handle edge cases
-    if not data_list:
-        return {
-            'matched_columns': [],
-            'ignored_columns': [],
-            'missing_columns': []
-        }
-
-    # Collect all unique keys from entire data_list
-    all_data_columns = set()
-    for row in data_list:
-        all_data_columns.update(row.keys())
-
-    # Convert to list for consistent ordering
-    all_data_columns = list(all_data_columns)
+    matcher = IncrementalColumnMatcher(table_schema, ignore_columns)
+    matcher.observe_rows(data_list)
+    result = matcher.result()
 
-    # Get valid table columns (excludes auto-generated)
-    valid_table_columns = set(table_schema.valid_columns)
+    logger.debug(f"Column matching results: {len(result['matched_columns'])} matched, "
+                 f"{len(result['ignored_columns'])} ignored, {len(result['missing_columns'])} missing")
 
-    # Normalize ignore_columns to lowercase (PostgreSQL standard)
-    ignore_set = set()
-    if ignore_columns:
-        ignore_set = {col.lower() for col in ignore_columns}
-
-    # Add auto-generated columns to ignore_set
-    auto_gen_columns = [col.name for col in table_schema.columns if col.is_auto_generated]
-    ignore_set.update(col for col in auto_gen_columns)
-
-    # Categorize columns
-    matched_columns = []
-    ignored_columns = []
-    missing_columns = []
-
-    for col in all_data_columns:
-        col_lower = col.lower()
-
-        # Check if column should be ignored
-        if col_lower in ignore_set:
-            ignored_columns.append(col)
-            continue
-
-        # Check if column exists in table schema
-        if col in valid_table_columns:
-            matched_columns.append(col)
-        else:
-            missing_columns.append(col)
-            logger.debug(
-                f"Column '{col}' does not exist in table '{table_schema.schema_name}.{table_schema.table_name}'")
-
-    logger.debug(f"Column matching results: {len(matched_columns)} matched, "
-                 f"{len(ignored_columns)} ignored, {len(missing_columns)} missing")
-
-    return {
-        'matched_columns': matched_columns,
-        'ignored_columns': ignored_columns,
-        'missing_columns': missing_columns
-    }
+    return result
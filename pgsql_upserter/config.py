@@ -4,19 +4,41 @@ import logging
 import os
 import psycopg2
 
-from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
 
 from .exceptions import ConnectionError, PermissionError
 
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
+_env_loaded = False
+
+
+def load_env(dotenv_path: str | None = None, override: bool = False) -> bool:
+    """Load connection variables from a ``.env`` file into the environment.
+
+    Not done at import time: ``create_connection_from_env`` calls it once, and
+    applications may call it explicitly (e.g. with a specific path).
 
-def create_connection_from_env():
+    Args:
+        dotenv_path: Path of the .env file; located by python-dotenv's default search when omitted
+        override: Whether .env values replace variables already set
+
+    Returns:
+        bool: Whether a .env file was found and loaded
+    """
+    global _env_loaded
+    from dotenv import load_dotenv
+
+    _env_loaded = True
+    return load_dotenv(dotenv_path, override=override)
+
+
+def create_connection_from_env(use_dotenv: bool = True):
     """Create PostgreSQL connection from environment variables.
 
+    Variables from a ``.env`` file are loaded on the first call unless use_dotenv
+    is False or ``load_env`` was already called.
+
     Expected environment variables:
     - PGHOST (default: localhost)
     - PGPORT (default: 5432)
@@ -24,12 +46,18 @@ def create_connection_from_env():
     - PGUSER (required)
     - PGPASSWORD (required)
 
+    Args:
+        use_dotenv: Whether to load a .env file (once) before reading the environment
+
     Returns:
         psycopg2.connection: Active database connection
 
     Raises:
         ConnectionError: If connection fails
     """
+    if use_dotenv and not _env_loaded:
+        load_env()
+
     try:
         connection_params = {
             'host': os.getenv('PGHOST', 'localhost'),
@@ -4,19 +4,24 @@ import logging
 
 from dataclasses import dataclass
 
-from .schema_inspector import TableSchema
+from .schema_inspector import TableSchema, UniqueIndex
 from .exceptions import PgsqlUpserterError
 
 # Configure module logger
 logger = logging.getLogger(__name__)
 
+# MERGE was added in PostgreSQL 15 (connection.server_version format)
+MERGE_MIN_SERVER_VERSION = 150000
+
 
 @dataclass
 class ConflictStrategy:
     """Represents a conflict resolution strategy."""
-    type: str  # "PRIMARY_KEY", "UNIQUE_COMBINED", "INSERT_ONLY"
+    type: str  # "PRIMARY_KEY", "UNIQUE_INDEX", "USER_DEFINED", "INSERT_ONLY"
     columns: list[str]  # Column names for conflict resolution
     description: str  # Human-readable description
+    index_name: str | None = None  # Arbiter index, when known
+    index_predicate: str | None = None  # Partial index predicate for ON CONFLICT ... WHERE
 
 
 @dataclass
@@ -28,6 +33,61 @@ class DeduplicationResult:
     dropped_reasons: dict[str, int]  # reason -> count mapping
 
 
+def build_deduplication_result(original_count: int, null_count: int, deduplicated_count: int) -> DeduplicationResult:
+    """Result of dropping rows with NULL or empty keys and keeping one row per key."""
+    duplicate_count = original_count - null_count - deduplicated_count
+    dropped_reasons = {}
+    if null_count > 0:
+        dropped_reasons["null_or_empty_conflict_columns"] = null_count
+    if duplicate_count > 0:
+        dropped_reasons["duplicate_conflict_keys"] = duplicate_count
+    return DeduplicationResult(
+        original_count=original_count,
+        deduplicated_count=deduplicated_count,
+        dropped_count=original_count - deduplicated_count,
+        dropped_reasons=dropped_reasons
+    )
+
+
+def _arbiter_candidates(table_schema: TableSchema) -> list[UniqueIndex]:
+    """Unique indexes usable as arbiters, falling back to unique constraints.
+
+    Schemas built without index introspection only carry constraints, which are
+    always backed by a full (non-partial) unique index of the same columns.
+    """
+    if table_schema.unique_indexes:
+        return table_schema.unique_indexes
+    return [
+        UniqueIndex(name=uc.name, columns=uc.columns, is_primary=uc.is_primary, predicate=None, size_bytes=0)
+        for uc in table_schema.unique_constraints
+    ]
+
+
+def _arbiter_sort_key(index: UniqueIndex) -> tuple:
+    """Order arbiters from cheapest to most expensive conflict check.
+
+    Full indexes beat partial ones (which only arbitrate rows matching the
+    predicate), then fewer key columns, then the primary key, then smaller size.
+    """
+    return (index.is_partial, len(index.columns), not index.is_primary, index.size_bytes, index.name)
+
+
+def find_arbiter_index(table_schema: TableSchema, columns: list[str]) -> UniqueIndex | None:
+    """Find the unique index whose key columns are exactly the given columns.
+
+    ``INSERT ... ON CONFLICT`` can only infer an arbiter index whose column set
+    equals the conflict target, so this decides whether ON CONFLICT is usable.
+
+    Returns:
+        The cheapest matching index, or None if no unique index matches
+    """
+    if not columns:
+        return None
+    target = set(columns)
+    matches = [idx for idx in _arbiter_candidates(table_schema) if set(idx.columns) == target]
+    return min(matches, key=_arbiter_sort_key, default=None)
+
+
 def find_conflict_strategy(
     table_schema: TableSchema,
     matched_columns: list[str]
@@ -35,10 +95,11 @@ def find_conflict_strategy(
     """
     Determine the best conflict resolution strategy based on table schema and available columns.
 
-    Priority:
-    1. Non-auto-generated primary key(s) - highest priority
-    2. All unique constraints combined - medium priority
-    3. Simple insert only - fallback
+    Every valid unique index (primary key, unique constraint or standalone unique
+    index, including partial ones) whose key columns are all present in the data
+    is a usable arbiter. Among those, the narrowest and cheapest one wins:
+    full indexes before partial ones, fewer columns first, then the primary key,
+    then the smallest index. Falls back to a simple insert when none is usable.
 
     Args:
         table_schema: Table schema information
@@ -56,53 +117,96 @@ def find_conflict_strategy(
     # Convert matched_columns to set for faster lookup
     available_columns = set(matched_columns)
 
-    # Strategy 1: Check for non-auto-generated primary key
-    if table_schema.primary_key:
-        pk_columns = table_schema.primary_key.columns
-        # Check if all PK columns are available in matched_columns
-        pk_available = all(col in available_columns for col in pk_columns)
-
-        if pk_available:
-            strategy = ConflictStrategy(
-                type="PRIMARY_KEY",
-                columns=pk_columns,
-                description=f"Primary key conflict resolution on: {pk_columns}"
-            )
-            logger.debug(f"Using PRIMARY_KEY strategy: {strategy.description}")
-            return strategy
-        else:
-            missing_pk_cols = [col for col in pk_columns if col not in available_columns]
-            logger.warning(f"Primary key columns not available in data: {missing_pk_cols}")
+    usable_indexes = [
+        idx for idx in _arbiter_candidates(table_schema)
+        if all(col in available_columns for col in idx.columns)
+    ]
 
-    # Strategy 2: Combine all unique constraints (union approach)
-    all_unique_columns = []
-    for constraint in table_schema.unique_constraints:
-        # Only include constraint columns that are available in matched_columns
-        available_constraint_cols = [col for col in constraint.columns if col in available_columns]
-        all_unique_columns.extend(available_constraint_cols)
+    if table_schema.primary_key and not any(idx.is_primary for idx in usable_indexes):
+        missing_pk_cols = [col for col in table_schema.primary_key.columns if col not in available_columns]
+        logger.warning(f"Primary key columns not available in data: {missing_pk_cols}")
 
-    # Remove duplicates
-    unique_columns = list(set(all_unique_columns))
+    if usable_indexes:
+        arbiter = min(usable_indexes, key=_arbiter_sort_key)
+        if arbiter.is_primary:
+            strategy_type = "PRIMARY_KEY"
+            description = f"Primary key conflict resolution on: {arbiter.columns}"
+        else:
+            strategy_type = "UNIQUE_INDEX"
+            description = f"Unique index '{arbiter.name}' conflict resolution on: {arbiter.columns}"
+            if arbiter.is_partial:
+                description += f" WHERE {arbiter.predicate}"
 
-    if unique_columns:
         strategy = ConflictStrategy(
-            type="UNIQUE_COMBINED",
-            columns=unique_columns,
-            description=f"Combined unique constraints conflict resolution on: {unique_columns}"
+            type=strategy_type,
+            columns=list(arbiter.columns),
+            description=description,
+            index_name=arbiter.name,
+            index_predicate=arbiter.predicate
         )
-        logger.debug(f"Using UNIQUE_COMBINED strategy: {strategy.description}")
+        logger.debug(f"Using {strategy_type} strategy: {strategy.description} "
+                     f"(chosen from {len(usable_indexes)} usable arbiter indexes)")
         return strategy
 
-    # Strategy 3: Fallback to INSERT only
+    # Fallback to INSERT only
     strategy = ConflictStrategy(
         type="INSERT_ONLY",
         columns=[],
-        description="No conflict resolution - INSERT only (no unique constraints found)"
+        description="No conflict resolution - INSERT only (no usable unique index found)"
     )
     logger.warning(f"Fallback to INSERT_ONLY strategy: {strategy.description}")
     return strategy
 
 
+def build_null_key_condition(cursor, temp_table_name: str, conflict_columns: list[str]) -> str:
+    """Condition matching staged rows with a NULL (or empty text) conflict column."""
+    # We need to handle text columns differently from other types
+    cursor.execute(f"""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = '{temp_table_name.split('.')[-1]}'
+          AND column_name = ANY(%s)
+    """, (conflict_columns,))
+
+    column_types = {row[0]: row[1] for row in cursor.fetchall()}
+
+    null_conditions = []
+    for col in conflict_columns:
+        if col in column_types:
+            data_type = column_types[col]
+            if data_type in ('text', 'varchar', 'character varying', 'char'):
+                # For text columns, check both NULL and empty string
+                null_conditions.append(f"({col} IS NULL OR {col} = '')")
+            else:
+                # For other types (date, numeric, etc.), only check NULL
+                null_conditions.append(f"{col} IS NULL")
+        else:
+            # Fallback: assume text type
+            null_conditions.append(f"({col} IS NULL OR {col} = '')")
+
+    null_where_clause = " OR ".join(null_conditions)
+    return null_where_clause
+
+
+def build_deduplication_sql(temp_table_name: str, conflict_columns: list[str], null_where_clause: str) -> str:
+    """SELECT keeping the last staged row per conflict key and skipping NULL keys.
+
+    The result carries an extra ``rn`` column.
+    """
+    return f"""
+        SELECT * FROM (
+            SELECT *,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {", ".join(conflict_columns)}
+                       ORDER BY ctid DESC
+                   ) as rn
+            FROM {temp_table_name}
+            WHERE NOT ({null_where_clause})
+        ) ranked
+        WHERE rn = 1
+    """
+
+
 def deduplicate_temp_table(
     connection,
     temp_table_name: str,
@@ -146,31 +250,7 @@ def deduplicate_temp_table(
             cleaned_table_name = f"{temp_table_name}_cleaned"
 
             # Step 1: Build NULL checking conditions for conflict columns
-            # We need to handle text columns differently from other types
-            cursor.execute(f"""
-                SELECT column_name, data_type
-                FROM information_schema.columns
-                WHERE table_name = '{temp_table_name.split('.')[-1]}'
-                  AND column_name = ANY(%s)
-            """, (conflict_columns,))
-
-            column_types = {row[0]: row[1] for row in cursor.fetchall()}
-
-            null_conditions = []
-            for col in conflict_columns:
-                if col in column_types:
-                    data_type = column_types[col]
-                    if data_type in ('text', 'varchar', 'character varying', 'char'):
-                        # For text columns, check both NULL and empty string
-                        null_conditions.append(f"({col} IS NULL OR {col} = '')")
-                    else:
-                        # For other types (date, numeric, etc.), only check NULL
-                        null_conditions.append(f"{col} IS NULL")
-                else:
-                    # Fallback: assume text type
-                    null_conditions.append(f"({col} IS NULL OR {col} = '')")
-
-            null_where_clause = " OR ".join(null_conditions)
+            null_where_clause = build_null_key_condition(cursor, temp_table_name, conflict_columns)
 
             # Count rows with NULLs before removing
             cursor.execute(f"""
@@ -181,51 +261,23 @@ def deduplicate_temp_table(
             null_count = cursor.fetchone()[0]
 
             # Step 2: Create cleaned table with deduplication (keeping last occurrence)
-            conflict_columns_str = ", ".join(conflict_columns)
-
-            cursor.execute(f"""
-                CREATE TEMP TABLE {cleaned_table_name} AS
-                SELECT * FROM (
-                    SELECT *,
-                           ROW_NUMBER() OVER (
-                               PARTITION BY {conflict_columns_str}
-                               ORDER BY ctid DESC
-                           ) as rn
-                    FROM {temp_table_name}
-                    WHERE NOT ({null_where_clause})
-                ) ranked
-                WHERE rn = 1
-            """)
+            dedup_sql = build_deduplication_sql(temp_table_name, conflict_columns, null_where_clause)
+            cursor.execute(f"CREATE TEMP TABLE {cleaned_table_name} AS {dedup_sql}")
 
             # Get final count
             cursor.execute(f"SELECT COUNT(*) FROM {cleaned_table_name}")
             deduplicated_count = cursor.fetchone()[0]
 
-            # Calculate dropped counts
-            duplicate_count = (original_count - null_count) - deduplicated_count
-            total_dropped = original_count - deduplicated_count
-
-            dropped_reasons = {}
-            if null_count > 0:
-                dropped_reasons["null_or_empty_conflict_columns"] = null_count
-            if duplicate_count > 0:
-                dropped_reasons["duplicate_conflict_keys"] = duplicate_count
-
             # Drop original temp table and rename cleaned table
             cursor.execute(f"DROP TABLE {temp_table_name}")
             cursor.execute(f"ALTER TABLE {cleaned_table_name} DROP COLUMN rn")
             cursor.execute(f"ALTER TABLE {cleaned_table_name} RENAME TO {temp_table_name.split('.')[-1]}")
 
-            result = DeduplicationResult(
-                original_count=original_count,
-                deduplicated_count=deduplicated_count,
-                dropped_count=total_dropped,
-                dropped_reasons=dropped_reasons
-            )
+            result = build_deduplication_result(original_count, null_count, deduplicated_count)
 
             logger.debug(f"Deduplication completed: {original_count} → {deduplicated_count} rows "
-                         f"({total_dropped} dropped)")
-            for reason, count in dropped_reasons.items():
+                         f"({result.dropped_count} dropped)")
+            for reason, count in result.dropped_reasons.items():
                 logger.debug(f"  - {reason}: {count} rows")
 
             return result
@@ -235,6 +287,136 @@ def deduplicate_temp_table(
         raise PgsqlUpserterError(f"Failed to deduplicate temp table: {e}") from e
 
 
+def choose_execution_strategy(
+    connection,
+    table_schema: TableSchema,
+    conflict_strategy: ConflictStrategy,
+    update_only: bool = False,
+    delete_flag_column: str | None = None
+) -> str:
+    """
+    Pick the statement used to apply staged rows: "ON_CONFLICT" or "MERGE".
+
+    ON CONFLICT is preferred whenever it can express the request, since it is
+    concurrency-safe and uses the arbiter index directly. MERGE (PostgreSQL 15+)
+    is chosen when the conflict columns have no matching unique index, or when
+    update-only mode or flagged deletes are requested.
+
+    Args:
+        connection: Database connection (used for the server version)
+        table_schema: Table schema information
+        conflict_strategy: Conflict resolution strategy
+        update_only: Whether unmatched rows should be skipped instead of inserted
+        delete_flag_column: Staged boolean column marking rows to delete
+
+    Returns:
+        "ON_CONFLICT" or "MERGE"
+
+    Raises:
+        PgsqlUpserterError: If MERGE is required but the server does not support it
+    """
+    if conflict_strategy.type == "INSERT_ONLY":
+        return "ON_CONFLICT"
+
+    needs_merge = (
+        update_only
+        or delete_flag_column is not None
+        or find_arbiter_index(table_schema, conflict_strategy.columns) is None
+    )
+    if not needs_merge:
+        return "ON_CONFLICT"
+
+    if connection.server_version < MERGE_MIN_SERVER_VERSION:
+        if update_only or delete_flag_column:
+            raise PgsqlUpserterError(
+                "update_only and delete_flag_column require MERGE (PostgreSQL 15+), "
+                f"server version is {connection.server_version}")
+        logger.warning(f"No unique index on {conflict_strategy.columns} and MERGE is unavailable "
+                       f"(server version {connection.server_version}); using ON CONFLICT")
+        return "ON_CONFLICT"
+
+    return "MERGE"
+
+
+def build_upsert_sql(
+    temp_table_name: str,
+    target_table: str,
+    conflict_strategy: ConflictStrategy,
+    matched_columns: list[str],
+    schema_name: str = 'public'
+) -> str:
+    """Build the INSERT (optionally ...ON CONFLICT) statement applying the temp table."""
+    columns_str = ", ".join(matched_columns)
+
+    if conflict_strategy.type == "INSERT_ONLY":
+        return f"""
+            INSERT INTO {schema_name}.{target_table} ({columns_str})
+            SELECT {columns_str}
+            FROM {temp_table_name}
+        """
+
+    conflict_target = f"({', '.join(conflict_strategy.columns)})"
+    if conflict_strategy.index_predicate:
+        # A partial unique index is only inferred when its predicate is repeated
+        conflict_target += f" WHERE ({conflict_strategy.index_predicate})"
+
+    # Build UPDATE SET clause (matched columns except conflict columns)
+    update_columns = [col for col in matched_columns if col not in conflict_strategy.columns]
+    if update_columns:
+        update_set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in update_columns])
+        conflict_action = f"DO UPDATE SET {update_set_clause}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    # Apply rows in conflict-key order so concurrent writers lock rows in the same order
+    return f"""
+        INSERT INTO {schema_name}.{target_table} ({columns_str})
+        SELECT {columns_str}
+        FROM {temp_table_name}
+        ORDER BY {', '.join(conflict_strategy.columns)}
+        ON CONFLICT {conflict_target}
+        {conflict_action}
+    """
+
+
+def build_merge_sql(
+    temp_table_name: str,
+    target_table: str,
+    match_columns: list[str],
+    matched_columns: list[str],
+    schema_name: str = 'public',
+    update_only: bool = False,
+    delete_flag_column: str | None = None
+) -> str:
+    """Build the MERGE statement applying the temp table to the target table."""
+    on_clause = " AND ".join(f"t.{col} = s.{col}" for col in match_columns)
+    columns = [col for col in matched_columns if col != delete_flag_column]
+    update_columns = [col for col in columns if col not in match_columns]
+
+    when_clauses = []
+    if delete_flag_column:
+        when_clauses.append(f"WHEN MATCHED AND s.{delete_flag_column} THEN DELETE")
+    if update_columns:
+        update_set_clause = ", ".join(f"{col} = s.{col}" for col in update_columns)
+        when_clauses.append(f"WHEN MATCHED THEN UPDATE SET {update_set_clause}")
+    if not update_only:
+        insert_condition = f" AND s.{delete_flag_column} IS NOT TRUE" if delete_flag_column else ""
+        when_clauses.append(
+            f"WHEN NOT MATCHED{insert_condition} THEN INSERT ({', '.join(columns)}) "
+            f"VALUES ({', '.join(f's.{col}' for col in columns)})")
+
+    if not when_clauses:
+        raise PgsqlUpserterError("MERGE has nothing to do: no update columns, inserts or deletes requested")
+
+    when_sql = "\n        ".join(when_clauses)
+    return f"""
+        MERGE INTO {schema_name}.{target_table} AS t
+        USING {temp_table_name} AS s
+        ON {on_clause}
+        {when_sql}
+    """
+
+
 def execute_upsert(
     connection,
     temp_table_name: str,
@@ -263,42 +445,24 @@ def execute_upsert(
     logger.debug(f"Executing upsert from '{temp_table_name}' to '{schema_name}.{target_table}' "
                  f"using {conflict_strategy.type} strategy")
 
+    upsert_sql = build_upsert_sql(temp_table_name, target_table, conflict_strategy, matched_columns, schema_name)
+
     try:
         with connection.cursor() as cursor:
-            # Use matched_columns instead of querying target table columns
-            columns_str = ", ".join(matched_columns)
-
             if conflict_strategy.type == "INSERT_ONLY":
                 # Simple INSERT without conflict resolution
-                cursor.execute(f"""
-                    INSERT INTO {schema_name}.{target_table} ({columns_str})
-                    SELECT {columns_str}
-                    FROM {temp_table_name}
-                """)
+                cursor.execute(upsert_sql)
 
                 rows_affected = cursor.rowcount
                 logger.debug(f"INSERT_ONLY completed: {rows_affected} rows inserted")
                 return rows_affected, 0
 
             else:
-                # INSERT...ON CONFLICT with UPDATE
-                conflict_columns_str = ", ".join(conflict_strategy.columns)
-
-                # Build UPDATE SET clause (matched columns except conflict columns)
-                update_columns = [col for col in matched_columns if col not in conflict_strategy.columns]
-                update_set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in update_columns])
-
                 # Track before counts for calculating inserts vs updates
                 cursor.execute(f"SELECT COUNT(*) FROM {schema_name}.{target_table}")
                 before_count = cursor.fetchone()[0]
 
-                cursor.execute(f"""
-                    INSERT INTO {schema_name}.{target_table} ({columns_str})
-                    SELECT {columns_str}
-                    FROM {temp_table_name}
-                    ON CONFLICT ({conflict_columns_str})
-                    DO UPDATE SET {update_set_clause}
-                """)
+                cursor.execute(upsert_sql)
 
                 # Calculate insert vs update counts
                 cursor.execute(f"SELECT COUNT(*) FROM {schema_name}.{target_table}")
@@ -316,3 +480,82 @@ def execute_upsert(
     except Exception as e:
         logger.error(f"Upsert operation failed: {e}")
         raise PgsqlUpserterError(f"Failed to execute upsert: {e}") from e
+
+
+def execute_merge(
+    connection,
+    temp_table_name: str,
+    target_table: str,
+    match_columns: list[str],
+    matched_columns: list[str],
+    schema_name: str = 'public',
+    update_only: bool = False,
+    delete_flag_column: str | None = None
+) -> tuple[int, int, int]:
+    """
+    Execute the final upsert operation using MERGE (PostgreSQL 15+).
+
+    Unlike ON CONFLICT, the match columns do not need a unique index. Update-only
+    mode and deletes of matched rows flagged in the staged data are applied in the
+    same statement.
+
+    Args:
+        connection: Database connection
+        temp_table_name: Name of the cleaned temp table
+        target_table: Target table name
+        match_columns: Columns joining staged rows to target rows
+        matched_columns: List of columns available in the temp table
+        schema_name: Schema name (default: 'public')
+        update_only: Skip staged rows that match no target row instead of inserting them
+        delete_flag_column: Staged boolean column; matched rows where it is true are deleted
+
+    Returns:
+        Tuple of (rows_inserted, rows_updated, rows_deleted)
+
+    Raises:
+        PgsqlUpserterError: If merge operation fails
+    """
+    logger.debug(f"Executing merge from '{temp_table_name}' to '{schema_name}.{target_table}' "
+                 f"on columns: {match_columns}")
+
+    if not match_columns:
+        raise PgsqlUpserterError("MERGE requires at least one match column")
+
+    merge_sql = build_merge_sql(temp_table_name, target_table, match_columns, matched_columns,
+                                schema_name, update_only, delete_flag_column)
+    match_condition = " AND ".join(f"t.{col} = s.{col}" for col in match_columns)
+    exists_match = f"EXISTS (SELECT 1 FROM {schema_name}.{target_table} t WHERE {match_condition})"
+
+    try:
+        with connection.cursor() as cursor:
+            # MERGE only reports a total row count, so split it per action up front
+            if update_only:
+                insert_count_sql = "0"
+            elif delete_flag_column:
+                insert_count_sql = f"count(*) FILTER (WHERE NOT {exists_match} AND s.{delete_flag_column} IS NOT TRUE)"
+            else:
+                insert_count_sql = f"count(*) FILTER (WHERE NOT {exists_match})"
+
+            if delete_flag_column:
+                delete_count_sql = f"""(
+                    SELECT count(*) FROM {schema_name}.{target_table} t
+                    WHERE EXISTS (
+                        SELECT 1 FROM {temp_table_name} s
+                        WHERE {match_condition} AND s.{delete_flag_column}
+                    )
+                )"""
+            else:
+                delete_count_sql = "0"
+
+            cursor.execute(f"SELECT {insert_count_sql}, {delete_count_sql} FROM {temp_table_name} s")
+            rows_inserted, rows_deleted = cursor.fetchone()
+
+            cursor.execute(merge_sql)
+            rows_updated = cursor.rowcount - rows_inserted - rows_deleted
+
+        logger.debug(f"Merge completed: {rows_inserted} inserted, {rows_updated} updated, {rows_deleted} deleted")
+        return rows_inserted, rows_updated, rows_deleted
+
+    except Exception as e:
+        logger.error(f"Merge operation failed: {e}")
+        raise PgsqlUpserterError(f"Failed to execute merge: {e}") from e
@@ -0,0 +1,90 @@
+"""Advisory-lock coordination for concurrent writers to the same table.
+
+Locks are transaction-scoped (``pg_advisory_xact_lock``), so they are taken inside
+the apply transaction and released by its commit or rollback. Keys are two int4
+values: a hash of the target table and a bucket number.
+
+- ``"table"`` mode takes the exclusive table key, serializing all coordinated
+  writers of the table.
+- ``"bucket"`` mode hashes the staged conflict keys into ``bucket_count`` buckets
+  and locks only the buckets present in the data, in ascending order, so writers
+  with disjoint buckets run in parallel and overlapping ones queue. It also holds
+  the table key in shared mode so it still excludes ``"table"`` mode writers.
+"""
+
+import logging
+import time
+import psycopg2
+
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+LOCK_MODES = ('table', 'bucket')
+
+# Second key half of the table-wide lock; buckets are always >= 0
+_TABLE_LOCK_OBJID = -1
+
+
+def acquire_apply_locks(
+    connection,
+    temp_table_name: str,
+    target_table: str,
+    conflict_columns: list[str],
+    lock_mode: str,
+    bucket_count: int = 1024,
+    schema: str = 'public'
+) -> float:
+    """Take the advisory locks guarding the apply phase of an upsert.
+
+    Must be called inside the apply transaction; the locks are held until it ends.
+
+    Args:
+        connection: Database connection
+        temp_table_name: Deduplicated temp table holding the staged rows
+        target_table: Target table name
+        conflict_columns: Conflict key columns used for bucketing
+        lock_mode: "table" or "bucket". Bucket mode falls back to a table lock
+            when there are no conflict columns
+        bucket_count: Number of key-hash buckets per table
+        schema: Schema name (default: 'public')
+
+    Returns:
+        float: Seconds spent acquiring (mostly waiting for) the locks
+
+    Raises:
+        ValueError: If lock_mode is invalid
+        PgsqlUpserterError: If the locks cannot be acquired
+    """
+    if lock_mode not in LOCK_MODES:
+        raise ValueError(f"Invalid lock_mode: {lock_mode!r}")
+
+    table_key = f"pgsql_upserter:{schema}.{target_table}"
+    start = time.perf_counter()
+
+    try:
+        with connection.cursor() as cursor:
+            if lock_mode == 'table' or not conflict_columns:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s)", (table_key, _TABLE_LOCK_OBJID))
+                bucket_total = 0
+            else:
+                cursor.execute("SELECT pg_advisory_xact_lock_shared(hashtext(%s), %s)",
+                               (table_key, _TABLE_LOCK_OBJID))
+                key_expr = f"ROW({', '.join(conflict_columns)})::text"
+                cursor.execute(f"""
+                    SELECT count(pg_advisory_xact_lock(hashtext(%s), bucket))
+                    FROM (
+                        SELECT DISTINCT (hashtext({key_expr}) & 2147483647) %% %s AS bucket
+                        FROM {temp_table_name}
+                        ORDER BY bucket
+                    ) buckets
+                """, (table_key, bucket_count))
+                bucket_total = cursor.fetchone()[0]
+
+    except psycopg2.Error as e:
+        raise PgsqlUpserterError(f"Failed to acquire advisory locks on '{schema}.{target_table}': {e}") from e
+
+    wait_seconds = time.perf_counter() - start
+    logger.debug(f"Acquired {lock_mode} advisory locks on '{schema}.{target_table}' "
+                 f"({bucket_total} buckets) in {wait_seconds:.3f}s")
+    return wait_seconds
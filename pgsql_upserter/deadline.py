@@ -0,0 +1,221 @@
+"""Deadline-aware chunked execution for hard wall-clock limits.
+
+A serverless function killed mid-transaction loses the whole load. With a
+deadline the input is applied in consecutive chunks that each commit on their
+own. The throughput measured on committed chunks sizes the next one so that it
+finishes, with a safety factor and a reserved margin, before the deadline; when
+not even a minimal chunk fits, the run stops cleanly and returns a
+``ContinuationToken`` telling where the input has to be resumed. A failing chunk
+is rolled back and reported with a token as well (``ChunkedLoadError``). As a
+backstop against a single statement overrunning the limit, each chunk's
+staging and apply transactions get a ``statement_timeout`` ending shortly
+before the deadline.
+
+Positions count raw input records (list items, file records), before column
+matching, watermark filtering and deduplication, so a token is only meaningful
+for the same input in the same order.
+"""
+
+import json
+import logging
+import math
+import time
+
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Any, TypeVar
+
+from .throttle import Throttle
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+TOKEN_FORMAT_VERSION = 1
+
+
+@dataclass
+class DeadlinePolicy:
+    """Chunk sizing for deadline-aware execution.
+
+    The next chunk gets as many rows as the measured seconds per row, times
+    ``safety_factor``, allow in the smaller of ``target_chunk_seconds`` and the
+    time left before the deadline minus ``margin_seconds``.
+    """
+    margin_seconds: float = 5.0
+    initial_chunk_rows: int = 1000
+    min_chunk_rows: int = 100
+    max_chunk_rows: int = 200_000
+    target_chunk_seconds: float = 15.0
+    safety_factor: float = 1.5
+    max_growth: float = 4.0  # Largest factor between consecutive chunk sizes
+    statement_timeout: bool = True  # SET LOCAL statement_timeout to the time left minus half the margin
+
+
+@dataclass
+class ContinuationToken:
+    """Where a load stopped by its deadline resumes."""
+    target_table: str
+    schema: str
+    rows_committed: int  # Leading input records already applied and committed
+    chunks_committed: int
+
+    def dumps(self) -> str:
+        """Serialize the token, e.g. to hand it to the next invocation."""
+        return json.dumps({'version': TOKEN_FORMAT_VERSION, **asdict(self)})
+
+    @classmethod
+    def loads(cls, token: str) -> 'ContinuationToken':
+        """Deserialize a token produced by dumps().
+
+        Raises:
+            ValueError: If the token is malformed or of another format version
+        """
+        try:
+            payload = json.loads(token)
+            version = payload.pop('version')
+        except (TypeError, ValueError, KeyError, AttributeError) as e:
+            raise ValueError(f"Malformed continuation token: {e}") from e
+        if version != TOKEN_FORMAT_VERSION:
+            raise ValueError(f"Unsupported continuation token version {version}")
+        try:
+            return cls(**payload)
+        except TypeError as e:
+            raise ValueError(f"Malformed continuation token: {e}") from e
+
+
+class ChunkSizer:
+    """Size chunks from the throughput of the chunks committed so far."""
+
+    def __init__(self, policy: DeadlinePolicy):
+        self.policy = policy
+        self.seconds_per_row: float | None = None  # Exponentially weighted, per-chunk overhead included
+        self.last_size: int | None = None
+
+    def record(self, rows: int, seconds: float) -> None:
+        """Record a committed chunk."""
+        if rows <= 0:
+            return
+        observed = seconds / rows
+        if self.seconds_per_row is None:
+            self.seconds_per_row = observed
+        else:
+            self.seconds_per_row = 0.5 * self.seconds_per_row + 0.5 * observed
+        self.last_size = rows
+
+    def next_size(self, remaining_seconds: float) -> int:
+        """Rows for the next chunk given the time left before the deadline, 0 to stop."""
+        policy = self.policy
+        budget = remaining_seconds - policy.margin_seconds
+        if budget <= 0:
+            return 0
+        if self.seconds_per_row is None:
+            return policy.initial_chunk_rows
+
+        cost = max(self.seconds_per_row * policy.safety_factor, 1e-9)
+        size = math.floor(min(budget, policy.target_chunk_seconds) / cost)
+        size = min(size, policy.max_chunk_rows, math.ceil(self.last_size * policy.max_growth))
+        if size < policy.min_chunk_rows:
+            # A minimal chunk only runs if it fits in the time left, not just in target_chunk_seconds
+            return policy.min_chunk_rows if policy.min_chunk_rows * cost <= budget else 0
+        return size
+
+
+def remaining_time_function(deadline: Callable[[], float] | float) -> Callable[[], float]:
+    """Turn a deadline into a callable returning the seconds left.
+
+    Args:
+        deadline: Callable returning the remaining seconds (e.g.
+            ``lambda: context.get_remaining_time_in_millis() / 1000``), or the
+            number of seconds available from now
+    """
+    if callable(deadline):
+        return deadline
+    end = time.monotonic() + deadline
+    return lambda: end - time.monotonic()
+
+
+def with_statement_timeout(
+    tuning: dict[str, dict[str, str]],
+    timeout_seconds: float
+) -> dict[str, dict[str, str]]:
+    """Add a statement_timeout to the staging and apply phases of resolved session settings."""
+    timeout = f"{max(1, int(timeout_seconds * 1000))}ms"
+    return {**tuning, **{phase: {**tuning.get(phase, {}), 'statement_timeout': timeout}
+                         for phase in ('staging', 'apply')}}
+
+
+def skip_committed_rows(
+    records: Iterator[dict[str, Any]],
+    token: ContinuationToken,
+    target_table: str,
+    schema: str
+) -> Iterator[dict[str, Any]]:
+    """Skip the input records a previous run already committed.
+
+    Raises:
+        ValueError: If the token belongs to another table
+    """
+    if (token.target_table, token.schema) != (target_table, schema):
+        raise ValueError(f"Continuation token is for '{token.schema}.{token.target_table}', "
+                         f"not '{schema}.{target_table}'")
+    logger.info(f"Resuming after {token.rows_committed} committed rows ({token.chunks_committed} chunks)")
+    return islice(records, token.rows_committed, None)
+
+
+def run_chunks(
+    records: Iterator[dict[str, Any]],
+    run_chunk: Callable[[list[dict[str, Any]]], T],
+    remaining: Callable[[], float],
+    policy: DeadlinePolicy,
+    throttle: Throttle | None = None
+) -> tuple[list[T], int, bool, Exception | None]:
+    """Apply records in committed chunks until the input is exhausted or time runs out.
+
+    Args:
+        records: Input records, consumed only as far as chunks are started
+        run_chunk: Applies and commits one chunk, returning its result
+        remaining: Callable returning the seconds left before the deadline
+        policy: Chunk sizing
+        throttle: Pauses before and scales each chunk by replica lag and load
+
+    Returns:
+        Tuple of (chunk results, records committed, whether the input was exhausted,
+        the exception the failed chunk raised). Chunks after a failure are not started
+    """
+    sizer = ChunkSizer(policy)
+    results = []
+    rows_committed = 0
+    while True:
+        time_left = remaining()
+        size = sizer.next_size(time_left)
+        if size > 0 and throttle is not None:
+            try:
+                scale = throttle.before_chunk(max_wait=time_left - policy.margin_seconds)
+            except Exception as e:
+                return results, rows_committed, False, e
+            time_left = remaining()
+            size = sizer.next_size(time_left)
+            size = max(1, math.floor(size * scale)) if size > 0 else 0
+        if size == 0:
+            logger.info(f"Stopping before the deadline ({time_left:.1f}s left) after {rows_committed} rows")
+            return results, rows_committed, False, None
+
+        chunk = list(islice(records, size))
+        if not chunk:
+            return results, rows_committed, True, None
+
+        start = time.monotonic()
+        try:
+            results.append(run_chunk(chunk))
+        except Exception as e:
+            logger.error(f"Chunk {len(results) + 1} of {len(chunk)} rows failed after {rows_committed} "
+                         f"committed rows: {e}")
+            return results, rows_committed, False, e
+        elapsed = time.monotonic() - start
+        sizer.record(len(chunk), elapsed)
+        rows_committed += len(chunk)
+        logger.info(f"Committed chunk {len(results)} of {len(chunk)} rows in {elapsed:.2f}s")
+        if len(chunk) < size:
+            return results, rows_committed, True, None
@@ -0,0 +1,207 @@
+"""Dry-run support: explain what an upsert would do without changing the target.
+
+The staged rows are deduplicated and the apply statement is explained inside a
+transaction that is always rolled back. With ``analyze`` the statements really
+run (``EXPLAIN ANALYZE``), so timings are real but nothing persists.
+"""
+
+import logging
+import psycopg2
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from .conflict_resolver import (
+    ConflictStrategy,
+    DeduplicationResult,
+    build_deduplication_sql,
+    build_merge_sql,
+    build_null_key_condition,
+    build_upsert_sql,
+    deduplicate_temp_table,
+)
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExplainResult:
+    """EXPLAIN output of one statement."""
+    sql: str
+    plan: dict[str, Any]  # Top-level plan node of EXPLAIN (FORMAT JSON)
+    total_cost: float
+    estimated_rows: int
+    actual_time_ms: float | None = None  # Only with EXPLAIN ANALYZE
+
+
+@dataclass
+class DryRunReport:
+    """What an upsert would do, as estimated by a dry run."""
+    conflict_strategy: ConflictStrategy
+    execution_strategy: str
+    matched_columns: list[str]
+    rows_staged: int
+    sampled: bool  # Whether only a sample of the input was staged
+    deduplication_result: DeduplicationResult
+    estimated_inserts: int
+    estimated_updates: int
+    estimated_deletes: int
+    deduplication: ExplainResult | None  # None when there are no conflict columns
+    apply: ExplainResult
+    analyzed: bool
+    missing_columns: list[str] = field(default_factory=list)
+
+
+def explain_statement(connection, sql: str, analyze: bool = False) -> ExplainResult:
+    """Run EXPLAIN (optionally ANALYZE) on a statement in the current transaction.
+
+    Raises:
+        PgsqlUpserterError: If the statement cannot be explained
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({options}) {sql}")
+            output = cursor.fetchone()[0]
+    except psycopg2.Error as e:
+        raise PgsqlUpserterError(f"Failed to explain statement: {e}") from e
+
+    top = output[0]
+    plan = top['Plan']
+    return ExplainResult(
+        sql=sql,
+        plan=plan,
+        total_cost=plan['Total Cost'],
+        estimated_rows=plan['Plan Rows'],
+        actual_time_ms=top.get('Execution Time') if analyze else None
+    )
+
+
+def estimate_apply_split(
+    connection,
+    temp_table_name: str,
+    target_table: str,
+    conflict_strategy: ConflictStrategy,
+    schema: str = 'public',
+    update_only: bool = False,
+    delete_flag_column: str | None = None
+) -> tuple[int, int, int]:
+    """Probe the target for the keys of the deduplicated staged rows.
+
+    Returns:
+        Tuple of (estimated inserts, estimated updates, estimated deletes)
+    """
+    with connection.cursor() as cursor:
+        if conflict_strategy.type == "INSERT_ONLY" or not conflict_strategy.columns:
+            cursor.execute(f"SELECT COUNT(*) FROM {temp_table_name}")
+            return cursor.fetchone()[0], 0, 0
+
+        match_condition = " AND ".join(f"t.{col} = s.{col}" for col in conflict_strategy.columns)
+        if conflict_strategy.index_predicate:
+            # Only rows covered by the partial arbiter index can conflict
+            match_condition += f" AND ({conflict_strategy.index_predicate})"
+        flag = f"s.{delete_flag_column} IS TRUE" if delete_flag_column else "false"
+
+        cursor.execute(f"""
+            SELECT
+                COUNT(*) FILTER (WHERE NOT matched AND NOT flagged),
+                COUNT(*) FILTER (WHERE matched AND NOT flagged),
+                COUNT(*) FILTER (WHERE matched AND flagged)
+            FROM (
+                SELECT
+                    EXISTS (SELECT 1 FROM {schema}.{target_table} t WHERE {match_condition}) AS matched,
+                    {flag} AS flagged
+                FROM {temp_table_name} s
+            ) probe
+        """)
+        inserts, updates, deletes = cursor.fetchone()
+
+    return (0 if update_only else inserts), updates, deletes
+
+
+def run_dry_run(
+    connection,
+    temp_table_name: str,
+    target_table: str,
+    conflict_strategy: ConflictStrategy,
+    execution_strategy: str,
+    columns_to_update: list[str],
+    rows_staged: int,
+    sampled: bool = False,
+    matched_columns: list[str] | None = None,
+    missing_columns: list[str] | None = None,
+    schema: str = 'public',
+    update_only: bool = False,
+    delete_flag_column: str | None = None,
+    analyze: bool = False
+) -> DryRunReport:
+    """Explain and estimate the apply phase for a populated temp table, then roll back.
+
+    Args:
+        connection: Database connection
+        temp_table_name: Populated (not yet deduplicated) temp table
+        target_table: Target table name
+        conflict_strategy: Conflict resolution strategy
+        execution_strategy: "ON_CONFLICT" or "MERGE"
+        columns_to_update: Columns the apply statement writes
+        rows_staged: Number of staged rows
+        sampled: Whether the staged rows are only a sample of the input
+        matched_columns: Staged data columns (defaults to columns_to_update)
+        missing_columns: Data keys that were not staged
+        schema: Schema name (default: 'public')
+        update_only: Whether unmatched rows are skipped (MERGE)
+        delete_flag_column: Staged boolean column marking rows to delete (MERGE)
+        analyze: Run EXPLAIN ANALYZE, executing the statements in the rolled-back transaction
+
+    Returns:
+        DryRunReport: Strategy, generated SQL, plans and estimated row counts
+
+    Raises:
+        PgsqlUpserterError: If a statement cannot be explained
+    """
+    try:
+        dedup_explain = None
+        if conflict_strategy.columns:
+            with connection.cursor() as cursor:
+                null_condition = build_null_key_condition(cursor, temp_table_name, conflict_strategy.columns)
+            dedup_explain = explain_statement(
+                connection,
+                build_deduplication_sql(temp_table_name, conflict_strategy.columns, null_condition),
+                analyze
+            )
+
+        dedup_result = deduplicate_temp_table(connection, temp_table_name, conflict_strategy.columns)
+
+        inserts, updates, deletes = estimate_apply_split(
+            connection, temp_table_name, target_table, conflict_strategy, schema, update_only, delete_flag_column)
+
+        if execution_strategy == "MERGE":
+            apply_sql = build_merge_sql(temp_table_name, target_table, conflict_strategy.columns,
+                                        columns_to_update, schema, update_only, delete_flag_column)
+        else:
+            apply_sql = build_upsert_sql(temp_table_name, target_table, conflict_strategy,
+                                         columns_to_update, schema)
+        apply_explain = explain_statement(connection, apply_sql, analyze)
+
+    finally:
+        connection.rollback()
+
+    logger.info(f"Dry run: ~{inserts} inserts, ~{updates} updates, ~{deletes} deletes, "
+                f"apply cost {apply_explain.total_cost:.0f}")
+
+    return DryRunReport(
+        conflict_strategy=conflict_strategy,
+        execution_strategy=execution_strategy,
+        matched_columns=list(matched_columns or columns_to_update),
+        rows_staged=rows_staged,
+        sampled=sampled,
+        deduplication_result=dedup_result,
+        estimated_inserts=inserts,
+        estimated_updates=updates,
+        estimated_deletes=deletes,
+        deduplication=dedup_explain,
+        apply=apply_explain,
+        analyzed=analyze,
+        missing_columns=list(missing_columns or [])
+    )
@@ -0,0 +1,391 @@
+"""Durable, checkpointed staging for resumable upsert loads.
+
+Session-scoped temp tables are lost when a connection drops. In durable mode rows
+are staged chunk by chunk into an UNLOGGED permanent table, and every chunk is
+recorded in a checkpoint table in the same transaction, with a hash of its
+content. Retrying a load with the same load ID skips chunks that were already
+staged or applied, after checking that the input still hashes the same.
+Checkpoints accumulate until ``purge_checkpoints`` removes old ones.
+"""
+
+import datetime
+import hashlib
+import logging
+import uuid
+import psycopg2
+
+from collections.abc import Collection, Iterable
+from typing import Any
+
+from .schema_inspector import TableSchema
+from .temp_staging import bulk_insert_to_temp, iter_batches
+from .session_tuning import apply_local_settings
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TABLE = "pgsql_upserter_checkpoints"
+
+# Staging column preserving input order across retried chunks (for keep-last deduplication)
+SEQUENCE_COLUMN = "pgsql_upserter_seq"
+
+CHUNK_STAGED = "staged"
+CHUNK_APPLIED = "applied"
+
+
+def durable_staging_table_name(load_id: str) -> str:
+    """Deterministic staging table name for a load ID."""
+    return f"pgsql_upserter_stage_{hashlib.md5(load_id.encode('utf-8')).hexdigest()[:16]}"
+
+
+def ensure_checkpoint_table(connection, schema: str = 'public') -> None:
+    """Create the checkpoint table if it does not exist yet.
+
+    Raises:
+        PgsqlUpserterError: If the table cannot be created
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.{CHECKPOINT_TABLE} (
+                    load_id text NOT NULL,
+                    chunk_index integer NOT NULL,
+                    row_offset bigint NOT NULL,
+                    row_count integer NOT NULL,
+                    state text NOT NULL,
+                    target_table text NOT NULL,
+                    updated_at timestamptz NOT NULL DEFAULT now(),
+                    chunk_hash text,
+                    PRIMARY KEY (load_id, chunk_index)
+                )
+            """)
+            # Checkpoint tables created by earlier versions lack the content hash
+            cursor.execute(f"ALTER TABLE {schema}.{CHECKPOINT_TABLE} ADD COLUMN IF NOT EXISTS chunk_hash text")
+            connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to create checkpoint table: {e}")
+
+
+def get_checkpoints(connection, load_id: str, schema: str = 'public') -> dict[int, str]:
+    """Return the recorded state of every chunk of a load, keyed by chunk index."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT chunk_index, state
+            FROM {schema}.{CHECKPOINT_TABLE}
+            WHERE load_id = %s
+        """, (load_id,))
+        states = {row[0]: row[1] for row in cursor.fetchall()}
+    connection.commit()
+    return states
+
+
+def _get_chunk_hashes(connection, load_id: str, schema: str) -> dict[int, str | None]:
+    """Return the content hash recorded for every chunk of a load, keyed by chunk index."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT chunk_index, chunk_hash
+            FROM {schema}.{CHECKPOINT_TABLE}
+            WHERE load_id = %s
+        """, (load_id,))
+        hashes = {row[0]: row[1] for row in cursor.fetchall()}
+    connection.commit()
+    return hashes
+
+
+def chunk_hash(chunk: list[dict[str, Any]]) -> str:
+    """Fingerprint of a chunk's records, independent of key order within a record."""
+    digest = hashlib.md5()
+    for row in chunk:
+        digest.update(repr(sorted(row.items())).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def create_durable_staging_table(
+    connection,
+    target_table: str,
+    load_id: str,
+    table_schema: TableSchema,
+    extra_columns: dict[str, str] | None = None,
+    schema: str = 'public'
+) -> str:
+    """Create (or reuse) the UNLOGGED staging table of a load.
+
+    The table mirrors the target without constraints or auto-generated columns,
+    plus a sequence column recording staging order. An existing table is only
+    reused when it still has exactly these columns.
+
+    Args:
+        connection: Active PostgreSQL connection
+        target_table: Name of the target table to copy structure from
+        load_id: Load identifier the staging table belongs to
+        table_schema: Target table schema
+        extra_columns: Additional staging-only columns as name -> SQL type
+        schema: Schema name (default: 'public')
+
+    Returns:
+        str: Schema-qualified staging table name
+
+    Raises:
+        PgsqlUpserterError: If the staging table cannot be created, or an existing one
+            has other columns (the target or the load's options changed since it was staged)
+    """
+    staging_table = f"{schema}.{durable_staging_table_name(load_id)}"
+    expected_columns = {col.name for col in table_schema.columns if not col.is_auto_generated}
+    expected_columns.update(extra_columns or {})
+    expected_columns.add(SEQUENCE_COLUMN)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", (staging_table,))
+            existing = cursor.fetchone()[0]
+            if existing is not None:
+                cursor.execute("""
+                    SELECT attname FROM pg_attribute
+                    WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+                """, (staging_table,))
+                columns = {row[0] for row in cursor.fetchall()}
+                connection.commit()
+                if columns != expected_columns:
+                    raise PgsqlUpserterError(
+                        f"Staging table '{staging_table}' of load '{load_id}' does not match the target "
+                        f"(missing {sorted(expected_columns - columns)}, unexpected "
+                        f"{sorted(columns - expected_columns)}); drop it or use a new load_id")
+                logger.info(f"Resuming load '{load_id}' with existing staging table '{staging_table}'")
+                return staging_table
+
+            cursor.execute(f"""
+                CREATE UNLOGGED TABLE {staging_table}
+                (LIKE {schema}.{target_table} EXCLUDING ALL)
+            """)
+
+            alter_clauses = [f"DROP COLUMN {col.name}" for col in table_schema.columns if col.is_auto_generated]
+            for name, sql_type in (extra_columns or {}).items():
+                alter_clauses.append(f"ADD COLUMN {name} {sql_type}")
+            alter_clauses.append(f"ADD COLUMN {SEQUENCE_COLUMN} bigserial")
+            cursor.execute(f"ALTER TABLE {staging_table} {', '.join(alter_clauses)}")
+
+            connection.commit()
+
+            logger.debug(f"Created durable staging table '{staging_table}' for load '{load_id}'")
+            return staging_table
+
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to create durable staging table: {e}")
+
+
+def stage_chunks(
+    connection,
+    staging_table: str,
+    load_id: str,
+    target_table: str,
+    data_list: Iterable[dict[str, Any]],
+    staged_columns: list[str],
+    table_schema: TableSchema,
+    chunk_size: int = 10000,
+    batch_size: int = 1000,
+    schema: str = 'public',
+    trusted_json_columns: Collection[str] = (),
+    settings: dict[str, str] | None = None
+) -> tuple[int, int]:
+    """Stage data chunk by chunk, skipping chunks already checkpointed.
+
+    Each chunk and its checkpoint row are committed together, so a chunk is either
+    fully staged and recorded or not staged at all. The checkpoint records a hash
+    of the chunk's records; a resumed load whose input differs from what was
+    staged (changed records, another order or fewer chunks) is refused.
+
+    Args:
+        connection: Active PostgreSQL connection
+        staging_table: Schema-qualified staging table name
+        load_id: Load identifier
+        target_table: Target table name (recorded in the checkpoint table)
+        data_list: Complete input data of the load (list or streaming iterable)
+        staged_columns: Columns to stage
+        table_schema: Target table schema for data type conversion
+        chunk_size: Number of rows per checkpointed chunk
+        batch_size: Number of rows per insert batch within a chunk
+        schema: Schema name (default: 'public')
+        trusted_json_columns: json/jsonb columns staged without client-side validation
+        settings: Server settings applied with SET LOCAL in every chunk transaction
+
+    Returns:
+        Tuple of (rows staged by this call, chunks skipped)
+
+    Raises:
+        PgsqlUpserterError: If a chunk cannot be staged, or the input does not match
+            the chunks already staged
+    """
+    states = get_checkpoints(connection, load_id, schema)
+    hashes = _get_chunk_hashes(connection, load_id, schema) if states else {}
+    rows_staged = 0
+    chunks_skipped = 0
+
+    row_offset = 0
+    chunk_count = 0
+    for chunk_index, chunk in enumerate(iter_batches(data_list, chunk_size)):
+        chunk_count = chunk_index + 1
+        chunk_offset, row_offset = row_offset, row_offset + len(chunk)
+        content_hash = chunk_hash(chunk)
+        if states.get(chunk_index) in (CHUNK_STAGED, CHUNK_APPLIED):
+            if hashes.get(chunk_index) not in (None, content_hash):
+                raise PgsqlUpserterError(
+                    f"Input of load '{load_id}' differs from chunk {chunk_index} staged earlier "
+                    f"(rows {chunk_offset}-{row_offset - 1}); resume with the same input and "
+                    f"checkpoint_chunk_size, or use a new load_id")
+            chunks_skipped += 1
+            continue
+
+        try:
+            apply_local_settings(connection, settings)
+            bulk_insert_to_temp(
+                connection=connection,
+                temp_table_name=staging_table,
+                data_list=chunk,
+                matched_columns=staged_columns,
+                target_schema=table_schema,
+                batch_size=batch_size,
+                show_progress=False,
+                commit=False,
+                trusted_json_columns=trusted_json_columns
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO {schema}.{CHECKPOINT_TABLE}
+                        (load_id, chunk_index, row_offset, row_count, state, target_table, chunk_hash)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (load_id, chunk_index)
+                    DO UPDATE SET state = EXCLUDED.state, chunk_hash = EXCLUDED.chunk_hash, updated_at = now()
+                """, (load_id, chunk_index, chunk_offset, len(chunk), CHUNK_STAGED, target_table,
+                      content_hash))
+            connection.commit()
+        except (psycopg2.Error, PgsqlUpserterError) as e:
+            connection.rollback()
+            raise PgsqlUpserterError(f"Failed to stage chunk {chunk_index} of load '{load_id}': {e}") from e
+
+        rows_staged += len(chunk)
+        logger.debug(f"Staged chunk {chunk_index} ({len(chunk)} rows at offset {chunk_offset}) "
+                     f"of load '{load_id}'")
+
+    extra_chunks = sorted(index for index in states if index >= chunk_count)
+    if extra_chunks:
+        raise PgsqlUpserterError(f"Input of load '{load_id}' ended after {chunk_count} chunks, but chunks "
+                                 f"{extra_chunks} were staged earlier; resume with the same input or use a new load_id")
+
+    if chunks_skipped:
+        logger.info(f"Skipped {chunks_skipped} already staged chunks of load '{load_id}'")
+
+    return rows_staged, chunks_skipped
+
+
+def copy_staging_to_temp(connection, staging_table: str) -> str:
+    """Copy durable staging rows, in staging order, into a session temp table.
+
+    The copy is created inside the apply transaction, so deduplication and upsert
+    work on it while the durable table survives until the apply commits.
+
+    Returns:
+        str: Name of the temp table holding the staged rows
+    """
+    temp_table_name = f"temp_staging_{uuid.uuid4().hex[:8]}"
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE {temp_table_name} AS
+                SELECT * FROM {staging_table}
+                ORDER BY {SEQUENCE_COLUMN}
+            """)
+            cursor.execute(f"ALTER TABLE {temp_table_name} DROP COLUMN {SEQUENCE_COLUMN}")
+        return temp_table_name
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to copy durable staging table: {e}")
+
+
+def mark_load_applied(connection, load_id: str, staging_table: str, schema: str = 'public') -> None:
+    """Mark every chunk of a load applied and drop its staging table.
+
+    Commits the current transaction, so it must run right after the upsert for the
+    checkpoint update to be atomic with the applied data.
+
+    Raises:
+        PgsqlUpserterError: If the checkpoint cannot be recorded
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {schema}.{CHECKPOINT_TABLE}
+                SET state = %s, updated_at = now()
+                WHERE load_id = %s
+            """, (CHUNK_APPLIED, load_id))
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            connection.commit()
+        logger.debug(f"Load '{load_id}' marked applied")
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to record applied load '{load_id}': {e}")
+
+
+def is_load_applied(states: dict[int, str]) -> bool:
+    """Whether a load has been applied.
+
+    Chunks are only marked applied once the whole input has been staged, so
+    recorded chunks all being applied means the entire load went through.
+    """
+    return bool(states) and all(state == CHUNK_APPLIED for state in states.values())
+
+
+def purge_checkpoints(
+    connection,
+    older_than: datetime.timedelta = datetime.timedelta(days=7),
+    include_unapplied: bool = False,
+    schema: str = 'public'
+) -> int:
+    """Delete the checkpoints of loads last updated before ``older_than`` ago.
+
+    A load whose checkpoints are gone is no longer recognized as applied: running
+    it again with the same load ID applies it again. With ``include_unapplied``
+    the checkpoints of abandoned loads are purged as well, and their staging
+    tables dropped.
+
+    Args:
+        connection: Active PostgreSQL connection
+        older_than: Minimum age of a load's most recent checkpoint update
+        include_unapplied: Also purge loads that were staged but never applied
+        schema: Schema of the checkpoint table (default: 'public')
+
+    Returns:
+        int: Number of loads purged
+
+    Raises:
+        PgsqlUpserterError: If the checkpoints cannot be purged
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", (f"{schema}.{CHECKPOINT_TABLE}",))
+            if cursor.fetchone()[0] is None:
+                connection.commit()
+                return 0
+            cursor.execute(f"""
+                SELECT load_id
+                FROM {schema}.{CHECKPOINT_TABLE}
+                GROUP BY load_id
+                HAVING max(updated_at) < now() - %s
+                   AND (%s OR bool_and(state = %s))
+            """, (older_than, include_unapplied, CHUNK_APPLIED))
+            load_ids = [row[0] for row in cursor.fetchall()]
+            for load_id in load_ids:
+                # Applied loads have dropped theirs already
+                cursor.execute(f"DROP TABLE IF EXISTS {schema}.{durable_staging_table_name(load_id)}")
+            cursor.execute(f"DELETE FROM {schema}.{CHECKPOINT_TABLE} WHERE load_id = ANY(%s)", (load_ids,))
+            connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to purge checkpoints: {e}")
+
+    if load_ids:
+        logger.info(f"Purged the checkpoints of {len(load_ids)} loads older than {older_than}")
+    return len(load_ids)
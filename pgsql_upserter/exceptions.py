@@ -24,3 +24,21 @@ class TableNotFoundError(PgsqlUpserterError):
 class SchemaIntrospectionError(PgsqlUpserterError):
     """Raised when table schema cannot be introspected."""
     pass
+
+
+class ConcurrencyError(PgsqlUpserterError):
+    """Raised when an apply step keeps failing with deadlocks or serialization failures."""
+    pass
+
+
+class ChunkedLoadError(PgsqlUpserterError):
+    """Raised when a chunk of a deadline-aware or throttled load fails.
+
+    The chunks before it stay committed: ``partial_result`` sums them and
+    ``continuation_token`` resumes the load at the failed chunk.
+    """
+
+    def __init__(self, message: str, partial_result=None, continuation_token=None):
+        super().__init__(message)
+        self.partial_result = partial_result
+        self.continuation_token = continuation_token
@@ -0,0 +1,364 @@
+"""Secondary-index deferral for large backfills.
+
+When a load touches a large fraction of a table, maintaining every secondary
+index row by row is far slower than building it once afterwards. Deferral drops
+the plain (non-unique, non-constraint) indexes of the target before the apply
+phase and rebuilds them afterwards. Unique indexes - and so the ON CONFLICT
+arbiter - are always kept.
+
+Index definitions are recorded in a table in the same transaction that drops
+them, and a record is only removed once its index is rebuilt. The deferring
+session holds an advisory lock on the target until its rebuild, which marks the
+deferral as live: other sessions neither defer the same target's indexes nor
+rebuild them mid-apply. If the process dies before the rebuild, its lock is
+released with the connection and the next deferring load of the table (or an
+explicit ``restore_deferred_indexes``) recreates the missing indexes. A target
+whose size is unknown (never analyzed) keeps its indexes.
+"""
+
+import logging
+import psycopg2
+
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .schema_inspector import TableSchema
+from .retry import retryable_sqlstate
+from .session_tuning import apply_local_settings, apply_session_settings, current_settings
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+DEFERRED_INDEX_TABLE = "pgsql_upserter_deferred_indexes"
+
+# Second key half of the session lock marking a live deferral (see coordination)
+_DEFERRAL_LOCK_OBJID = -2
+
+
+@dataclass
+class DeferredIndex:
+    """A dropped secondary index awaiting rebuild."""
+    name: str
+    definition: str  # pg_get_indexdef() output
+
+
+def estimate_table_rows(connection, table_schema: TableSchema) -> int | None:
+    """Planner estimate of the target's row count (summed over leaf partitions).
+
+    Returns:
+        The estimate, or None when a non-empty table (or partition) has never been
+        vacuumed or analyzed and so has no estimate (reltuples is -1)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint,
+                   COALESCE(bool_or(c.reltuples < 0 AND pg_relation_size(c.oid) > 0), false)
+            FROM (SELECT format('%%I.%%I', %s, %s)::regclass AS rel) r
+            JOIN pg_class c ON c.oid = r.rel
+                OR c.oid IN (SELECT t.relid FROM pg_partition_tree(r.rel) t WHERE t.isleaf)
+            WHERE c.relkind <> 'p'
+        """, (table_schema.schema_name, table_schema.table_name))
+        rows, unknown = cursor.fetchone()
+        return None if unknown else rows
+
+
+def should_defer_indexes(staged_rows: int, target_rows: int | None, threshold: float) -> bool:
+    """Whether staged rows reach ``threshold`` times the target's size.
+
+    A target of unknown size is never treated as small: indexes are kept.
+    """
+    if target_rows is None:
+        return False
+    return staged_rows > 0 and staged_rows >= threshold * target_rows
+
+
+def find_deferrable_indexes(connection, table_schema: TableSchema) -> list[DeferredIndex]:
+    """Valid non-unique indexes of the target that back no constraint."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT format('%%I.%%I', n.nspname, c.relname), pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE i.indrelid = format('%%I.%%I', %s, %s)::regclass
+              AND NOT i.indisunique
+              AND i.indisvalid
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+            ORDER BY c.relname
+        """, (table_schema.schema_name, table_schema.table_name))
+        return [DeferredIndex(name=name, definition=definition) for name, definition in cursor.fetchall()]
+
+
+def _deferral_lock_key(target: str) -> tuple[str, int]:
+    return f"pgsql_upserter:{target}", _DEFERRAL_LOCK_OBJID
+
+
+def _try_deferral_lock(connection, target: str) -> bool:
+    """Take the session-level deferral lock of the target unless another session holds it."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s), %s)", _deferral_lock_key(target))
+        return cursor.fetchone()[0]
+
+
+def release_index_deferral(connection, target_table: str, schema: str = 'public') -> None:
+    """Release the lock defer_indexes took, once the deferred indexes are rebuilt.
+
+    Raises:
+        PgsqlUpserterError: If the lock cannot be released
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s), %s)",
+                           _deferral_lock_key(f"{schema}.{target_table}"))
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to release index deferral of '{schema}.{target_table}': {e}") from e
+
+
+def ensure_deferred_index_table(connection, schema: str = 'public') -> None:
+    """Create the table recording deferred index definitions if it does not exist yet.
+
+    Raises:
+        PgsqlUpserterError: If the table cannot be created
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.{DEFERRED_INDEX_TABLE} (
+                    target_table text NOT NULL,
+                    index_name text NOT NULL,
+                    definition text NOT NULL,
+                    deferred_at timestamptz NOT NULL DEFAULT now(),
+                    PRIMARY KEY (target_table, index_name)
+                )
+            """)
+            connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to create deferred index table: {e}")
+
+
+def defer_indexes(connection, table_schema: TableSchema) -> list[DeferredIndex]:
+    """Record and drop the target's deferrable indexes in one committed transaction.
+
+    When indexes are dropped, the session keeps holding the target's deferral
+    lock until release_index_deferral; when another session's deferral of the
+    target is live, nothing is dropped.
+
+    Returns:
+        The dropped indexes
+
+    Raises:
+        PgsqlUpserterError: If the indexes cannot be recorded or dropped
+    """
+    schema = table_schema.schema_name
+    target = f"{schema}.{table_schema.table_name}"
+    ensure_deferred_index_table(connection, schema)
+
+    try:
+        if not _try_deferral_lock(connection, target):
+            connection.commit()
+            logger.info(f"Indexes of '{target}' are deferred by another session, keeping them")
+            return []
+        indexes = find_deferrable_indexes(connection, table_schema)
+        with connection.cursor() as cursor:
+            for index in indexes:
+                cursor.execute(f"""
+                    INSERT INTO {schema}.{DEFERRED_INDEX_TABLE} (target_table, index_name, definition)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (target_table, index_name) DO UPDATE SET definition = EXCLUDED.definition
+                """, (target, index.name, index.definition))
+                cursor.execute(f"DROP INDEX {index.name}")
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        release_index_deferral(connection, table_schema.table_name, schema)
+        raise PgsqlUpserterError(f"Failed to defer indexes of '{target}': {e}") from e
+
+    if not indexes:
+        release_index_deferral(connection, table_schema.table_name, schema)
+    else:
+        logger.info(f"Deferred {len(indexes)} indexes of '{target}': {[index.name for index in indexes]}")
+    return indexes
+
+
+def _rebuild_index(
+    connection,
+    target: str,
+    index: DeferredIndex,
+    concurrently: bool,
+    schema: str,
+    settings: dict[str, str] | None = None
+) -> None:
+    """Build one recorded index (replacing an invalid leftover) and delete its record."""
+    definition = index.definition
+    if concurrently:
+        definition = definition.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)
+
+    previous_settings = None
+    if concurrently and settings:
+        # No transaction to SET LOCAL in: set for the session and restore afterwards
+        previous_settings = current_settings(connection, list(settings))
+        apply_session_settings(connection, settings)
+
+    previous_autocommit = connection.autocommit
+    connection.autocommit = concurrently  # CONCURRENTLY cannot run inside a transaction block
+    try:
+        if not concurrently:
+            apply_local_settings(connection, settings)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT i.indisvalid
+                FROM pg_index i
+                WHERE i.indexrelid = to_regclass(%s)
+            """, (index.name,))
+            existing = cursor.fetchone()
+            if existing and not existing[0]:
+                # Left over by an interrupted concurrent build
+                cursor.execute(f"DROP INDEX {index.name}")
+            if not existing or not existing[0]:
+                cursor.execute(definition)
+            cursor.execute(f"""
+                DELETE FROM {schema}.{DEFERRED_INDEX_TABLE}
+                WHERE target_table = %s AND index_name = %s
+            """, (target, index.name))
+        if not concurrently:
+            connection.commit()
+    except (psycopg2.Error, PgsqlUpserterError):
+        if not connection.autocommit:
+            connection.rollback()
+        raise
+    finally:
+        connection.autocommit = previous_autocommit
+        if previous_settings:
+            apply_session_settings(connection, previous_settings)
+
+
+def restore_deferred_indexes(
+    connection,
+    target_table: str,
+    schema: str = 'public',
+    concurrently: bool = False,
+    workers: int = 0,
+    connection_factory: Callable[[], psycopg2.extensions.connection] | None = None,
+    settings: dict[str, str] | None = None
+) -> list[str]:
+    """Rebuild every recorded index of the target, e.g. after a deferred apply.
+
+    Runs outside the caller's transaction, so commit or roll back first. Each index
+    is rebuilt and its record deleted in its own step; records of indexes that fail
+    to build are kept for the next attempt. Records of a deferral that another
+    session still holds (its apply is running) are left alone.
+
+    Args:
+        connection: Active PostgreSQL connection
+        target_table: Target table name
+        schema: Schema name (default: 'public')
+        concurrently: Use CREATE INDEX CONCURRENTLY (not for partitioned tables),
+            which does not block writers
+        workers: Build indexes concurrently from this many connections opened by
+            connection_factory
+        connection_factory: Opens a new connection for a worker
+        settings: Server settings (e.g. maintenance_work_mem) for the builds
+
+    Returns:
+        Names of the rebuilt indexes
+
+    Raises:
+        PgsqlUpserterError: If any index fails to build
+    """
+    target = f"{schema}.{target_table}"
+    locked = False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{schema}.{DEFERRED_INDEX_TABLE}",))
+            if not cursor.fetchone()[0]:
+                connection.commit()
+                return []
+        locked = _try_deferral_lock(connection, target)
+        if not locked:
+            connection.commit()
+            logger.info(f"Indexes of '{target}' are deferred by a running load, not rebuilding them")
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT index_name, definition
+                FROM {schema}.{DEFERRED_INDEX_TABLE}
+                WHERE target_table = %s
+                ORDER BY index_name
+            """, (target,))
+            indexes = [DeferredIndex(name=name, definition=definition) for name, definition in cursor.fetchall()]
+            cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (target,))
+            partitioned = (cursor.fetchone() or (False,))[0]
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        if locked:
+            release_index_deferral(connection, target_table, schema)
+        raise PgsqlUpserterError(f"Failed to read deferred indexes of '{target}': {e}")
+
+    try:
+        return _rebuild_indexes(connection, target, indexes, partitioned, concurrently, workers,
+                                connection_factory, schema, settings)
+    finally:
+        release_index_deferral(connection, target_table, schema)
+
+
+def _rebuild_indexes(
+    connection,
+    target: str,
+    indexes: list[DeferredIndex],
+    partitioned: bool,
+    concurrently: bool,
+    workers: int,
+    connection_factory: Callable[[], psycopg2.extensions.connection] | None,
+    schema: str,
+    settings: dict[str, str] | None
+) -> list[str]:
+    """Rebuild recorded indexes, in parallel workers when configured."""
+    if not indexes:
+        return []
+    concurrently = concurrently and not partitioned
+
+    def rebuild_in_worker(index: DeferredIndex) -> None:
+        worker_connection = connection_factory()
+        try:
+            _rebuild_index(worker_connection, target, index, concurrently, schema, settings)
+        finally:
+            worker_connection.close()
+
+    rebuilt, failures = [], []
+    sequential = indexes
+    if workers > 0 and connection_factory is not None and len(indexes) > 1:
+        sequential = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pgsql_upserter-index") as executor:
+            futures = {executor.submit(rebuild_in_worker, index): index for index in indexes}
+            for future, index in futures.items():
+                try:
+                    future.result()
+                    rebuilt.append(index.name)
+                except Exception as e:
+                    if retryable_sqlstate(e):
+                        # Concurrent builds of expression or partial indexes can deadlock
+                        # on each other's snapshots; the victims are rebuilt one by one
+                        sequential.append(index)
+                    else:
+                        failures.append(f"{index.name}: {e}")
+
+    for index in sequential:
+        try:
+            _rebuild_index(connection, target, index, concurrently, schema, settings)
+            rebuilt.append(index.name)
+        except (psycopg2.Error, PgsqlUpserterError) as e:
+            failures.append(f"{index.name}: {e}")
+
+    if rebuilt:
+        logger.info(f"Rebuilt {len(rebuilt)} deferred indexes of '{target}'"
+                    f"{' concurrently' if concurrently else ''}")
+    if failures:
+        raise PgsqlUpserterError(f"Failed to rebuild {len(failures)} deferred indexes of '{target}' "
+                                 f"(their definitions are kept in {schema}.{DEFERRED_INDEX_TABLE}): "
+                                 f"{'; '.join(failures)}")
+    return rebuilt
@@ -0,0 +1,181 @@
+"""Initial-load fast path: COPY straight into an empty target.
+
+When the target holds no rows there is nothing to conflict with, so staging,
+the deduplication window sort, the before/after counts and the per-row arbiter
+checks of ``INSERT ... ON CONFLICT`` are pure overhead. Rows are instead
+deduplicated on the client (keeping the last occurrence of each conflict key,
+like ``deduplicate_temp_table``) and COPYed directly into the target.
+
+The emptiness check is repeated under a ``SHARE ROW EXCLUSIVE`` lock, which
+keeps concurrent writers out until the load commits. In ``truncate`` mode the
+target is truncated in the same transaction and loaded with ``COPY ... FREEZE``,
+so the new rows need no later hint-bit or freeze pass by VACUUM.
+"""
+
+import io
+import logging
+import psycopg2
+
+from collections.abc import Collection, Iterable
+from typing import Any
+
+from .schema_inspector import TableSchema
+from .conflict_resolver import DeduplicationResult, build_deduplication_result
+from .temp_staging import (
+    _build_column_type_map,
+    _convert_value_for_postgres,
+    _format_copy_scalar,
+    _serialize_copy_chunk,
+    iter_batches,
+)
+from .session_tuning import apply_local_settings
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+INITIAL_LOAD_MODES = ('auto', 'never', 'truncate')
+
+UNIQUE_VIOLATION = '23505'
+
+
+def is_table_empty(connection, target_table: str, schema: str = 'public') -> bool:
+    """Whether the target table holds no rows.
+
+    Raises:
+        PgsqlUpserterError: If the table cannot be read
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {schema}.{target_table})")
+            return cursor.fetchone()[0]
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to check whether '{schema}.{target_table}' is empty: {e}")
+
+
+def conflict_key(
+    row: dict[str, Any],
+    conflict_columns: list[str],
+    column_type_map: dict[str, str]
+) -> tuple[str, ...] | None:
+    """Conflict key of a row as the text sent to the server, or None if part of it is NULL."""
+    key = []
+    for col in conflict_columns:
+        value = _convert_value_for_postgres(row.get(col), column_type_map.get(col, 'text'))
+        if value is None:
+            return None
+        key.append(_format_copy_scalar(value))
+    return tuple(key)
+
+
+def deduplicate_rows(
+    rows: Iterable[dict[str, Any]],
+    conflict_columns: list[str],
+    table_schema: TableSchema | None = None
+) -> tuple[list[dict[str, Any]], DeduplicationResult]:
+    """Deduplicate rows on the client, keeping the last occurrence of each conflict key.
+
+    Keys are compared by the text sent to the server, after the same value
+    conversion as staging. Rows with a NULL (or null-like) conflict column are
+    dropped, as in deduplicate_temp_table.
+
+    Args:
+        rows: Rows to deduplicate (consumed)
+        conflict_columns: Conflict key columns; without any, rows are kept as they are
+        table_schema: Target schema, for value conversion of the key columns
+
+    Returns:
+        Tuple of (deduplicated rows, DeduplicationResult)
+    """
+    if not conflict_columns:
+        kept = list(rows)
+        return kept, DeduplicationResult(
+            original_count=len(kept), deduplicated_count=len(kept), dropped_count=0, dropped_reasons={})
+
+    column_type_map = _build_column_type_map(conflict_columns, table_schema)
+    unique_rows: dict[tuple[str, ...], dict[str, Any]] = {}
+    original_count = null_count = 0
+
+    for row in rows:
+        original_count += 1
+        key = conflict_key(row, conflict_columns, column_type_map)
+        if key is None:
+            null_count += 1
+        else:
+            unique_rows[key] = row
+
+    return list(unique_rows.values()), build_deduplication_result(original_count, null_count, len(unique_rows))
+
+
+def load_into_empty_table(
+    connection,
+    rows: list[dict[str, Any]],
+    target_table: str,
+    columns: list[str],
+    table_schema: TableSchema,
+    schema: str = 'public',
+    truncate: bool = False,
+    batch_size: int = 5000,
+    trusted_json_columns: Collection[str] = (),
+    settings: dict[str, str] | None = None
+) -> int | None:
+    """COPY deduplicated rows directly into an empty (or truncated) target and commit.
+
+    Args:
+        connection: Active PostgreSQL connection
+        rows: Rows to load, already deduplicated on the conflict columns
+        target_table: Target table name
+        columns: Columns to load
+        table_schema: Target table schema (value conversion, partitioning)
+        schema: Schema name (default: 'public')
+        truncate: Truncate the target first and load with COPY FREEZE (not for
+            partitioned tables) in the same transaction
+        batch_size: Rows per COPY block
+        trusted_json_columns: json/jsonb columns sent without client-side validation
+        settings: Server settings applied with SET LOCAL in the load transaction
+
+    Returns:
+        Number of rows loaded, or None (rolled back) when the target turned out not
+        to be empty, or the server found conflicting keys the client-side
+        deduplication missed
+
+    Raises:
+        PgsqlUpserterError: If the load fails
+    """
+    freeze = truncate and not table_schema.is_partitioned
+    copy_sql = (f"COPY {schema}.{target_table} ({', '.join(columns)}) FROM STDIN"
+                f"{' WITH (FREEZE)' if freeze else ''}")
+    column_type_map = _build_column_type_map(columns, table_schema)
+    encoding = psycopg2.extensions.encodings.get(connection.encoding, 'utf-8')
+
+    rows_loaded = 0
+    try:
+        apply_local_settings(connection, settings)
+        with connection.cursor() as cursor:
+            if truncate:
+                cursor.execute(f"TRUNCATE {schema}.{target_table}")
+            else:
+                cursor.execute(f"LOCK TABLE {schema}.{target_table} IN SHARE ROW EXCLUSIVE MODE")
+                cursor.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {schema}.{target_table})")
+                if not cursor.fetchone()[0]:
+                    connection.rollback()
+                    logger.info(f"Table '{schema}.{target_table}' is no longer empty, using the upsert path")
+                    return None
+
+            for batch in iter_batches(rows, batch_size):
+                block = _serialize_copy_chunk(batch, columns, column_type_map, encoding, trusted_json_columns)
+                cursor.copy_expert(copy_sql, io.BytesIO(block))
+                rows_loaded += len(batch)
+
+        connection.commit()
+
+    except (psycopg2.Error, PgsqlUpserterError) as e:
+        connection.rollback()
+        if getattr(e, 'pgcode', None) == UNIQUE_VIOLATION and not truncate:
+            logger.info(f"Conflicting keys while loading '{schema}.{target_table}', using the upsert path")
+            return None
+        raise PgsqlUpserterError(f"Failed to bulk load '{schema}.{target_table}': {e}") from e
+
+    logger.info(f"Bulk loaded {rows_loaded} rows into '{schema}.{target_table}'"
+                f"{' (truncated, COPY FREEZE)' if freeze else ' (truncated)' if truncate else ''}")
+    return rows_loaded
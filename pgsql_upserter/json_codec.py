@@ -0,0 +1,66 @@
+"""JSON encoding and validation backend for json/jsonb columns.
+
+Uses orjson when it is installed and falls back to the standard library. orjson
+output is compact, which jsonb normalizes anyway.
+"""
+
+import json
+import logging
+
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_BACKENDS = ('orjson', 'json')
+
+_backend = 'orjson' if orjson is not None else 'json'
+
+
+def get_backend() -> str:
+    """Name of the JSON backend in use: "orjson" or "json"."""
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """Select the JSON backend ("orjson" requires the orjson package).
+
+    Raises:
+        ValueError: If the backend is unknown or not installed
+    """
+    global _backend
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Invalid JSON backend: {name!r}")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON backend 'orjson' requires the orjson package")
+    _backend = name
+
+
+def dumps(value: Any) -> str:
+    """Serialize a value to a JSON string."""
+    if _backend == 'orjson':
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            # Types orjson rejects (e.g. Decimal) get the stdlib error/behaviour
+            pass
+    return json.dumps(value)
+
+
+def is_valid_json(text: str) -> bool:
+    """Whether a string is a complete, valid JSON document."""
+    if _backend == 'orjson':
+        try:
+            orjson.loads(text)
+            return True
+        except orjson.JSONDecodeError:
+            return False
+    try:
+        json.loads(text)
+        return True
+    except json.JSONDecodeError:
+        return False
@@ -0,0 +1,238 @@
+"""Partition-aware routing of staged rows for declaratively partitioned targets.
+
+Applying staged rows to a partitioned parent makes the server route every tuple
+and check uniqueness through the parent. Routing instead groups the deduplicated
+staged rows by leaf partition up front, using each leaf's partition constraint
+(``pg_get_partition_constraintdef``, which covers the bounds of every level),
+and applies each group directly to its leaf.
+
+Rows that fit no existing partition are counted before anything is applied, so
+a missing partition is reported instead of failing the upsert halfway.
+
+Groups are applied in the caller's transaction by default. Parallel apply copies
+each group into an UNLOGGED table and applies the groups from worker connections,
+each committing on its own, so it is not atomic: a group failing with a deadlock
+or serialization failure is retried on its own, and a group that still fails
+leaves the other groups committed.
+"""
+
+import logging
+import uuid
+import psycopg2
+
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .schema_inspector import PartitionInfo, TableSchema
+from .retry import RetryPolicy, run_with_retry
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+UNROUTABLE_MODES = ('skip', 'error')
+
+
+@dataclass
+class PartitionRouting:
+    """Staged rows grouped by leaf partition."""
+    groups: dict[str, int]  # Leaf partition (qualified name) -> staged rows
+    unroutable: int
+    tables: dict[str, str] = field(default_factory=dict)  # Leaf partition -> table holding its rows
+    durable: bool = False  # Whether the group tables are committed UNLOGGED tables
+
+
+def _routing_expression(partitions: list[PartitionInfo]) -> str:
+    """CASE expression returning the index of the leaf partition a row belongs to."""
+    branches = [
+        f"WHEN {partition.constraint or 'true'} THEN {index}"
+        for index, partition in enumerate(partitions)
+    ]
+    return f"CASE {' '.join(branches)} END"
+
+
+def route_to_partitions(
+    connection,
+    temp_table_name: str,
+    table_schema: TableSchema,
+    staged_columns: list[str],
+    on_unroutable: str = 'skip',
+    durable: bool = False
+) -> PartitionRouting:
+    """Group the rows of a (deduplicated) temp table by leaf partition.
+
+    One pass counts the rows per partition; then the rows of each non-empty
+    partition are copied into their own table.
+
+    Args:
+        connection: Database connection
+        temp_table_name: Deduplicated temp table
+        table_schema: Schema of the partitioned target
+        staged_columns: Columns present in the temp table
+        on_unroutable: "skip" leaves rows fitting no partition out (they are counted),
+            "error" raises before any group is created
+        durable: Create the group tables as UNLOGGED tables visible to other
+            sessions (for parallel apply; the caller commits) instead of temp tables
+
+    Returns:
+        PartitionRouting: Row counts and group tables per leaf partition
+
+    Raises:
+        PgsqlUpserterError: If the target is not partitioned, its key is not staged,
+            or rows fit no partition with on_unroutable="error"
+    """
+    if on_unroutable not in UNROUTABLE_MODES:
+        raise ValueError(f"Invalid on_unroutable: {on_unroutable!r}")
+    if not table_schema.is_partitioned:
+        raise PgsqlUpserterError(f"Table '{table_schema.schema_name}.{table_schema.table_name}' is not partitioned")
+
+    missing_key = [col for col in table_schema.partition_key if col not in staged_columns]
+    if missing_key:
+        raise PgsqlUpserterError(f"Partition key columns {missing_key} are not staged, cannot route rows")
+
+    partitions = table_schema.partitions
+    try:
+        with connection.cursor() as cursor:
+            counts: dict[int | None, int] = {}
+            if partitions:
+                cursor.execute(f"""
+                    SELECT {_routing_expression(partitions)} AS partition_index, COUNT(*)
+                    FROM {temp_table_name}
+                    GROUP BY 1
+                """)
+                counts = dict(cursor.fetchall())
+            else:
+                cursor.execute(f"SELECT COUNT(*) FROM {temp_table_name}")
+                counts[None] = cursor.fetchone()[0]
+
+            unroutable = counts.pop(None, 0)
+            if unroutable:
+                message = (f"{unroutable} staged rows fit no existing partition of "
+                           f"'{table_schema.schema_name}.{table_schema.table_name}'")
+                if on_unroutable == 'error':
+                    raise PgsqlUpserterError(message)
+                logger.warning(f"{message}, skipping them")
+
+            routing = PartitionRouting(groups={}, unroutable=unroutable, durable=durable)
+            columns_sql = ', '.join(staged_columns)
+            for index in sorted(counts):
+                partition = partitions[index]
+                group_table = f"pgsql_upserter_part_{uuid.uuid4().hex[:8]}"
+                if durable:
+                    group_table = f"{table_schema.schema_name}.{group_table}"
+                    create = f"CREATE UNLOGGED TABLE {group_table}"
+                else:
+                    create = f"CREATE TEMP TABLE {group_table}"
+                cursor.execute(f"""
+                    {create} AS
+                    SELECT {columns_sql}
+                    FROM {temp_table_name}
+                    WHERE {partition.constraint or 'true'}
+                """)
+                routing.groups[partition.qualified_name] = counts[index]
+                routing.tables[partition.qualified_name] = group_table
+
+    except psycopg2.Error as e:
+        raise PgsqlUpserterError(f"Failed to route staged rows to partitions: {e}") from e
+
+    logger.info(f"Routed staged rows to {len(routing.groups)} partitions"
+                f"{f' ({unroutable} unroutable)' if unroutable else ''}")
+    return routing
+
+
+def apply_partition_groups(
+    connection,
+    routing: PartitionRouting,
+    apply_group: Callable[..., tuple[float, ...]],
+    workers: int = 0,
+    connection_factory: Callable[[], psycopg2.extensions.connection] | None = None,
+    retry_policy: RetryPolicy | None = None
+) -> tuple[float, ...]:
+    """Apply every routed group to its leaf partition.
+
+    Args:
+        connection: Connection owning the routing (used when applying sequentially)
+        routing: Result of route_to_partitions
+        apply_group: Called as ``apply_group(connection, group_table, partition_schema,
+            partition_name)``; returns a tuple of counters, e.g. (inserted, updated, deleted)
+        workers: Apply groups concurrently from this many worker connections. Requires
+            durable routing and connection_factory; each group commits separately
+        connection_factory: Opens a new connection for a worker
+        retry_policy: Retries of a worker's group on deadlocks and serialization
+            failures (default: RetryPolicy()). Sequential groups are retried by the caller
+
+    Returns:
+        The counters of apply_group summed over all groups
+
+    Raises:
+        PgsqlUpserterError: If a group fails to apply, raised from the first
+            worker error
+    """
+    def split(qualified_name: str) -> tuple[str, str]:
+        schema_name, _, name = qualified_name.partition('.')
+        return schema_name, name
+
+    def add(totals: tuple[float, ...] | None, counts: tuple[float, ...]) -> tuple[float, ...]:
+        return counts if totals is None else tuple(total + count for total, count in zip(totals, counts))
+
+    totals = None
+    if workers <= 0 or len(routing.tables) <= 1:
+        for partition, group_table in routing.tables.items():
+            totals = add(totals, apply_group(connection, group_table, *split(partition)))
+        return totals if totals is not None else (0, 0, 0, 0.0)
+
+    if not routing.durable or connection_factory is None:
+        raise PgsqlUpserterError("Parallel partition apply needs durable routing and a connection_factory")
+
+    def apply_in_worker(partition: str, group_table: str) -> tuple[float, ...]:
+        worker_connection = connection_factory()
+
+        def apply_and_commit() -> tuple[float, ...]:
+            counts = apply_group(worker_connection, group_table, *split(partition))
+            worker_connection.commit()
+            return counts
+
+        try:
+            counts, _ = run_with_retry(worker_connection, apply_and_commit, retry_policy or RetryPolicy())
+            return counts
+        except BaseException:
+            worker_connection.rollback()
+            raise
+        finally:
+            worker_connection.close()
+
+    # Outcome per group: its counters or the exception it failed with
+    outcomes: dict[str, tuple[float, ...] | BaseException] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pgsql_upserter-partition") as executor:
+        futures = {
+            executor.submit(apply_in_worker, partition, group_table): partition
+            for partition, group_table in routing.tables.items()
+        }
+        for future, partition in futures.items():
+            try:
+                outcomes[partition] = future.result()
+            except Exception as e:
+                outcomes[partition] = e
+
+    failures = {partition: outcome for partition, outcome in outcomes.items() if isinstance(outcome, BaseException)}
+    if failures:
+        details = '; '.join(f"{partition}: {error}" for partition, error in failures.items())
+        raise PgsqlUpserterError(f"Failed to apply {len(failures)} of {len(futures)} partition groups "
+                                 f"(the others are committed): {details}") from next(iter(failures.values()))
+    for counts in outcomes.values():
+        totals = add(totals, counts)
+    return totals
+
+
+def drop_routing_tables(connection, routing: PartitionRouting) -> None:
+    """Drop the group tables of a routing; durable ones are dropped and committed."""
+    if not routing.tables:
+        return
+    try:
+        with connection.cursor() as cursor:
+            for group_table in routing.tables.values():
+                cursor.execute(f"DROP TABLE IF EXISTS {group_table}")
+        if routing.durable:
+            connection.commit()
+    except psycopg2.Error as e:
+        logger.warning(f"Failed to drop partition routing tables: {e}")
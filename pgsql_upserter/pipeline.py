@@ -0,0 +1,201 @@
+"""Pipeline-mode upsert backend (psycopg 3).
+
+The psycopg2 workflow waits for every statement's result before sending the
+next, so a load costs one network round trip per statement and per staging
+batch. Apart from schema introspection, none of the statements depend on an
+earlier result, so with libpq pipeline mode they can be sent back to back:
+staging DDL, the insert batches, deduplication, the upsert, the counts and the
+commit are queued and their results collected at a single synchronization
+point. With a cached plan a whole load takes two round trips (plan check, then
+the pipeline).
+
+libpq does not allow COPY in pipeline mode, so rows are staged with multi-row
+INSERT statements instead. Requires psycopg 3: ``pip install
+'pgsql-upserter[pipeline]'``.
+"""
+
+import logging
+import uuid
+
+from pathlib import Path
+from typing import Any
+
+from .schema_inspector import TableSchema, inspect_table_schema
+from .column_matcher import IncrementalColumnMatcher
+from .temp_staging import build_temp_table_columns_sql, iter_batches, _build_column_type_map, _convert_rows
+from .conflict_resolver import (
+    ConflictStrategy,
+    build_deduplication_result,
+    build_upsert_sql,
+    find_arbiter_index,
+    find_conflict_strategy,
+)
+from .plan_cache import UpsertPlan, load_plan, table_fingerprint
+from .server_routine import _null_key_condition
+from .upsert_engine import UpsertResult
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+# Bind parameters per statement are limited to 65535
+_MAX_PARAMETERS = 65535
+
+
+def _require_psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise PgsqlUpserterError(
+            "The pipeline backend requires psycopg 3: pip install 'pgsql-upserter[pipeline]'") from e
+    return psycopg
+
+
+def _resolve_schema(
+    connection,
+    target_table: str,
+    schema: str,
+    plan: UpsertPlan | str | Path | None
+) -> TableSchema:
+    """Schema from a plan that still matches the table (one query), else by inspection."""
+    if isinstance(plan, (str, Path)):
+        plan = load_plan(plan)
+    if plan is not None and (plan.target_table, plan.schema) == (target_table, schema):
+        if table_fingerprint(connection, target_table, schema) == plan.fingerprint:
+            return plan.table_schema
+        logger.info(f"Cached plan for '{schema}.{target_table}' is stale, inspecting the table")
+    return inspect_table_schema(connection, target_table, schema)
+
+
+def execute_pipelined_upsert(
+    connection,
+    data: list[dict[str, Any]],
+    target_table: str,
+    conflict_columns: list[str] | None = None,
+    update_columns: list[str] | None = None,
+    batch_size: int = 1000,
+    schema: str = 'public',
+    plan: UpsertPlan | str | Path | None = None,
+    trust_json_columns: list[str] | None = None
+) -> UpsertResult:
+    """Upsert rows through a psycopg 3 connection in libpq pipeline mode.
+
+    Covers the INSERT ... ON CONFLICT and insert-only strategies of
+    execute_upsert_workflow with the same column matching, deduplication (last
+    row per conflict key, NULL keys dropped) and counts. The load runs in one
+    transaction that is committed on success.
+
+    Args:
+        connection: psycopg 3 connection (not in autocommit mode)
+        data: Rows to upsert
+        target_table: Target table name
+        conflict_columns: Override for the conflict columns (default: detected)
+        update_columns: Columns updated on conflict (default: all matched columns)
+        batch_size: Rows per staging INSERT statement (capped by the bind
+            parameter limit)
+        schema: Schema name (default: 'public')
+        plan: Cached UpsertPlan or plan file path; validated with one query
+        trust_json_columns: json/jsonb columns sent without client-side validation
+
+    Returns:
+        UpsertResult with execution_strategy "PIPELINE"
+
+    Raises:
+        ValueError: If data is empty
+        PgsqlUpserterError: If psycopg 3 is missing or the load fails
+    """
+    psycopg = _require_psycopg()
+    if not data:
+        raise ValueError("No data provided for upsert operation")
+
+    table_schema = _resolve_schema(connection, target_table, schema, plan)
+    columns_sql = build_temp_table_columns_sql(table_schema)
+    if columns_sql is None:
+        raise PgsqlUpserterError(f"Pipeline mode needs column type definitions of '{schema}.{target_table}'")
+
+    column_matcher = IncrementalColumnMatcher(table_schema)
+    column_matcher.observe_rows(data)
+    rows = list(column_matcher.track(data))
+    matched_columns = list(column_matcher.matched_columns)
+    if not matched_columns:
+        raise PgsqlUpserterError(f"No data keys match columns of '{schema}.{target_table}'")
+
+    if conflict_columns:
+        arbiter = find_arbiter_index(table_schema, conflict_columns)
+        conflict_strategy = ConflictStrategy(
+            type="USER_DEFINED",
+            columns=conflict_columns,
+            description=f"User-defined conflict resolution on: {conflict_columns}",
+            index_name=arbiter.name if arbiter else None,
+            index_predicate=arbiter.predicate if arbiter else None
+        )
+    else:
+        conflict_strategy = find_conflict_strategy(table_schema, matched_columns)
+    columns_to_update = update_columns or matched_columns
+    keys = conflict_strategy.columns if conflict_strategy.type != "INSERT_ONLY" else []
+
+    temp_table_name = f"temp_staging_{uuid.uuid4().hex[:8]}"
+    column_type_map = _build_column_type_map(matched_columns, table_schema)
+    rows_per_statement = max(1, min(batch_size, _MAX_PARAMETERS // len(matched_columns)))
+    row_placeholders = f"({', '.join(['%s'] * len(matched_columns))})"
+
+    if keys:
+        null_condition = _null_key_condition(table_schema, keys)
+        count_sql = f"""
+            SELECT count(*), count(*) FILTER (WHERE {null_condition})
+            FROM {temp_table_name}
+        """
+        source_sql = f"""
+            SELECT DISTINCT ON ({', '.join(keys)}) {', '.join(columns_to_update)}
+            FROM {temp_table_name}
+            WHERE NOT ({null_condition})
+            ORDER BY {', '.join(keys)}, ctid DESC
+        """
+    else:
+        count_sql = f"SELECT count(*), 0 FROM {temp_table_name}"
+        source_sql = f"SELECT {', '.join(columns_to_update)} FROM {temp_table_name}"
+
+    apply_sql = build_upsert_sql("deduplicated", target_table, conflict_strategy, columns_to_update, schema)
+    apply_sql = f"""
+        WITH deduplicated AS ({source_sql}),
+        applied AS (
+            {apply_sql.strip()}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT (SELECT count(*) FROM deduplicated), count(*) FILTER (WHERE inserted)
+        FROM applied
+    """
+
+    try:
+        with connection.pipeline():
+            connection.execute(f"CREATE TEMPORARY TABLE {temp_table_name} ({columns_sql}) ON COMMIT DROP")
+            for batch in iter_batches(rows, rows_per_statement):
+                values = _convert_rows(batch, matched_columns, column_type_map, trust_json_columns or ())
+                connection.execute(
+                    f"INSERT INTO {temp_table_name} ({', '.join(matched_columns)}) "
+                    f"VALUES {', '.join([row_placeholders] * len(values))}",
+                    [value for row in values for value in row],
+                    prepare=False
+                )
+            counts = connection.execute(count_sql)
+            applied = connection.execute(apply_sql)
+            connection.commit()
+
+        original_count, null_count = counts.fetchone()
+        deduplicated_count, rows_inserted = applied.fetchone()
+    except psycopg.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Pipelined upsert into '{schema}.{target_table}' failed: {e}") from e
+
+    logger.info(f"Pipelined upsert complete: {rows_inserted} inserted, "
+                f"{deduplicated_count - rows_inserted} updated")
+    return UpsertResult(
+        rows_inserted=rows_inserted,
+        rows_updated=deduplicated_count - rows_inserted,
+        total_affected=deduplicated_count,
+        deduplication_result=build_deduplication_result(original_count, null_count, deduplicated_count),
+        matched_columns=matched_columns,
+        conflict_strategy_type=conflict_strategy.type,
+        conflict_strategy_description=conflict_strategy.description,
+        execution_strategy="PIPELINE",
+        missing_columns=list(column_matcher.missing_columns)
+    )
@@ -0,0 +1,203 @@
+"""Persisted table plans for fast cold starts.
+
+Schema introspection costs several catalog round-trips per run. An ``UpsertPlan``
+snapshots the inspected ``TableSchema`` (including the staging table DDL) to a
+small JSON file, e.g. shipped with a serverless function or kept in ``/tmp``.
+On the next start the plan is checked against the database with a single
+fingerprint query and only rebuilt when the table changed.
+
+Column matching and conflict strategy selection depend on the data and run
+client-side from the cached schema, so they need no round-trip.
+"""
+
+import json
+import logging
+import os
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from .schema_inspector import (
+    ColumnInfo,
+    PartitionInfo,
+    TableSchema,
+    UniqueConstraint,
+    UniqueIndex,
+    database_errors,
+    inspect_table_schema,
+)
+from .temp_staging import build_temp_table_columns_sql
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+PLAN_FORMAT_VERSION = 2
+
+# Hash of everything TableSchema is derived from: columns, types, defaults,
+# generated columns, unique/primary constraints, valid unique indexes and leaf partitions
+_FINGERPRINT_SQL = """
+    SELECT CASE WHEN r.rel IS NULL THEN NULL ELSE md5(concat_ws('|',
+        (SELECT string_agg(format('%%s:%%s:%%s:%%s:%%s', a.attname, format_type(a.atttypid, a.atttypmod),
+                                  a.attnotnull, a.attgenerated, pg_get_expr(d.adbin, d.adrelid)),
+                           ',' ORDER BY a.attnum)
+         FROM pg_attribute a
+         LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+         WHERE a.attrelid = r.rel AND a.attnum > 0 AND NOT a.attisdropped),
+        (SELECT string_agg(format('%%s:%%s:%%s', c.conname, c.contype, c.conkey), ',' ORDER BY c.conname)
+         FROM pg_constraint c
+         WHERE c.conrelid = r.rel AND c.contype IN ('p', 'u')),
+        (SELECT string_agg(format('%%s:%%s:%%s:%%s', i.indexrelid::regclass, i.indkey, i.indisvalid,
+                                  pg_get_expr(i.indpred, i.indrelid)),
+                           ',' ORDER BY i.indexrelid::regclass::text)
+         FROM pg_index i
+         WHERE i.indrelid = r.rel AND i.indisunique),
+        (SELECT string_agg(format('%%s:%%s', t.relid::regclass, pg_get_expr(c.relpartbound, c.oid)),
+                           ',' ORDER BY t.relid::regclass::text)
+         FROM pg_partition_tree(r.rel) t
+         JOIN pg_class c ON c.oid = t.relid
+         WHERE t.relid <> r.rel)
+    )) END
+    FROM (SELECT to_regclass(%s) AS rel) r
+"""
+
+
+@dataclass
+class UpsertPlan:
+    """Cached per-table plan: inspected schema, staging DDL and validity fingerprint."""
+    table_schema: TableSchema
+    fingerprint: str
+    server_version: int
+    temp_table_columns_sql: str | None
+    format_version: int = PLAN_FORMAT_VERSION
+
+    @property
+    def target_table(self) -> str:
+        return self.table_schema.table_name
+
+    @property
+    def schema(self) -> str:
+        return self.table_schema.schema_name
+
+
+def table_fingerprint(connection, target_table: str, schema: str = 'public') -> str | None:
+    """Fingerprint of the target table's structure, or None if it does not exist.
+
+    Raises:
+        PgsqlUpserterError: If the catalog cannot be queried
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(_FINGERPRINT_SQL, (f"{schema}.{target_table}",))
+            return cursor.fetchone()[0]
+    except database_errors(connection) as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to fingerprint table '{schema}.{target_table}': {e}")
+
+
+def build_plan(connection, target_table: str, schema: str = 'public') -> UpsertPlan:
+    """Inspect the target table and build a fresh plan."""
+    fingerprint = table_fingerprint(connection, target_table, schema)
+    table_schema = inspect_table_schema(connection, target_table, schema)
+    return UpsertPlan(
+        table_schema=table_schema,
+        fingerprint=fingerprint,
+        server_version=connection.server_version,
+        temp_table_columns_sql=build_temp_table_columns_sql(table_schema)
+    )
+
+
+def is_plan_current(connection, plan: UpsertPlan) -> bool:
+    """Check a plan against the database with one fingerprint query."""
+    if plan.format_version != PLAN_FORMAT_VERSION or plan.server_version != connection.server_version:
+        return False
+    return table_fingerprint(connection, plan.target_table, plan.schema) == plan.fingerprint
+
+
+def save_plan(plan: UpsertPlan, path: str | Path) -> None:
+    """Write a plan as JSON, atomically replacing any previous file."""
+    plan_path = Path(path)
+    tmp_path = plan_path.with_name(f"{plan_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(asdict(plan), f, separators=(',', ':'))
+    os.replace(tmp_path, plan_path)
+    logger.debug(f"Saved plan for '{plan.schema}.{plan.target_table}' to '{plan_path}'")
+
+
+def _plan_from_dict(data: dict[str, Any]) -> UpsertPlan:
+    schema_data = data['table_schema']
+    primary_key = schema_data['primary_key']
+    return UpsertPlan(
+        table_schema=TableSchema(
+            table_name=schema_data['table_name'],
+            schema_name=schema_data['schema_name'],
+            columns=[ColumnInfo(**col) for col in schema_data['columns']],
+            unique_constraints=[UniqueConstraint(**uc) for uc in schema_data['unique_constraints']],
+            primary_key=UniqueConstraint(**primary_key) if primary_key else None,
+            unique_indexes=[UniqueIndex(**ix) for ix in schema_data['unique_indexes']],
+            partition_strategy=schema_data['partition_strategy'],
+            partition_key=schema_data['partition_key'],
+            partitions=[PartitionInfo(**part) for part in schema_data['partitions']]
+        ),
+        fingerprint=data['fingerprint'],
+        server_version=data['server_version'],
+        temp_table_columns_sql=data['temp_table_columns_sql'],
+        format_version=data['format_version']
+    )
+
+
+def load_plan(path: str | Path) -> UpsertPlan | None:
+    """Read a plan file; returns None when it is missing, unreadable or outdated."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format_version') != PLAN_FORMAT_VERSION:
+            logger.info(f"Ignoring plan '{path}' with format version {data.get('format_version')}")
+            return None
+        return _plan_from_dict(data)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable plan '{path}': {e}")
+        return None
+
+
+def get_plan(
+    connection,
+    target_table: str,
+    schema: str = 'public',
+    plan: UpsertPlan | str | Path | None = None
+) -> UpsertPlan:
+    """Return a current plan for the target table, reusing a cached one when valid.
+
+    Args:
+        connection: Active PostgreSQL connection
+        target_table: Target table name
+        schema: Schema name (default: 'public')
+        plan: An in-memory plan or the path of a plan file. A stale or missing plan
+            is rebuilt, and written back when a path was given
+
+    Returns:
+        UpsertPlan: A plan matching the current table structure
+    """
+    plan_path = None
+    if isinstance(plan, (str, Path)):
+        plan_path = plan
+        plan = load_plan(plan_path)
+
+    if plan is not None and (plan.target_table, plan.schema) != (target_table, schema):
+        logger.info(f"Cached plan is for '{plan.schema}.{plan.target_table}', rebuilding")
+        plan = None
+
+    if plan is not None and is_plan_current(connection, plan):
+        logger.debug(f"Using cached plan for '{schema}.{target_table}'")
+        return plan
+
+    logger.info(f"Building plan for '{schema}.{target_table}'")
+    plan = build_plan(connection, target_table, schema)
+    if plan_path is not None:
+        try:
+            save_plan(plan, plan_path)
+        except OSError as e:
+            logger.warning(f"Failed to save plan to '{plan_path}': {e}")
+    return plan
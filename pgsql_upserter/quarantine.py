@@ -0,0 +1,349 @@
+"""Error-tolerant staging: quarantine bad rows instead of failing the whole load.
+
+Rows are first copied as text into a raw staging table, so no value can fail the
+load itself. Values are then validated set-wise against the target column types
+(``pg_input_is_valid`` on PostgreSQL 16+, a per-value cast helper before that),
+followed by NOT NULL and CHECK constraints. Failing rows are flagged with a
+reason and written to a reject table and/or NDJSON file; the remaining rows are
+cast into the typed temp table in their original order.
+"""
+
+import json
+import logging
+import psycopg2
+
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .schema_inspector import TableSchema
+from .temp_staging import pipelined_insert_to_temp, _cleanup_temp_table
+from .session_tuning import apply_local_settings
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+INPUT_VALIDATION_MIN_SERVER_VERSION = 160000
+
+ROW_NUMBER_COLUMN = "pgsql_upserter_row"
+REJECT_KIND_COLUMN = "pgsql_upserter_reject_kind"
+REJECT_REASON_COLUMN = "pgsql_upserter_reject_reason"
+
+REJECT_INVALID_VALUE = "rejected_invalid_value"
+REJECT_NOT_NULL = "rejected_not_null"
+REJECT_CHECK_CONSTRAINT = "rejected_check_constraint"
+
+# Cast helper for servers without pg_input_is_valid(): error message, or NULL when valid
+_INPUT_ERROR_FUNCTION = "pg_temp.pgsql_upserter_input_error"
+_CREATE_INPUT_ERROR_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION {_INPUT_ERROR_FUNCTION}(value text, type_name text)
+    RETURNS text LANGUAGE plpgsql STRICT AS $$
+    BEGIN
+        -- Explicit casts truncate, assignment (as in INSERT) rejects over-long strings
+        IF type_name ~ '^(character|character varying)\\(\\d+\\)$'
+           AND length(value) > substring(type_name FROM '\\((\\d+)\\)')::int THEN
+            RETURN format('value too long for type %s', type_name);
+        END IF;
+        EXECUTE format('SELECT %L::%s', value, type_name);
+        RETURN NULL;
+    EXCEPTION WHEN others THEN
+        RETURN SQLERRM;
+    END
+    $$
+"""
+
+# Types whose text input always succeeds
+_TEXT_TYPES = ('text', 'character varying')
+
+
+@dataclass
+class QuarantineResult:
+    """Outcome of error-tolerant staging."""
+    rows_staged: int
+    rows_rejected: int
+    rejected_reasons: dict[str, int] = field(default_factory=dict)
+
+
+def _column_types(cursor, temp_table_name: str) -> dict[str, str]:
+    """Full type definitions of the columns of a (typed) temp table."""
+    cursor.execute("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+    """, (temp_table_name,))
+    return dict(cursor.fetchall())
+
+
+def _check_constraints(cursor, table_schema: TableSchema, staged_columns: list[str]) -> list[tuple[str, str]]:
+    """(name, expression) of the target's CHECK constraints that only use staged columns."""
+    cursor.execute("""
+        SELECT
+            c.conname,
+            pg_get_expr(c.conbin, c.conrelid),
+            ARRAY(
+                SELECT a.attname::text
+                FROM pg_attribute a
+                WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+            )
+        FROM pg_constraint c
+        WHERE c.conrelid = format('%%I.%%I', %s, %s)::regclass AND c.contype = 'c'
+        ORDER BY c.conname
+    """, (table_schema.schema_name, table_schema.table_name))
+
+    constraints = []
+    for name, expression, columns in cursor.fetchall():
+        if set(columns) <= set(staged_columns):
+            constraints.append((name, expression))
+        else:
+            logger.debug(f"Not pre-checking constraint '{name}': it uses unstaged columns")
+    return constraints
+
+
+def _flag_rows(cursor, raw_table: str, kind: str, conditions: list[tuple[str, str]]) -> int:
+    """Flag unflagged rows matching any (condition, reason expression) pair; returns rows flagged."""
+    if not conditions:
+        return 0
+    reason_sql = " ".join(f"WHEN {condition} THEN {reason}" for condition, reason in conditions)
+    any_condition = " OR ".join(f"({condition})" for condition, _ in conditions)
+    cursor.execute(f"""
+        UPDATE {raw_table} r
+        SET {REJECT_KIND_COLUMN} = %s, {REJECT_REASON_COLUMN} = CASE {reason_sql} END
+        WHERE {REJECT_KIND_COLUMN} IS NULL AND ({any_condition})
+    """, (kind,))
+    return cursor.rowcount
+
+
+def _flag_check_violations(
+    cursor,
+    raw_table: str,
+    columns: list[str],
+    column_types: dict[str, str],
+    constraints: list[tuple[str, str]]
+) -> int:
+    """Flag unflagged rows violating a CHECK constraint once cast; returns rows flagged.
+
+    Only rows that passed the earlier checks are cast: they are selected in a
+    materialized CTE first, so the planner cannot evaluate a cast on a row that
+    was flagged for holding an invalid value.
+    """
+    if not constraints or not columns:
+        return 0
+    typed_columns = ', '.join(f"{col}::{column_types[col]} AS {col}" for col in columns)
+    reason_sql = " ".join(f"WHEN NOT coalesce({expression}, true) THEN "
+                          f"'violates check constraint {name.replace(chr(39), chr(39) * 2)}'"
+                          for name, expression in constraints)
+    reason_sql = reason_sql.replace('%', '%%')  # e.g. LIKE patterns, not query parameters
+    cursor.execute(f"""
+        WITH ok AS MATERIALIZED (
+            SELECT {ROW_NUMBER_COLUMN}, {typed_columns}
+            FROM {raw_table}
+            WHERE {REJECT_KIND_COLUMN} IS NULL
+        ),
+        violations AS (
+            SELECT {ROW_NUMBER_COLUMN}, CASE {reason_sql} END AS reason
+            FROM ok
+        )
+        UPDATE {raw_table} r
+        SET {REJECT_KIND_COLUMN} = %s, {REJECT_REASON_COLUMN} = v.reason
+        FROM violations v
+        WHERE r.{ROW_NUMBER_COLUMN} = v.{ROW_NUMBER_COLUMN} AND v.reason IS NOT NULL
+    """, (REJECT_CHECK_CONSTRAINT,))
+    return cursor.rowcount
+
+
+def _write_reject_file(cursor, raw_table: str, target_table: str, reject_file: str | Path) -> None:
+    """Append rejected rows to an NDJSON file."""
+    cursor.execute(f"""
+        SELECT {ROW_NUMBER_COLUMN}, {REJECT_KIND_COLUMN}, {REJECT_REASON_COLUMN},
+               to_jsonb(r) - '{ROW_NUMBER_COLUMN}' - '{REJECT_KIND_COLUMN}' - '{REJECT_REASON_COLUMN}'
+        FROM {raw_table} r
+        WHERE {REJECT_KIND_COLUMN} IS NOT NULL
+        ORDER BY {ROW_NUMBER_COLUMN}
+    """)
+    with open(reject_file, 'a', encoding='utf-8') as f:
+        for row_number, kind, reason, row_data in cursor:
+            f.write(json.dumps({
+                'target_table': target_table,
+                'row_number': row_number,
+                'reject_kind': kind,
+                'reason': reason,
+                'row': row_data,
+            }) + '\n')
+
+
+def _write_reject_table(cursor, raw_table: str, target_table: str, reject_table: str, schema: str) -> None:
+    """Insert rejected rows into a reject table, creating it if needed."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{reject_table} (
+            rejected_at timestamptz NOT NULL DEFAULT now(),
+            target_table text NOT NULL,
+            row_number bigint NOT NULL,
+            reject_kind text NOT NULL,
+            reason text,
+            row_data jsonb NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {schema}.{reject_table} (target_table, row_number, reject_kind, reason, row_data)
+        SELECT %s, {ROW_NUMBER_COLUMN}, {REJECT_KIND_COLUMN}, {REJECT_REASON_COLUMN},
+               to_jsonb(r) - '{ROW_NUMBER_COLUMN}' - '{REJECT_KIND_COLUMN}' - '{REJECT_REASON_COLUMN}'
+        FROM {raw_table} r
+        WHERE {REJECT_KIND_COLUMN} IS NOT NULL
+        ORDER BY {ROW_NUMBER_COLUMN}
+    """, (f"{schema}.{target_table}",))
+
+
+def quarantine_stage(
+    connection,
+    temp_table_name: str,
+    data_list: Iterable[dict[str, Any]],
+    staged_columns: list[str],
+    table_schema: TableSchema,
+    target_table: str,
+    schema: str = 'public',
+    batch_size: int = 5000,
+    reject_table: str | None = None,
+    reject_file: str | Path | None = None,
+    workers: int = 0,
+    trusted_json_columns: Collection[str] = (),
+    settings: dict[str, str] | None = None,
+    commit: bool = True
+) -> QuarantineResult:
+    """Stage rows into a typed temp table, quarantining rows that cannot be loaded.
+
+    Args:
+        connection: Active PostgreSQL connection
+        temp_table_name: Existing typed temp table to populate
+        data_list: Rows to stage (list or any iterable)
+        staged_columns: Columns to stage; may grow while data_list is iterated
+        table_schema: Target table schema (value conversion, NOT NULL checks)
+        target_table: Target table name (recorded with rejects, CHECK constraints)
+        schema: Schema name (default: 'public')
+        batch_size: Rows per COPY block into the raw table
+        reject_table: Table (in schema) receiving rejected rows; created if missing
+        reject_file: NDJSON file rejected rows are appended to
+        workers: Conversion processes for the raw COPY (see pipelined_insert_to_temp)
+        trusted_json_columns: json/jsonb columns sent without client-side validation
+        settings: Server settings applied with SET LOCAL in every staging transaction
+        commit: Whether to commit each step. When False everything runs in the
+            caller's transaction, which is left to the caller on failure
+
+    Returns:
+        QuarantineResult: Rows staged and rejected, with reject counts per reason
+
+    Raises:
+        PgsqlUpserterError: If staging itself fails
+    """
+    raw_table = f"{temp_table_name}_raw"
+
+    try:
+        apply_local_settings(connection, settings)
+        with connection.cursor() as cursor:
+            column_types = _column_types(cursor, temp_table_name)
+            raw_columns = ', '.join(f"{name} text" for name in column_types)
+            cursor.execute(f"""
+                CREATE TEMP TABLE {raw_table} (
+                    {ROW_NUMBER_COLUMN} bigserial,
+                    {REJECT_KIND_COLUMN} text,
+                    {REJECT_REASON_COLUMN} text,
+                    {raw_columns}
+                ){'' if commit else ' ON COMMIT DROP'}
+            """)
+        if commit:
+            connection.commit()
+    except psycopg2.Error as e:
+        if commit:
+            connection.rollback()
+        raise PgsqlUpserterError(f"Failed to create raw staging table: {e}")
+
+    # Text columns accept any value, so only encoding problems can fail this step
+    apply_local_settings(connection, settings)
+    rows_loaded = pipelined_insert_to_temp(
+        connection=connection,
+        temp_table_name=raw_table,
+        data_list=data_list,
+        matched_columns=staged_columns,
+        target_schema=table_schema,
+        batch_size=batch_size,
+        commit=commit,
+        workers=workers,
+        trusted_json_columns=trusted_json_columns
+    )
+
+    columns = list(staged_columns)
+    rejected_reasons = {}
+    try:
+        apply_local_settings(connection, settings)
+        with connection.cursor() as cursor:
+            # 1. Values that are not valid input for their column type
+            if connection.server_version >= INPUT_VALIDATION_MIN_SERVER_VERSION:
+                def is_invalid(col: str, type_sql: str) -> str:
+                    return f"NOT pg_input_is_valid({col}, {type_sql})"
+
+                def error_message(col: str, type_sql: str) -> str:
+                    return f"(pg_input_error_info({col}, {type_sql})).message"
+            else:
+                cursor.execute(_CREATE_INPUT_ERROR_FUNCTION)
+
+                def is_invalid(col: str, type_sql: str) -> str:
+                    return f"{_INPUT_ERROR_FUNCTION}({col}, {type_sql}) IS NOT NULL"
+
+                def error_message(col: str, type_sql: str) -> str:
+                    return f"{_INPUT_ERROR_FUNCTION}({col}, {type_sql})"
+
+            cast_conditions = []
+            for col in columns:
+                if column_types[col] in _TEXT_TYPES:
+                    continue
+                type_sql = cursor.mogrify("%s", (column_types[col],)).decode()
+                cast_conditions.append((
+                    f"{col} IS NOT NULL AND {is_invalid(col, type_sql)}",
+                    f"'{col}: ' || {error_message(col, type_sql)}"
+                ))
+            rejected_reasons[REJECT_INVALID_VALUE] = _flag_rows(
+                cursor, raw_table, REJECT_INVALID_VALUE, cast_conditions)
+
+            # 2. NULLs in NOT NULL columns
+            not_null_columns = [c.name for c in table_schema.columns if not c.is_nullable and c.name in columns]
+            rejected_reasons[REJECT_NOT_NULL] = _flag_rows(cursor, raw_table, REJECT_NOT_NULL, [
+                (f"{col} IS NULL", f"'{col}: null value violates not-null constraint'")
+                for col in not_null_columns
+            ])
+
+            # 3. CHECK constraints, evaluated on the cast values of the rows still unflagged
+            rejected_reasons[REJECT_CHECK_CONSTRAINT] = _flag_check_violations(
+                cursor, raw_table, columns, column_types, _check_constraints(cursor, table_schema, columns))
+
+            rejected_reasons = {reason: count for reason, count in rejected_reasons.items() if count}
+            rows_rejected = sum(rejected_reasons.values())
+
+            if rows_rejected:
+                if reject_table:
+                    _write_reject_table(cursor, raw_table, target_table, reject_table, schema)
+                if reject_file:
+                    _write_reject_file(cursor, raw_table, f"{schema}.{target_table}", reject_file)
+                logger.warning(f"Quarantined {rows_rejected} of {rows_loaded} rows: {rejected_reasons}")
+
+            # Cast the remaining rows into the typed temp table, keeping input order
+            cursor.execute(f"""
+                INSERT INTO {temp_table_name} ({', '.join(columns)})
+                SELECT {', '.join(f'{col}::{column_types[col]}' for col in columns)}
+                FROM {raw_table}
+                WHERE {REJECT_KIND_COLUMN} IS NULL
+                ORDER BY {ROW_NUMBER_COLUMN}
+            """)
+            rows_staged = cursor.rowcount
+            cursor.execute(f"DROP TABLE {raw_table}")
+
+        if commit:
+            connection.commit()
+
+    except (psycopg2.Error, OSError) as e:
+        if commit:
+            connection.rollback()
+            _cleanup_temp_table(connection, raw_table)
+        raise PgsqlUpserterError(f"Failed to quarantine staged rows: {e}") from e
+
+    logger.info(f"Staged {rows_staged} rows into '{temp_table_name}' ({rows_rejected} quarantined)")
+    return QuarantineResult(rows_staged=rows_staged, rows_rejected=rows_rejected, rejected_reasons=rejected_reasons)
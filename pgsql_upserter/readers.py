@@ -0,0 +1,143 @@
+"""Streaming file readers feeding the staging pipeline.
+
+Readers yield one dictionary per record and never load a whole file: CSV and
+NDJSON are parsed line by line (transparently decompressing ``.gz`` files) and
+Parquet is read one row group at a time.
+"""
+
+import csv
+import gzip
+import json
+import logging
+
+from pathlib import Path
+from typing import Any, Iterator
+
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+FILE_FORMATS = ('csv', 'ndjson', 'parquet')
+
+_FORMAT_SUFFIXES = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+
+_JSON_SNIFF_BYTES = 4096
+
+
+def detect_file_format(path: str | Path) -> tuple[str, bool]:
+    """Detect the file format from the file extension.
+
+    ``.json`` files are taken as NDJSON unless they start with ``[``: a JSON
+    array cannot be streamed, so it is rejected instead of failing on its first line.
+
+    Args:
+        path: Path to the data file
+
+    Returns:
+        Tuple of (format, is_gzipped), e.g. ``('csv', True)`` for ``data.csv.gz``
+
+    Raises:
+        PgsqlUpserterError: If the extension is not recognized or the file is a JSON array
+    """
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    is_gzipped = bool(suffixes) and suffixes[-1] == '.gz'
+    if is_gzipped:
+        suffixes = suffixes[:-1]
+
+    if suffixes and suffixes[-1] in _FORMAT_SUFFIXES:
+        return _FORMAT_SUFFIXES[suffixes[-1]], is_gzipped
+    if suffixes and suffixes[-1] == '.json':
+        if _starts_with_array(Path(path), is_gzipped):
+            raise PgsqlUpserterError(f"'{path}' holds a JSON array, which cannot be streamed: convert it to "
+                                     f"NDJSON (one object per line) or load it and pass the list of records")
+        return 'ndjson', is_gzipped
+
+    raise PgsqlUpserterError(f"Cannot detect file format of '{path}', pass file_format explicitly "
+                             f"(one of {', '.join(FILE_FORMATS)})")
+
+
+def _starts_with_array(path: Path, is_gzipped: bool) -> bool:
+    """Whether the first non-whitespace character of a JSON file is ``[``."""
+    try:
+        with _open_text(path, is_gzipped) as f:
+            head = f.read(_JSON_SNIFF_BYTES).lstrip('\ufeff \t\r\n')
+    except (OSError, UnicodeDecodeError):
+        # Reading the records reports the problem
+        return False
+    return head.startswith('[')
+
+
+def _open_text(path: Path, is_gzipped: bool):
+    """Open a (possibly gzipped) UTF-8 text file for streaming."""
+    if is_gzipped:
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _iter_csv(path: Path, is_gzipped: bool) -> Iterator[dict[str, Any]]:
+    with _open_text(path, is_gzipped) as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_ndjson(path: Path, is_gzipped: bool) -> Iterator[dict[str, Any]]:
+    with _open_text(path, is_gzipped) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise PgsqlUpserterError(f"Invalid JSON on line {line_number} of '{path}': {e}") from e
+            if not isinstance(record, dict):
+                raise PgsqlUpserterError(f"Line {line_number} of '{path}' is not a JSON object")
+            yield record
+
+
+def _iter_parquet(path: Path) -> Iterator[dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise PgsqlUpserterError(
+            "Reading Parquet files requires pyarrow: pip install 'pgsql-upserter[parquet]'") from e
+
+    parquet_file = pq.ParquetFile(path)
+    for row_group in range(parquet_file.num_row_groups):
+        yield from parquet_file.read_row_group(row_group).to_pylist()
+
+
+def iter_records(path: str | Path, file_format: str | None = None) -> Iterator[dict[str, Any]]:
+    """Stream records from a CSV, NDJSON or Parquet file.
+
+    Args:
+        path: Path to the data file. CSV and NDJSON files may be gzip-compressed
+        file_format: One of "csv", "ndjson" or "parquet". Detected from the
+            extension when omitted (``.csv``, ``.ndjson``/``.jsonl``/``.json``,
+            ``.parquet``, each optionally followed by ``.gz`` except Parquet).
+            ``.json`` files must hold one object per line, not an array
+
+    Returns:
+        Iterator of dictionaries, one per record. CSV values are strings
+
+    Raises:
+        PgsqlUpserterError: If the format is unknown or the file cannot be parsed
+    """
+    file_path = Path(path)
+    detected_format, is_gzipped = detect_file_format(file_path) if file_format is None else (
+        file_format, file_path.suffix.lower() == '.gz')
+
+    logger.debug(f"Streaming {detected_format} records from '{file_path}' (gzip: {is_gzipped})")
+
+    if detected_format == 'csv':
+        return _iter_csv(file_path, is_gzipped)
+    if detected_format == 'ndjson':
+        return _iter_ndjson(file_path, is_gzipped)
+    if detected_format == 'parquet':
+        return _iter_parquet(file_path)
+
+    raise PgsqlUpserterError(f"Unsupported file format: {detected_format!r} (expected one of {', '.join(FILE_FORMATS)})")
@@ -0,0 +1,114 @@
+"""Retry policy for apply steps failing on transient concurrency errors."""
+
+import logging
+import random
+import time
+
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from .exceptions import ConcurrencyError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# serialization_failure and deadlock_detected
+RETRYABLE_SQLSTATES = frozenset({'40001', '40P01'})
+
+_RETRY_SAVEPOINT = "pgsql_upserter_retry"
+
+
+@dataclass
+class RetryPolicy:
+    """Retry settings for the apply step (deduplication and upsert).
+
+    Delays use exponential backoff with full jitter: attempt ``n`` sleeps a random
+    time between 0 and ``min(max_delay, base_delay * 2 ** (n - 1))`` seconds.
+    """
+    max_attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Sleep time in seconds after the given failed attempt (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def retryable_sqlstate(error: BaseException) -> str | None:
+    """Return the SQLSTATE of a retryable database error in the exception chain, if any."""
+    seen = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        pgcode = getattr(current, 'pgcode', None)
+        if pgcode in RETRYABLE_SQLSTATES:
+            return pgcode
+        current = current.__cause__ or current.__context__
+    return None
+
+
+def run_with_retry(
+    connection,
+    step: Callable[[], T],
+    policy: RetryPolicy,
+    savepoint: bool = False
+) -> tuple[T, int]:
+    """Run a transactional step, rolling back and retrying on concurrency errors.
+
+    The step must only depend on state committed before it started (such as a
+    populated staging table), since a failed attempt is rolled back entirely.
+    With ``savepoint`` only the step is rolled back, to a savepoint taken before
+    each attempt, so it may also depend on earlier work of the same transaction.
+    Only deadlocks are retried then: a rolled-back-to savepoint keeps the
+    transaction's snapshot, so under REPEATABLE READ or SERIALIZABLE a
+    serialization failure would recur, and it raises ConcurrencyError at once.
+
+    Args:
+        connection: Database connection the step runs on
+        step: Callable performing the step; its return value is passed through
+        policy: Retry settings
+        savepoint: Retry within the current transaction instead of rolling it back
+
+    Returns:
+        Tuple of (step result, number of retries performed)
+
+    Raises:
+        ConcurrencyError: If the step still fails after ``policy.max_attempts`` attempts,
+            or at once on a serialization failure in savepoint mode
+    """
+    for attempt in range(1, policy.max_attempts + 1):
+        try:
+            if savepoint:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SAVEPOINT {_RETRY_SAVEPOINT}")
+            result = step()
+            if savepoint:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"RELEASE SAVEPOINT {_RETRY_SAVEPOINT}")
+            return result, attempt - 1
+        except Exception as e:
+            sqlstate = retryable_sqlstate(e)
+            if sqlstate is None:
+                raise
+
+            if savepoint:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {_RETRY_SAVEPOINT}")
+                if sqlstate == '40001':
+                    # The transaction keeps its snapshot, so the retry would fail the same way
+                    raise ConcurrencyError(
+                        f"Apply step failed with SQLSTATE {sqlstate}; a serialization failure cannot be "
+                        f"retried inside the transaction, retry the whole transaction: {e}") from e
+            else:
+                connection.rollback()
+            if attempt == policy.max_attempts:
+                raise ConcurrencyError(
+                    f"Apply step failed with SQLSTATE {sqlstate} after {attempt} attempts: {e}") from e
+
+            delay = policy.delay(attempt)
+            logger.warning(f"Apply step failed with SQLSTATE {sqlstate} (attempt {attempt}/{policy.max_attempts}), "
+                           f"retrying in {delay:.3f}s")
+            time.sleep(delay)
+
+    raise ConcurrencyError("Retry policy allows no attempts")
@@ -3,7 +3,7 @@
 import logging
 import psycopg2
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from psycopg2.extras import RealDictCursor
 
 from .exceptions import TableNotFoundError, SchemaIntrospectionError
@@ -20,6 +20,7 @@ class ColumnInfo:
     default_value: str | None
     is_auto_generated: bool
     ordinal_position: int
+    type_definition: str | None = None  # Full type with modifiers, e.g. "numeric(12,2)"
 
 
 @dataclass
@@ -30,6 +31,34 @@ class UniqueConstraint:
     is_primary: bool
 
 
+@dataclass
+class UniqueIndex:
+    """Information about a valid unique index usable as an ON CONFLICT arbiter."""
+    name: str
+    columns: list[str]
+    is_primary: bool
+    predicate: str | None  # WHERE clause of a partial index
+    size_bytes: int
+
+    @property
+    def is_partial(self) -> bool:
+        """Whether the index only covers rows matching its predicate."""
+        return self.predicate is not None
+
+
+@dataclass
+class PartitionInfo:
+    """A leaf partition of a partitioned table."""
+    name: str
+    schema_name: str
+    bound: str | None  # Bound relative to the parent, e.g. "FOR VALUES FROM (...) TO (...)"
+    constraint: str | None  # Full partition constraint over the table's columns, None if unconstrained
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.schema_name}.{self.name}"
+
+
 @dataclass
 class TableSchema:
     """Complete table schema information."""
@@ -38,6 +67,15 @@ class TableSchema:
     columns: list[ColumnInfo]
     unique_constraints: list[UniqueConstraint]
     primary_key: UniqueConstraint | None
+    unique_indexes: list[UniqueIndex] = field(default_factory=list)
+    partition_strategy: str | None = None  # "range", "list" or "hash" for partitioned tables
+    partition_key: list[str] = field(default_factory=list)  # Key columns (expressions are left out)
+    partitions: list[PartitionInfo] = field(default_factory=list)  # Leaf partitions
+
+    @property
+    def is_partitioned(self) -> bool:
+        """Whether the table is declaratively partitioned."""
+        return self.partition_strategy is not None
 
     @property
     def valid_columns(self) -> list[str]:
@@ -99,7 +137,7 @@ def inspect_table_schema(
         SchemaIntrospectionError: If schema cannot be introspected
     """
     try:
-        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+        with _dict_cursor(connection) as cursor:
             # First, verify table exists
             cursor.execute("""
                 SELECT 1 FROM information_schema.tables
@@ -115,24 +153,54 @@ def inspect_table_schema(
             # Get unique constraints
             unique_constraints = _get_unique_constraints(cursor, table_name, schema)
 
+            # Get unique indexes (arbiter candidates, including partial ones)
+            unique_indexes = _get_unique_indexes(cursor, table_name, schema)
+
             # Find primary key
             primary_key = next((uc for uc in unique_constraints if uc.is_primary), None)
 
+            # Partitioning (declaratively partitioned targets only)
+            partition_strategy, partition_key, partitions = _get_partitioning(cursor, table_name, schema)
+
             logger.debug(f"Successfully introspected table '{schema}.{table_name}' "
-                         f"with {len(columns)} columns and {len(unique_constraints)} constraints")
+                         f"with {len(columns)} columns, {len(unique_constraints)} constraints "
+                         f"and {len(unique_indexes)} unique indexes")
 
             return TableSchema(
                 table_name=table_name,
                 schema_name=schema,
                 columns=columns,
                 unique_constraints=unique_constraints,
-                primary_key=primary_key
+                primary_key=primary_key,
+                unique_indexes=unique_indexes,
+                partition_strategy=partition_strategy,
+                partition_key=partition_key,
+                partitions=partitions
             )
 
-    except psycopg2.Error as e:
+    except database_errors(connection) as e:
         raise SchemaIntrospectionError(f"Failed to introspect table '{schema}.{table_name}': {e}")
 
 
+def database_errors(connection) -> tuple[type[Exception], ...]:
+    """Exception classes raised for database errors by the connection's driver (psycopg2 or psycopg 3)."""
+    if isinstance(connection, psycopg2.extensions.connection):
+        return (psycopg2.Error,)
+    try:
+        import psycopg
+    except ImportError:
+        return (psycopg2.Error,)
+    return (psycopg2.Error, psycopg.Error)
+
+
+def _dict_cursor(connection):
+    """Cursor returning rows as dicts, for psycopg2 or psycopg 3 connections."""
+    if isinstance(connection, psycopg2.extensions.connection):
+        return connection.cursor(cursor_factory=RealDictCursor)
+    from psycopg.rows import dict_row
+    return connection.cursor(row_factory=dict_row)
+
+
 def _get_columns_info(cursor, table_name: str, schema: str) -> list[ColumnInfo]:
     """Get detailed column information from information_schema."""
     cursor.execute("""
@@ -143,7 +211,13 @@ def _get_columns_info(cursor, table_name: str, schema: str) -> list[ColumnInfo]:
             c.column_default,
             c.ordinal_position,
             c.is_generated,
-            c.generation_expression
+            c.generation_expression,
+            (
+                SELECT format_type(a.atttypid, a.atttypmod)
+                FROM pg_attribute a
+                WHERE a.attrelid = format('%%I.%%I', c.table_schema, c.table_name)::regclass
+                    AND a.attname = c.column_name
+            ) AS type_definition
         FROM information_schema.columns c
         WHERE c.table_schema = %s AND c.table_name = %s
         ORDER BY c.ordinal_position
@@ -170,7 +244,8 @@ def _get_columns_info(cursor, table_name: str, schema: str) -> list[ColumnInfo]:
             is_nullable=row['is_nullable'] == 'YES',
             default_value=row['column_default'],
             is_auto_generated=is_auto_generated,
-            ordinal_position=row['ordinal_position']
+            ordinal_position=row['ordinal_position'],
+            type_definition=row['type_definition']
         ))
 
     return columns
@@ -215,3 +290,95 @@ def _get_unique_constraints(cursor, table_name: str, schema: str) -> list[Unique
         ))
 
     return constraints
+
+
+def _get_unique_indexes(cursor, table_name: str, schema: str) -> list[UniqueIndex]:
+    """Get valid unique indexes from pg_index.
+
+    Expression indexes are skipped since their conflict target cannot be expressed
+    as a column list. INCLUDE columns are not part of the key and are left out.
+    """
+    cursor.execute("""
+        SELECT
+            i.relname AS index_name,
+            ix.indisprimary AS is_primary,
+            array_agg(a.attname::text ORDER BY k.ord) AS columns,
+            pg_get_expr(ix.indpred, ix.indrelid) AS predicate,
+            pg_relation_size(ix.indexrelid) AS size_bytes
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        CROSS JOIN LATERAL unnest(ix.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+        WHERE n.nspname = %s
+            AND t.relname = %s
+            AND ix.indisunique
+            AND ix.indisvalid
+            AND ix.indexprs IS NULL
+            AND k.ord <= ix.indnkeyatts
+        GROUP BY i.relname, ix.indisprimary, ix.indpred, ix.indrelid, ix.indexrelid
+        ORDER BY i.relname
+    """, (schema, table_name))
+
+    return [
+        UniqueIndex(
+            name=row['index_name'],
+            columns=list(row['columns']),
+            is_primary=row['is_primary'],
+            predicate=row['predicate'],
+            size_bytes=row['size_bytes']
+        )
+        for row in cursor.fetchall()
+    ]
+
+
+_PARTITION_STRATEGIES = {'r': 'range', 'l': 'list', 'h': 'hash'}
+
+
+def _get_partitioning(cursor, table_name: str, schema: str) -> tuple[str | None, list[str], list[PartitionInfo]]:
+    """Get the partition strategy, key columns and leaf partitions of a partitioned table.
+
+    Leaf partitions of sub-partitioned tables are included; their constraint
+    covers the bounds of every level.
+    """
+    cursor.execute("""
+        SELECT
+            pt.partstrat,
+            ARRAY(
+                SELECT a.attname::text
+                FROM unnest(pt.partattrs::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS key_columns
+        FROM pg_partitioned_table pt
+        WHERE pt.partrelid = format('%%I.%%I', %s::text, %s::text)::regclass
+    """, (schema, table_name))
+    row = cursor.fetchone()
+    if not row:
+        return None, [], []
+
+    cursor.execute("""
+        SELECT
+            c.relname AS name,
+            n.nspname AS schema_name,
+            pg_get_expr(c.relpartbound, c.oid) AS bound,
+            pg_get_partition_constraintdef(c.oid) AS constraint_def
+        FROM pg_partition_tree(format('%%I.%%I', %s::text, %s::text)::regclass) tree
+        JOIN pg_class c ON c.oid = tree.relid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE tree.isleaf AND c.relkind = 'r'
+        ORDER BY n.nspname, c.relname
+    """, (schema, table_name))
+
+    partitions = [
+        PartitionInfo(
+            name=part['name'],
+            schema_name=part['schema_name'],
+            bound=part['bound'],
+            constraint=part['constraint_def']
+        )
+        for part in cursor.fetchall()
+    ]
+
+    return _PARTITION_STRATEGIES.get(row['partstrat'], row['partstrat']), list(row['key_columns']), partitions
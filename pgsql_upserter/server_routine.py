@@ -0,0 +1,249 @@
+"""Server-side upsert routines: deduplicate, apply and count in one round trip.
+
+The statement-by-statement apply phase (counts, NULL-key lookup, deduplicated
+copy, renames, the upsert and before/after counts) costs a dozen round trips,
+which dominate on high-latency links. A server routine is a generated PL/pgSQL
+function per target, column set and conflict target that does all of it in a
+single query over the staged temp table:
+
+- deduplication with ``DISTINCT ON (conflict key) ... ORDER BY ctid DESC``,
+  keeping the last staged row of each key and skipping NULL keys;
+- ``INSERT ... ON CONFLICT`` from the deduplicated rows;
+- counting, with inserted and updated rows told apart by ``xmax = 0`` in the
+  ``RETURNING`` clause.
+
+Routines are installed lazily by the same query that calls them: a ``DO`` block
+checks the version recorded in the function's comment and (re)creates it when
+it is missing or outdated, e.g. after a column type change. Creation is
+serialized with an advisory lock and commits with the apply transaction, so
+rollbacks and retries never leave a half-installed routine. A role that may not
+create or replace the function (DML-only roles) gets ``PermissionError`` with
+its transaction intact, so the caller can issue the statements instead.
+
+One function accumulates per target, column set and conflict target, and
+outdated ones are replaced in place; ``drop_server_routines`` removes them all,
+e.g. after dropping tables or changing column sets.
+"""
+
+import hashlib
+import logging
+import psycopg2
+
+from dataclasses import dataclass
+
+from .schema_inspector import TableSchema
+from .conflict_resolver import ConflictStrategy, DeduplicationResult, build_deduplication_result, build_upsert_sql
+from .exceptions import PgsqlUpserterError, PermissionError
+
+logger = logging.getLogger(__name__)
+
+# Bump when the generated function body changes, so installed routines are replaced
+ROUTINE_FORMAT_VERSION = 1
+
+ROUTINE_PREFIX = "pgsql_upserter_apply_"
+
+# Marks a privilege error raised while installing, as opposed to while applying
+_INSTALL_HINT = "pgsql_upserter: routine installation not permitted"
+
+_INSTALL_SAVEPOINT = "pgsql_upserter_routine_install"
+
+_TEXT_TYPES = ('text', 'varchar', 'character varying', 'char')
+
+
+@dataclass
+class ServerRoutine:
+    """A generated upsert function and the SQL installing it."""
+    name: str  # Schema-qualified function name
+    version: str
+    create_sql: str
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}(regclass)"
+
+
+def _null_key_condition(table_schema: TableSchema, conflict_columns: list[str]) -> str:
+    """Same condition as build_null_key_condition, from the schema instead of the catalog."""
+    column_types = {col.name: col.data_type for col in table_schema.columns}
+    return " OR ".join(
+        f"{col} IS NULL" if column_types.get(col, 'text') not in _TEXT_TYPES else f"({col} IS NULL OR {col} = '')"
+        for col in conflict_columns
+    )
+
+
+def build_server_routine(
+    table_schema: TableSchema,
+    conflict_strategy: ConflictStrategy,
+    columns: list[str]
+) -> ServerRoutine:
+    """Generate the upsert routine for a target, column set and conflict strategy.
+
+    Args:
+        table_schema: Target table schema
+        conflict_strategy: Conflict strategy (ON CONFLICT target or INSERT_ONLY)
+        columns: Columns inserted from the staged rows and updated on conflict,
+            as passed to execute_upsert
+
+    Returns:
+        ServerRoutine: The function name, version and CREATE statement
+    """
+    schema, target_table = table_schema.schema_name, table_schema.table_name
+    conflict_columns = conflict_strategy.columns if conflict_strategy.type != "INSERT_ONLY" else []
+    identity = '|'.join([schema, target_table, ','.join(conflict_columns),
+                         conflict_strategy.index_predicate or '', ','.join(columns)])
+    name = f"{schema}.{ROUTINE_PREFIX}{hashlib.md5(identity.encode()).hexdigest()[:16]}"
+
+    # %1$s is the staged table, substituted by format() in the function
+    if conflict_columns:
+        null_condition = _null_key_condition(table_schema, conflict_columns)
+        keys = ', '.join(conflict_columns)
+        apply_sql = build_upsert_sql("deduplicated", target_table, conflict_strategy, columns, schema)
+        query = f"""
+            WITH staged AS (
+                SELECT count(*) AS original_count, count(*) FILTER (WHERE {null_condition}) AS null_count
+                FROM %1$s
+            ),
+            deduplicated AS (
+                SELECT DISTINCT ON ({keys}) {', '.join(columns)}
+                FROM %1$s
+                WHERE NOT ({null_condition})
+                ORDER BY {keys}, ctid DESC
+            ),
+            applied AS (
+                {apply_sql.strip()}
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT staged.original_count, staged.null_count,
+                   (SELECT count(*) FROM deduplicated),
+                   (SELECT count(*) FROM applied WHERE inserted)
+            FROM staged"""
+    else:
+        apply_sql = build_upsert_sql("%1$s", target_table, conflict_strategy, columns, schema)
+        query = f"""
+            WITH applied AS (
+                {apply_sql.strip()}
+                RETURNING 1
+            )
+            SELECT count(*), 0::bigint, count(*), count(*)
+            FROM applied"""
+
+    query = query.replace('%', '%%').replace('%%1$s', '%1$s')
+    create_sql = f"""
+        CREATE OR REPLACE FUNCTION {name}(staged regclass)
+        RETURNS TABLE (original_count bigint, null_count bigint, deduplicated_count bigint, rows_inserted bigint)
+        LANGUAGE plpgsql AS $body$
+        BEGIN
+            RETURN QUERY EXECUTE format($query${query}
+            $query$, staged);
+        END
+        $body$"""
+    version = f"{ROUTINE_FORMAT_VERSION}:{hashlib.md5(create_sql.encode()).hexdigest()}"
+    return ServerRoutine(name=name, version=version, create_sql=create_sql)
+
+
+def _install_sql(routine: ServerRoutine) -> str:
+    """DO block (re)creating the routine unless the installed version matches."""
+    is_outdated = f"obj_description(to_regprocedure('{routine.signature}'), 'pg_proc') IS DISTINCT FROM '{routine.version}'"
+    return f"""
+        SAVEPOINT {_INSTALL_SAVEPOINT};
+        DO $install$
+        BEGIN
+            IF {is_outdated} THEN
+                PERFORM pg_advisory_xact_lock(hashtext('{routine.signature}'));
+                IF {is_outdated} THEN
+                    EXECUTE $create${routine.create_sql}
+                    $create$;
+                    EXECUTE $comment$COMMENT ON FUNCTION {routine.signature} IS '{routine.version}'$comment$;
+                END IF;
+            END IF;
+        EXCEPTION WHEN insufficient_privilege THEN
+            RAISE EXCEPTION USING ERRCODE = 'insufficient_privilege', MESSAGE = SQLERRM, HINT = '{_INSTALL_HINT}';
+        END
+        $install$;
+        RELEASE SAVEPOINT {_INSTALL_SAVEPOINT};
+    """
+
+
+def run_server_routine(
+    connection,
+    routine: ServerRoutine,
+    temp_table_name: str
+) -> tuple[DeduplicationResult, int, int]:
+    """Install the routine if needed and apply the staged rows with it, in one round trip.
+
+    Runs in the current transaction, which the caller commits. Installation runs
+    in a savepoint: if the role may not create or replace the function, the
+    savepoint is rolled back and PermissionError raised, leaving the transaction
+    usable for the statement-by-statement apply.
+
+    Args:
+        connection: Database connection
+        routine: Routine from build_server_routine
+        temp_table_name: Staged (not yet deduplicated) temp table
+
+    Returns:
+        Tuple of (DeduplicationResult, rows_inserted, rows_updated)
+
+    Raises:
+        PermissionError: If the role may not install the routine
+        PgsqlUpserterError: If the routine cannot be installed or fails
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _install_sql(routine).replace('%', '%%') + f"SELECT * FROM {routine.name}(%s::regclass)",
+                (temp_table_name,))
+            original_count, null_count, deduplicated_count, rows_inserted = cursor.fetchone()
+    except psycopg2.Error as e:
+        if e.pgcode == '42501' and e.diag.message_hint == _INSTALL_HINT:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {_INSTALL_SAVEPOINT}")
+                    cursor.execute(f"RELEASE SAVEPOINT {_INSTALL_SAVEPOINT}")
+            except psycopg2.Error as rollback_error:
+                raise PgsqlUpserterError(f"Server routine {routine.name} failed: {e}") from rollback_error
+            raise PermissionError(f"Not permitted to install server routine {routine.name}: "
+                                  f"{e.diag.message_primary}") from e
+        raise PgsqlUpserterError(f"Server routine {routine.name} failed: {e}") from e
+
+    dedup_result = build_deduplication_result(original_count, null_count, deduplicated_count)
+    logger.debug(f"Server routine {routine.name}: {original_count} staged, {deduplicated_count} applied, "
+                 f"{rows_inserted} inserted")
+    return dedup_result, rows_inserted, deduplicated_count - rows_inserted
+
+
+def drop_server_routines(connection, schema: str = 'public') -> int:
+    """Drop every server routine installed in a schema.
+
+    Routines are reinstalled on their next use, so this is safe between loads;
+    a load calling a routine while it is dropped fails and can be retried.
+
+    Args:
+        connection: Active PostgreSQL connection
+        schema: Schema holding the routines (that of their targets)
+
+    Returns:
+        int: Number of routines dropped
+
+    Raises:
+        PgsqlUpserterError: If the routines cannot be dropped
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT p.oid::regprocedure::text
+                FROM pg_proc p
+                WHERE p.pronamespace = to_regnamespace(%s)
+                  AND starts_with(p.proname, %s)
+            """, (schema, ROUTINE_PREFIX))
+            routines = [row[0] for row in cursor.fetchall()]
+            for signature in routines:
+                cursor.execute(f"DROP FUNCTION IF EXISTS {signature}")
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to drop server routines in schema '{schema}': {e}") from e
+
+    if routines:
+        logger.info(f"Dropped {len(routines)} server routines in schema '{schema}'")
+    return len(routines)
@@ -0,0 +1,116 @@
+"""Per-load session tuning profiles.
+
+A profile maps workflow phases to server settings:
+
+- ``session``: applied once, at session level, before anything is staged. Only
+  ``temp_buffers`` belongs here: PostgreSQL refuses to change it once the session
+  has used a temporary table, and it cannot be restored afterwards, so it is
+  skipped (with a warning) when it is too late.
+- ``staging``, ``apply`` and ``index_build``: applied with ``SET LOCAL``
+  (``set_config(..., true)``) at the start of every transaction of that phase,
+  so they revert on commit or rollback and never leak into the connection (or
+  into other clients behind a transaction-pooling proxy).
+
+Staging tables are disposable, so every profile except ``safe`` commits staging
+transactions asynchronously. ``bulk`` also commits the apply asynchronously: a
+crash may lose the last loads (never corrupt data), which suits re-runnable
+backfills.
+"""
+
+import logging
+import psycopg2
+
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('session', 'staging', 'apply', 'index_build')
+
+TUNING_PROFILES: dict[str, dict[str, dict[str, str]]] = {
+    'bulk': {
+        'session': {'temp_buffers': '256MB'},
+        'staging': {'synchronous_commit': 'off'},
+        'apply': {'work_mem': '256MB', 'synchronous_commit': 'off'},
+        'index_build': {'maintenance_work_mem': '1GB', 'synchronous_commit': 'off'},
+    },
+    'latency': {
+        'staging': {'synchronous_commit': 'off', 'jit': 'off'},
+        'apply': {'work_mem': '64MB', 'jit': 'off', 'synchronous_commit': 'local'},
+        'index_build': {'maintenance_work_mem': '256MB'},
+    },
+    'safe': {
+        'staging': {'synchronous_commit': 'on'},
+        'apply': {'synchronous_commit': 'on'},
+        'index_build': {'synchronous_commit': 'on'},
+    },
+}
+
+
+def resolve_profile(profile: str | dict[str, dict[str, str]] | None) -> dict[str, dict[str, str]]:
+    """Return the per-phase settings of a named or custom profile.
+
+    Raises:
+        ValueError: If the profile name or one of its phases is unknown
+    """
+    if profile is None:
+        return {}
+    if isinstance(profile, str):
+        if profile not in TUNING_PROFILES:
+            raise ValueError(f"Unknown session profile: {profile!r} (expected one of {sorted(TUNING_PROFILES)})")
+        profile = TUNING_PROFILES[profile]
+
+    unknown = set(profile) - set(PHASES)
+    if unknown:
+        raise ValueError(f"Unknown session profile phases: {sorted(unknown)} (expected {PHASES})")
+    return {phase: {name: str(value) for name, value in settings.items()}
+            for phase, settings in profile.items() if settings}
+
+
+def apply_local_settings(connection, settings: dict[str, str] | None) -> dict[str, str]:
+    """SET LOCAL the settings in the current transaction, in one round trip.
+
+    Returns:
+        The settings' effective values
+
+    Raises:
+        PgsqlUpserterError: If a setting is unknown or its value invalid
+    """
+    if not settings:
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT s.name, set_config(s.name, s.value, true)
+                FROM unnest(%s::text[], %s::text[]) AS s(name, value)
+            """, (list(settings), list(settings.values())))
+            return dict(cursor.fetchall())
+    except psycopg2.Error as e:
+        raise PgsqlUpserterError(f"Failed to apply session settings {settings}: {e}") from e
+
+
+def current_settings(connection, names: list[str]) -> dict[str, str]:
+    """Current values of the named settings."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, current_setting(name) FROM unnest(%s::text[]) AS name", (names,))
+        return dict(cursor.fetchall())
+
+
+def apply_session_settings(connection, settings: dict[str, str] | None) -> dict[str, str]:
+    """Set session-level settings that must precede any temp table use, then commit.
+
+    A setting the server refuses at this point is skipped with a warning.
+
+    Returns:
+        The settings that were applied, with their effective values
+    """
+    applied = {}
+    for name, value in (settings or {}).items():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config(%s, %s, false)", (name, value))
+                applied[name] = cursor.fetchone()[0]
+            connection.commit()
+        except psycopg2.Error as e:
+            connection.rollback()
+            logger.warning(f"Skipping session setting {name}={value}: {str(e).strip()}")
+    return applied
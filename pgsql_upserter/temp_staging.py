@@ -1,13 +1,22 @@
 """Temporary table management for PostgreSQL upsert operations."""
 
-import json
+import datetime
+import io
 import logging
+import multiprocessing
+import queue
+import threading
 import uuid
 import psycopg2
 
+from collections import deque
+from collections.abc import Collection, Iterable, Iterator, Sized
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
 from psycopg2.extras import RealDictCursor, execute_values
 from typing import Any
 
+from . import json_codec
 from .exceptions import PgsqlUpserterError
 
 logger = logging.getLogger(__name__)
@@ -19,6 +28,9 @@ def _normalize_null_values(value: Any) -> Any | None:
         return None
 
     if isinstance(value, str):
+        # Null markers are short; avoid copying large unpadded values (e.g. JSON documents)
+        if len(value) > 16 and not (value[:1].isspace() or value[-1:].isspace()):
+            return value
         normalized = value.strip().lower()
         if normalized in ['', 'none', 'null', 'nan', 'na', '-']:
             return None
@@ -26,12 +38,39 @@ def _normalize_null_values(value: Any) -> Any | None:
     return value
 
 
-def _convert_value_for_postgres(value: Any, column_data_type: str) -> Any | None:
+# Words PostgreSQL's boolean input accepts; unique prefixes are accepted too
+_BOOLEAN_WORDS = {'true': True, 'yes': True, 'on': True, 'false': False, 'no': False, 'off': False}
+
+
+def _staged_boolean(value: Any) -> bool | None:
+    """Value a boolean column gets from a staged value: True, False or None (NULL or invalid).
+
+    Staging passes values through to the server, so this follows PostgreSQL's
+    boolean input after null normalization: true/false, yes/no, on/off, 1/0 and
+    their unique prefixes, case-insensitive.
+    """
+    value = _normalize_null_values(value)
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return {1: True, 0: False}.get(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    if text in ('1', '0'):
+        return text == '1'
+    results = {result for word, result in _BOOLEAN_WORDS.items() if word.startswith(text)}
+    return results.pop() if len(results) == 1 else None
+
+
+def _convert_value_for_postgres(value: Any, column_data_type: str, trust_json: bool = False) -> Any | None:
     """Convert Python values to PostgreSQL-compatible formats based on column data type.
 
     Args:
         value: The value to convert
         column_data_type: PostgreSQL data type of the target column
+        trust_json: For json/jsonb columns, pass strings through without client-side
+            validation and let the server reject invalid JSON
 
     Returns:
         Converted value suitable for PostgreSQL insertion
@@ -48,16 +87,16 @@ def _convert_value_for_postgres(value: Any, column_data_type: str) -> Any | None
         # Handle JSONB and JSON columns
         if column_type in ('jsonb', 'json'):
             if isinstance(normalized_value, (dict, list)):
-                return json.dumps(normalized_value)
+                return json_codec.dumps(normalized_value)
             elif isinstance(normalized_value, str):
+                if trust_json:
+                    return normalized_value
                 # Try to parse as JSON, if it fails, treat as string literal
-                try:
-                    json.loads(normalized_value)
+                if json_codec.is_valid_json(normalized_value):
                     return normalized_value  # Already valid JSON string
-                except json.JSONDecodeError:
-                    return json.dumps(normalized_value)  # Wrap non-JSON string in quotes
+                return json_codec.dumps(normalized_value)  # Wrap non-JSON string in quotes
             else:
-                return json.dumps(normalized_value)
+                return json_codec.dumps(normalized_value)
 
         # Handle PostgreSQL arrays (text[], integer[], etc.)
         elif column_type.endswith('[]') or column_type.startswith('_'):
@@ -97,13 +136,40 @@ def _convert_value_for_postgres(value: Any, column_data_type: str) -> Any | None
         return str(normalized_value) if normalized_value is not None else None
 
 
-def create_temp_table(connection, target_table: str, schema: str = 'public') -> str:
+def build_temp_table_columns_sql(table_schema) -> str | None:
+    """Column definitions of a staging table for the target's insertable columns.
+
+    Returns None when the schema lacks full type definitions (e.g. it was built
+    by hand), in which case the structure is copied from the target instead.
+    """
+    columns = [col for col in table_schema.columns if not col.is_auto_generated]
+    if not columns or any(col.type_definition is None for col in columns):
+        return None
+    return ', '.join(f"{col.name} {col.type_definition}" for col in columns)
+
+
+def create_temp_table(
+    connection,
+    target_table: str,
+    schema: str = 'public',
+    table_schema=None,
+    on_commit_drop: bool = False,
+    commit: bool = True
+) -> str:
     """Create temporary table with same structure as target table.
 
+    With a ``table_schema`` carrying type definitions the table is created from
+    it in a single statement, without reading the catalog.
+
     Args:
         connection: Active PostgreSQL connection
         target_table: Name of the target table to copy structure from
         schema: Schema name (default: 'public')
+        table_schema: Already inspected (or cached) TableSchema of the target
+        on_commit_drop: Create the table ON COMMIT DROP, so it cannot outlive the
+            current transaction (e.g. behind a transaction-pooling proxy)
+        commit: Whether to commit after creating. When False the table is only
+            visible to the current transaction until the caller commits
 
     Returns:
         str: The temporary table name that was created
@@ -114,12 +180,23 @@ def create_temp_table(connection, target_table: str, schema: str = 'public') ->
     # Generate unique temp table name
     temp_table_name = f"temp_staging_{uuid.uuid4().hex[:8]}"
 
+    columns_sql = build_temp_table_columns_sql(table_schema) if table_schema else None
+    on_commit_sql = " ON COMMIT DROP" if on_commit_drop else ""
+
     try:
         with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            if columns_sql:
+                cursor.execute(f"CREATE TEMPORARY TABLE {temp_table_name} ({columns_sql}){on_commit_sql}")
+                if commit:
+                    connection.commit()
+                logger.debug(f"Created temporary table '{temp_table_name}' from the schema of "
+                             f"'{schema}.{target_table}'")
+                return temp_table_name
+
             # Create temp table with same structure, no constraints or defaults
             create_sql = f"""
                 CREATE TEMPORARY TABLE {temp_table_name}
-                (LIKE {schema}.{target_table} EXCLUDING ALL)
+                (LIKE {schema}.{target_table} EXCLUDING ALL){on_commit_sql}
             """
 
             cursor.execute(create_sql)
@@ -151,7 +228,8 @@ def create_temp_table(connection, target_table: str, schema: str = 'public') ->
             for col_name in columns_to_drop:
                 cursor.execute(f"ALTER TABLE {temp_table_name} DROP COLUMN {col_name}")
 
-            connection.commit()
+            if commit:
+                connection.commit()
 
             logger.debug(
                 f"Created temporary table '{temp_table_name}' based on '{schema}.{target_table}', dropped {len(columns_to_drop)} auto-generated columns")  # noqa
@@ -162,25 +240,89 @@ def create_temp_table(connection, target_table: str, schema: str = 'public') ->
         raise PgsqlUpserterError(f"Failed to create temporary table: {e}")
 
 
+def _build_column_type_map(matched_columns: list[str], target_schema=None) -> dict[str, str]:
+    """Map matched column names to their PostgreSQL data types for value conversion."""
+    column_type_map = {}
+    if target_schema:
+        for col_info in target_schema.columns:
+            if col_info.name in matched_columns:
+                column_type_map[col_info.name] = col_info.data_type
+    return column_type_map
+
+
+def _convert_rows(
+    rows: list[dict[str, Any]],
+    matched_columns: list[str],
+    column_type_map: dict[str, str],
+    trusted_json_columns: Collection[str] = ()
+) -> list[list[Any]]:
+    """Filter rows down to matched columns and convert values for PostgreSQL."""
+    converted_rows = []
+    for row in rows:
+        filtered_row = []
+        for col in matched_columns:
+            value = row.get(col)  # Missing keys become None
+
+            # Convert value based on column data type if available
+            if col in column_type_map:
+                converted_value = _convert_value_for_postgres(
+                    value, column_type_map[col], col in trusted_json_columns)
+            else:
+                converted_value = _normalize_null_values(value)
+
+            filtered_row.append(converted_value)
+        converted_rows.append(filtered_row)
+    return converted_rows
+
+
+def _rekey_rows(rows: Iterable[dict[str, Any]], column_map: dict[str, str] | None) -> Iterable[dict[str, Any]]:
+    """Re-key rows from their data keys to table column names (column_map: table column -> data key)."""
+    renames = {key: col for col, key in (column_map or {}).items() if key != col}
+    if not renames:
+        return rows
+    return ({renames.get(key, key): value for key, value in row.items()} for row in rows)
+
+
+def iter_batches(rows: Iterable[dict[str, Any]], batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Split any iterable of rows into lists of at most batch_size rows."""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
 def bulk_insert_to_temp(
     connection,
     temp_table_name: str,
-    data_list: list[dict[str, Any]],
+    data_list: Iterable[dict[str, Any]],
     matched_columns: list[str],
     target_schema=None,
     batch_size: int = 1000,
-    show_progress: bool = True
+    show_progress: bool = True,
+    commit: bool = True,
+    trusted_json_columns: Collection[str] = (),
+    column_map: dict[str, str] | None = None
 ) -> int:
     """Bulk insert filtered data into temporary table.
 
+    Rows are converted and sent one batch at a time, so data_list may be any
+    iterable (e.g. a streaming file reader) and is never fully materialized.
+
     Args:
         connection: Active PostgreSQL connection
         temp_table_name: Name of the temporary table
-        data_list: List of dictionaries containing data to insert
-        matched_columns: List of column names to include in insert
+        data_list: List (or any iterable) of dictionaries containing data to insert
+        matched_columns: List of column names to include in insert. It may grow while
+            data_list is iterated (see IncrementalColumnMatcher.track); each batch
+            uses the columns known once the batch has been read
         target_schema: TableSchema object for data type conversion (optional)
         batch_size: Number of rows to process in each batch
         show_progress: Whether to show progress for large datasets
+        commit: Whether to commit after inserting. When False the caller owns the
+            transaction and the table is left in place on failure
+        trusted_json_columns: json/jsonb columns whose string values are sent without
+            client-side validation (invalid JSON is rejected by the server)
+        column_map: Table column -> data key, as returned by match_columns, for rows
+            whose keys differ from the column names (e.g. in case)
 
     Returns:
         int: Number of rows inserted
@@ -188,61 +330,48 @@ def bulk_insert_to_temp(
     Raises:
         PgsqlUpserterError: If bulk insert fails
     """
-    if not data_list or not matched_columns:
+    if not matched_columns:
         return 0
 
-    total_rows = len(data_list)
-    if show_progress and total_rows > batch_size:
-        logger.info(f"Processing {total_rows} rows...")
-
-    # Build column data type mapping for proper conversion
-    column_type_map = {}
-    if target_schema:
-        for col_info in target_schema.columns:
-            if col_info.name in matched_columns:
-                column_type_map[col_info.name] = col_info.data_type
+    trusted_json_columns = frozenset(trusted_json_columns)
+    total_rows = len(data_list) if isinstance(data_list, Sized) else None
+    if total_rows == 0:
+        return 0
+    data_list = _rekey_rows(data_list, column_map)
+    if show_progress and (total_rows is None or total_rows > batch_size):
+        logger.info(f"Processing {total_rows if total_rows is not None else 'streamed'} rows...")
 
+    columns: list[str] = []
     try:
         with connection.cursor(cursor_factory=RealDictCursor) as cursor:
-            # Filter and normalize data with progress tracking
-            filtered_data = []
-            for i, row in enumerate(data_list):
-                filtered_row = []
-                for col in matched_columns:
-                    value = row.get(col)  # Missing keys become None
-
-                    # Convert value based on column data type if available
-                    if col in column_type_map:
-                        converted_value = _convert_value_for_postgres(value, column_type_map[col])
-                    else:
-                        converted_value = _normalize_null_values(value)
-
-                    filtered_row.append(converted_value)
-                filtered_data.append(filtered_row)
+            rows_inserted = 0
+            for batch in iter_batches(data_list, batch_size):
+                if len(matched_columns) != len(columns):  # First batch, or columns widened
+                    columns = list(matched_columns)
+                    # Build column data type mapping for proper conversion
+                    column_type_map = _build_column_type_map(columns, target_schema)
+                    # Build INSERT statement for execute_values
+                    insert_sql = f"INSERT INTO {temp_table_name} ({', '.join(columns)}) VALUES %s"
+
+                # Use execute_values for better performance in serverless environments
+                execute_values(
+                    cursor,
+                    insert_sql,
+                    _convert_rows(batch, columns, column_type_map, trusted_json_columns),
+                    template=None,
+                    page_size=batch_size  # Good balance for serverless memory limits
+                )
+                rows_inserted += len(batch)  # Use actual data length instead of cursor.rowcount
 
                 # Show progress every batch_size rows
-                if show_progress and (i + 1) % batch_size == 0:
-                    progress = (i + 1) / total_rows * 100
-                    logger.info(f"Processed {i + 1}/{total_rows} rows ({progress:.1f}%)")
-
-            # Build INSERT statement for execute_values
-            columns_sql = ', '.join(matched_columns)
-            insert_sql = f"INSERT INTO {temp_table_name} ({columns_sql}) VALUES %s"
+                if show_progress and total_rows and total_rows > batch_size:
+                    progress = rows_inserted / total_rows * 100
+                    logger.info(f"Processed {rows_inserted}/{total_rows} rows ({progress:.1f}%)")
+                elif show_progress and total_rows is None:
+                    logger.info(f"Processed {rows_inserted} rows")
 
-            if show_progress:
-                logger.info("Inserting data into temporary table...")
-
-            # Use execute_values for better performance in serverless environments
-            execute_values(
-                cursor,
-                insert_sql,
-                filtered_data,
-                template=None,
-                page_size=batch_size  # Good balance for serverless memory limits
-            )
-
-            rows_inserted = len(filtered_data)  # Use actual data length instead of cursor.rowcount
-            connection.commit()
+            if commit:
+                connection.commit()
 
             if show_progress:
                 logger.info(f"Successfully inserted {rows_inserted} batched rows")
@@ -251,15 +380,262 @@ def bulk_insert_to_temp(
             return rows_inserted
 
     except psycopg2.Error as e:
-        connection.rollback()
-        # Try to cleanup temp table
-        _cleanup_temp_table(connection, temp_table_name)
+        if commit:
+            connection.rollback()
+            # Try to cleanup temp table
+            _cleanup_temp_table(connection, temp_table_name)
         raise PgsqlUpserterError(f"Failed to bulk insert into temporary table: {e}")
 
 
 # Alias for better API naming
 populate_temp_table = bulk_insert_to_temp
 
+# COPY text format escapes (backslash first so the others are not double-escaped)
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _format_array_literal(items: list | tuple) -> str:
+    """Format a Python sequence as a PostgreSQL array literal."""
+    elements = []
+    for item in items:
+        if item is None:
+            elements.append('NULL')
+        elif isinstance(item, (list, tuple)):
+            elements.append(_format_array_literal(item))
+        else:
+            text = _format_copy_scalar(item)
+            escaped = text.replace('\\', '\\\\').replace('"', '\\"')
+            elements.append(f'"{escaped}"')
+    return '{' + ','.join(elements) + '}'
+
+
+def _format_copy_scalar(value: Any) -> str:
+    """Render a converted, non-NULL value as PostgreSQL input text."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return _format_array_literal(value)
+    if isinstance(value, dict):
+        return json_codec.dumps(value)
+    return str(value)
+
+
+def _serialize_copy_chunk(
+    rows: list[dict[str, Any]],
+    matched_columns: list[str],
+    column_type_map: dict[str, str],
+    encoding: str = 'utf-8',
+    trusted_json_columns: Collection[str] = ()
+) -> bytes:
+    """Convert rows and serialize them as a ready-to-send COPY text format block."""
+    lines = []
+    for converted_row in _convert_rows(rows, matched_columns, column_type_map, trusted_json_columns):
+        lines.append('\t'.join(
+            '\\N' if value is None else _format_copy_scalar(value).translate(_COPY_ESCAPES)
+            for value in converted_row
+        ))
+    lines.append('')
+    return '\n'.join(lines).encode(encoding)
+
+
+def _produce_copy_blocks(
+    data_list: Iterable[dict[str, Any]],
+    matched_columns: list[str],
+    target_schema,
+    encoding: str,
+    batch_size: int,
+    blocks: queue.Queue,
+    stop: threading.Event,
+    executor: Executor | None = None,
+    max_in_flight: int = 1,
+    trusted_json_columns: Collection[str] = ()
+) -> None:
+    """Producer thread: serialize batches into the bounded queue until exhausted or stopped.
+
+    With an executor, batches are serialized in worker processes; at most
+    ``max_in_flight`` batches are submitted ahead and results are queued in input order.
+    Each queued block carries the columns it was serialized with, which change when
+    matched_columns widens during iteration.
+    """
+    columns: tuple[str, ...] = ()
+    column_type_map: dict[str, str] = {}
+
+    def snapshot_columns() -> tuple[str, ...]:
+        nonlocal columns, column_type_map
+        if len(matched_columns) != len(columns):
+            columns = tuple(matched_columns)
+            column_type_map = _build_column_type_map(list(columns), target_schema)
+        return columns
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        if executor is None:
+            for batch in iter_batches(data_list, batch_size):
+                batch_columns = snapshot_columns()
+                block = _serialize_copy_chunk(batch, batch_columns, column_type_map, encoding,
+                                              trusted_json_columns)
+                if not put((len(batch), batch_columns, block)):
+                    return
+        else:
+            in_flight: deque = deque()
+            for batch in iter_batches(data_list, batch_size):
+                batch_columns = snapshot_columns()
+                in_flight.append((len(batch), batch_columns, executor.submit(
+                    _serialize_copy_chunk, batch, batch_columns, column_type_map, encoding,
+                    trusted_json_columns)))
+                if len(in_flight) >= max_in_flight:
+                    row_count, batch_columns, future = in_flight.popleft()
+                    if not put((row_count, batch_columns, future.result())):
+                        return
+            while in_flight:
+                row_count, batch_columns, future = in_flight.popleft()
+                if not put((row_count, batch_columns, future.result())):
+                    return
+        put(None)
+    except BaseException as e:  # Handed to the consumer, which re-raises it
+        put(e)
+
+
+def _create_conversion_executor(workers: int) -> ProcessPoolExecutor:
+    """Start a process pool for conversion.
+
+    Workers are started by a fork server where available, or spawned, never
+    forked from the (possibly multi-threaded) caller: a fork copies locks held by
+    other threads and can deadlock the child. As with any spawned process, the
+    caller's main module is imported by the workers, so scripts need an
+    ``if __name__ == '__main__':`` guard. The pool is warmed up before the
+    producer thread starts, so start-up errors surface before any data is read.
+
+    Raises:
+        PgsqlUpserterError: If the worker processes cannot be started
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=json_codec.set_backend, initargs=(json_codec.get_backend(),))
+    try:
+        executor.submit(int).result()
+    except Exception as e:
+        executor.shutdown(cancel_futures=True)
+        raise PgsqlUpserterError(f"Failed to start {workers} conversion worker processes (does the main "
+                                 f"script have an if __name__ == '__main__' guard?): {e}") from e
+    return executor
+
+
+def pipelined_insert_to_temp(
+    connection,
+    temp_table_name: str,
+    data_list: Iterable[dict[str, Any]],
+    matched_columns: list[str],
+    target_schema=None,
+    batch_size: int = 5000,
+    queue_depth: int = 4,
+    commit: bool = True,
+    workers: int = 0,
+    trusted_json_columns: Collection[str] = (),
+    column_map: dict[str, str] | None = None
+) -> int:
+    """Bulk insert data into temporary table with conversion overlapping network I/O.
+
+    A background thread converts and serializes batch N+1 into COPY text format
+    while the calling thread streams batch N to the server with ``COPY FROM STDIN``
+    (psycopg2 releases the GIL during network I/O). At most ``queue_depth``
+    serialized batches are buffered, which caps memory use.
+
+    For CPU-bound payloads (large JSON or array columns) ``workers`` moves the
+    conversion into a process pool. Batches are serialized in parallel and sent in
+    input order, leaving the calling process to only stream bytes. Row values
+    must be picklable, and the workers use the current JSON backend.
+
+    Args:
+        connection: Active PostgreSQL connection
+        temp_table_name: Name of the temporary table
+        data_list: List (or any iterable) of dictionaries containing data to insert
+        matched_columns: List of column names to include in insert. It may grow while
+            data_list is iterated; each block uses the columns known once it was read
+        target_schema: TableSchema object for data type conversion (optional)
+        batch_size: Number of rows per serialized COPY block
+        queue_depth: Maximum number of serialized blocks waiting to be sent
+        commit: Whether to commit after inserting. When False the caller owns the
+            transaction and the table is left in place on failure
+        workers: Number of conversion processes; 0 converts in a background thread
+        trusted_json_columns: json/jsonb columns whose string values are sent without
+            client-side validation (invalid JSON is rejected by the server)
+        column_map: Table column -> data key, as returned by match_columns, for rows
+            whose keys differ from the column names (e.g. in case)
+
+    Returns:
+        int: Number of rows inserted
+
+    Raises:
+        PgsqlUpserterError: If bulk insert fails
+    """
+    if not matched_columns:
+        return 0
+
+    data_list = _rekey_rows(data_list, column_map)
+    executor = _create_conversion_executor(workers) if workers > 0 else None
+
+    encoding = psycopg2.extensions.encodings.get(connection.encoding, 'utf-8')
+    copy_columns: tuple[str, ...] = ()
+
+    blocks: queue.Queue = queue.Queue(maxsize=max(1, queue_depth))
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce_copy_blocks,
+        args=(data_list, matched_columns, target_schema, encoding, batch_size, blocks, stop,
+              executor, max(1, queue_depth, workers * 2), frozenset(trusted_json_columns)),
+        name=f"pgsql_upserter-convert-{temp_table_name}",
+        daemon=True
+    )
+    producer.start()
+
+    rows_inserted = 0
+    try:
+        with connection.cursor() as cursor:
+            while (item := blocks.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise PgsqlUpserterError(f"Failed to convert data for temporary table: {item}") from item
+                row_count, columns, block = item
+                if columns != copy_columns:
+                    copy_columns = columns
+                    copy_sql = f"COPY {temp_table_name} ({', '.join(columns)}) FROM STDIN"
+                cursor.copy_expert(copy_sql, io.BytesIO(block))
+                rows_inserted += row_count
+
+        if commit:
+            connection.commit()
+
+        logger.info(f"Inserted {rows_inserted} total rows into temporary table '{temp_table_name}' "
+                    f"(pipelined, {workers or 'no'} conversion processes)")
+        return rows_inserted
+
+    except (psycopg2.Error, PgsqlUpserterError) as e:
+        if commit:
+            connection.rollback()
+            _cleanup_temp_table(connection, temp_table_name)
+        raise PgsqlUpserterError(f"Failed to bulk insert into temporary table: {e}") from e
+
+    finally:
+        stop.set()
+        producer.join()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
 
 def convert_temp_to_permanent(
     connection,
@@ -0,0 +1,147 @@
+"""Replication-lag and load-aware throttling between chunks of a bulk apply.
+
+Large backfills generate WAL faster than streaming replicas replay it and
+compete with OLTP traffic on the primary. Before each chunk the throttle
+samples the replicas' replay lag (time and LSN distance, from
+``pg_stat_replication``) and the number of other active client backends, and
+compares them with the configured limits:
+
+- over a limit, the chunk scale shrinks and the load pauses, re-sampling, until
+  the pressure drops or ``max_pause_seconds`` have passed;
+- well below every limit (``headroom``), the scale grows back towards full size.
+
+Every decision is recorded, so the limits can be tuned from the results.
+Metrics the role cannot see (``pg_stat_replication`` details need
+``pg_monitor``) or that do not apply, such as lag without replicas, count as no
+pressure.
+"""
+
+import logging
+import math
+import psycopg2
+import time
+
+from dataclasses import dataclass
+
+from .exceptions import PgsqlUpserterError
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_SQL = """
+    SELECT
+        (SELECT max(extract(epoch FROM replay_lag))::float8 FROM pg_stat_replication),
+        (SELECT max(pg_wal_lsn_diff(pg_current_wal_lsn(), replay_lsn))::bigint FROM pg_stat_replication),
+        (SELECT count(*) FROM pg_stat_activity
+         WHERE state = 'active' AND backend_type = 'client backend' AND pid <> pg_backend_pid())
+"""
+
+
+@dataclass
+class ThrottlePolicy:
+    """Limits and reactions for throttled chunked applies. A limit of None is not checked."""
+    max_replay_lag_seconds: float | None = 30.0
+    max_replay_lag_bytes: int | None = None
+    max_active_backends: int | None = None
+    pause_seconds: float = 1.0  # Sleep between samples while over a limit (0 only shrinks)
+    max_pause_seconds: float = 60.0  # Longest wait before a chunk proceeds regardless
+    shrink_factor: float = 0.5
+    grow_factor: float = 1.5
+    min_scale: float = 0.05
+    headroom: float = 0.5  # Grow only while every metric is below this fraction of its limit
+
+
+@dataclass
+class LoadSample:
+    """Replica lag and primary load at one point in time."""
+    replay_lag_seconds: float | None
+    replay_lag_bytes: int | None
+    active_backends: int
+
+
+@dataclass
+class ThrottleDecision:
+    """What the throttle did before a chunk."""
+    chunk: int  # 1-based index of the chunk in this run
+    action: str  # "hold", "grow", "shrink" or "pause"
+    scale: float  # Fraction of the planned chunk size applied
+    pressure: float  # Largest metric-to-limit ratio of the sample
+    paused_seconds: float
+    sample: LoadSample  # Taken before the chunk, before any pause
+
+
+def sample_load(connection) -> LoadSample:
+    """Sample replica lag and active backends, ending the read-only transaction.
+
+    Raises:
+        PgsqlUpserterError: If the statistics views cannot be read
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(_SAMPLE_SQL)
+            lag_seconds, lag_bytes, active_backends = cursor.fetchone()
+        # Pauses must not hold a snapshot open
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        raise PgsqlUpserterError(f"Failed to sample replication lag and load: {e}")
+    return LoadSample(lag_seconds, lag_bytes, active_backends)
+
+
+class Throttle:
+    """Adaptive chunk scale driven by replica lag and primary load."""
+
+    def __init__(self, connection, policy: ThrottlePolicy):
+        self.connection = connection
+        self.policy = policy
+        self.scale = 1.0
+        self.decisions: list[ThrottleDecision] = []
+
+    @property
+    def paused_seconds(self) -> float:
+        return sum(decision.paused_seconds for decision in self.decisions)
+
+    def pressure(self, sample: LoadSample) -> float:
+        """Largest ratio of a metric to its limit; 1.0 or more means over a limit."""
+        policy = self.policy
+        ratios = [
+            value / limit if limit > 0 else (math.inf if value > 0 else 0.0)
+            for value, limit in (
+                (sample.replay_lag_seconds, policy.max_replay_lag_seconds),
+                (sample.replay_lag_bytes, policy.max_replay_lag_bytes),
+                (sample.active_backends, policy.max_active_backends),
+            )
+            if value is not None and limit is not None
+        ]
+        return max(ratios, default=0.0)
+
+    def before_chunk(self, max_wait: float = math.inf) -> float:
+        """Sample, pause while over a limit and return the scale for the next chunk.
+
+        Args:
+            max_wait: Longest pause allowed by the caller (e.g. time left before a deadline)
+        """
+        policy = self.policy
+        first_sample = sample = sample_load(self.connection)
+        first_pressure = pressure = self.pressure(sample)
+        paused = 0.0
+        action = "hold"
+        if pressure >= 1.0:
+            self.scale = max(policy.min_scale, self.scale * policy.shrink_factor)
+            action = "shrink"
+            wait_limit = min(policy.max_pause_seconds, max_wait)
+            while pressure >= 1.0 and policy.pause_seconds > 0 and paused + policy.pause_seconds <= wait_limit:
+                action = "pause"
+                time.sleep(policy.pause_seconds)
+                paused += policy.pause_seconds
+                sample = sample_load(self.connection)
+                pressure = self.pressure(sample)
+        elif pressure < policy.headroom and self.scale < 1.0:
+            self.scale = min(1.0, self.scale * policy.grow_factor)
+            action = "grow"
+
+        decision = ThrottleDecision(len(self.decisions) + 1, action, self.scale, first_pressure, paused, first_sample)
+        self.decisions.append(decision)
+        if action != "hold":
+            logger.info(f"Throttle before chunk {decision.chunk}: {action} to scale {self.scale:.2f} "
+                        f"(pressure {first_pressure:.2f}, paused {paused:.1f}s)")
+        return self.scale
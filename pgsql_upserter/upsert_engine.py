@@ -2,26 +2,73 @@
 
 import csv
 import logging
+import math
 import psycopg2
 
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import chain, islice
 from pathlib import Path
+from typing import Any
 
 from .schema_inspector import inspect_table_schema
-from .column_matcher import match_columns
-from .temp_staging import create_temp_table, bulk_insert_to_temp
+from .column_matcher import IncrementalColumnMatcher, NEW_COLUMN_MODES
+from .temp_staging import create_temp_table, bulk_insert_to_temp, pipelined_insert_to_temp
 from .conflict_resolver import (
     find_conflict_strategy,
+    find_arbiter_index,
     deduplicate_temp_table,
     execute_upsert,
+    execute_merge,
+    choose_execution_strategy,
     DeduplicationResult,
     ConflictStrategy
 )
+from .durable_staging import (
+    ensure_checkpoint_table,
+    get_checkpoints,
+    is_load_applied,
+    create_durable_staging_table,
+    stage_chunks,
+    copy_staging_to_temp,
+    mark_load_applied,
+)
+from .readers import iter_records
+from .plan_cache import UpsertPlan, get_plan
+from .dry_run import DryRunReport, run_dry_run
+from .quarantine import quarantine_stage
+from .initial_load import deduplicate_rows, is_table_empty, load_into_empty_table, INITIAL_LOAD_MODES
+from .index_deferral import (
+    defer_indexes,
+    estimate_table_rows,
+    release_index_deferral,
+    restore_deferred_indexes,
+    should_defer_indexes,
+)
+from .session_tuning import apply_local_settings, apply_session_settings, resolve_profile
+from .server_routine import build_server_routine, run_server_routine
+from .watermark import WatermarkFilter, read_watermarks
+from .partitioning import route_to_partitions, apply_partition_groups, drop_routing_tables, UNROUTABLE_MODES
+from .retry import RetryPolicy, run_with_retry
+from .deadline import (
+    ContinuationToken,
+    DeadlinePolicy,
+    remaining_time_function,
+    run_chunks,
+    skip_committed_rows,
+    with_statement_timeout,
+)
+from .throttle import Throttle, ThrottleDecision, ThrottlePolicy
+from .coordination import acquire_apply_locks, LOCK_MODES
+from .exceptions import ChunkedLoadError, PermissionError, PgsqlUpserterError
 from .config import create_connection_from_env, test_connection
 
 # Configure module logger
 logger = logging.getLogger(__name__)
 
+STAGING_MODES = ('values', 'pipelined', 'quarantine')
+
 
 @dataclass
 class UpsertResult:
@@ -33,6 +80,20 @@ class UpsertResult:
     matched_columns: list[str]
     conflict_strategy_type: str
     conflict_strategy_description: str
+    rows_deleted: int = 0
+    execution_strategy: str = "ON_CONFLICT"
+    retry_attempts: int = 0
+    lock_wait_seconds: float = 0.0
+    missing_columns: list[str] = field(default_factory=list)
+    rows_unroutable: int = 0
+    partition_rows: dict[str, int] = field(default_factory=dict)
+    rows_skipped_watermark: int = 0
+    indexes_deferred: list[str] = field(default_factory=list)
+    session_settings: dict[str, dict[str, str]] = field(default_factory=dict)  # phase -> settings applied
+    chunks_committed: int = 0  # Chunks of a deadline-aware load, including resumed runs
+    continuation_token: ContinuationToken | None = None  # Set when a deadline stopped the load early
+    throttle_decisions: list[ThrottleDecision] = field(default_factory=list)
+    throttle_wait_seconds: float = 0.0
 
 
 @staticmethod
@@ -60,18 +121,58 @@ def read_csv_to_dict_list(csv_path: str | Path) -> list[dict[str, str]]:
 @staticmethod
 def execute_upsert_workflow(
     connection: psycopg2.extensions.connection,
-    data: list[dict[str, str]] | str | Path,
+    data: list[dict[str, str]] | Iterable[dict[str, Any]] | str | Path,
     target_table: str,
     conflict_columns: list[str] | None = None,
     update_columns: list[str] | None = None,
     batch_size: int = 1000,
     keep_temp_table: bool = False,
-    schema: str = 'public'
-) -> UpsertResult:
+    schema: str = 'public',
+    file_format: str | None = None,
+    column_sample_size: int = 1000,
+    on_new_columns: str = 'widen',
+    staging_mode: str = 'values',
+    pipeline_queue_depth: int = 4,
+    conversion_workers: int = 0,
+    trust_json_columns: list[str] | None = None,
+    execution_strategy: str = 'auto',
+    update_only: bool = False,
+    delete_flag_column: str | None = None,
+    load_id: str | None = None,
+    checkpoint_chunk_size: int = 10000,
+    retry_policy: RetryPolicy | None = None,
+    lock_mode: str | None = None,
+    lock_buckets: int = 1024,
+    plan: UpsertPlan | str | Path | None = None,
+    dry_run: bool = False,
+    dry_run_sample_size: int | None = None,
+    explain_analyze: bool = False,
+    partition_routing: bool = False,
+    on_unroutable: str = 'skip',
+    partition_workers: int = 0,
+    connection_factory: Callable[[], psycopg2.extensions.connection] | None = None,
+    reject_table: str | None = None,
+    reject_file: str | Path | None = None,
+    watermark_column: str | None = None,
+    watermark_lookback: timedelta | int | float | None = None,
+    watermark_scope: list[str] | None = None,
+    initial_load: str = 'never',
+    index_deferral_threshold: float | None = None,
+    index_rebuild_concurrently: bool = False,
+    index_rebuild_workers: int = 0,
+    session_profile: str | dict[str, dict[str, str]] | None = None,
+    single_transaction: bool = False,
+    commit: bool = True,
+    server_routine: bool = False,
+    deadline: Callable[[], float] | float | None = None,
+    deadline_policy: DeadlinePolicy | None = None,
+    resume_from: ContinuationToken | str | None = None,
+    throttle_policy: ThrottlePolicy | None = None
+) -> UpsertResult | DryRunReport:
     """Execute complete upsert workflow with automatic conflict detection.
 
     This function orchestrates the complete upsert process including:
-    1. Data input handling (CSV files or direct data lists)
+    1. Data input handling (data files, direct data lists or streaming iterables)
     2. Temporary table creation with automatic column detection
     3. Conflict strategy detection (primary key, unique constraints, or insert-only)
     4. Data deduplication using appropriate strategy
@@ -80,7 +181,9 @@ def execute_upsert_workflow(
     Args:
         connection: Active PostgreSQL database connection
         target_table: Name of the target table for upsert operation
-        data: Input data as list of dictionaries, CSV file path, or Path object
+        data: Input data as list of dictionaries, any iterable of dictionaries, or a
+            path to a CSV, NDJSON or Parquet file (CSV and NDJSON may be gzipped).
+            Files and iterables are streamed into staging without being materialized
         conflict_columns: Optional override for conflict detection columns. If provided,
                         these columns will be used for conflict resolution instead of
                         automatic detection (primary keys, unique constraints)
@@ -89,9 +192,154 @@ def execute_upsert_workflow(
         batch_size: Number of rows to process in each batch during temp table population
         temp_table_prefix: Prefix for temporary table name (default: "_temp_")
         keep_temp_table: Whether to preserve temporary table after operation
+        file_format: "csv", "ndjson" or "parquet" for file input; detected from the
+                    extension when omitted
+        column_sample_size: Number of leading rows used to fix the column plan (and the
+                    automatic conflict strategy). Later rows are checked for unseen keys
+                    as they stream into staging, without a separate scan of the data
+        on_new_columns: What to do with keys matching a table column that first appear
+                    after the sample: "widen" (default) stages them from then on,
+                    "report" leaves them out and lists them in missing_columns
+        staging_mode: "values" (default) inserts batches with execute_values. "pipelined"
+                    converts the next batch in a background thread while the current
+                    one is sent with COPY; batch_size is then rows per COPY block.
+                    "quarantine" COPYs the rows as text and casts them set-wise: rows
+                    with invalid values or violating NOT NULL/CHECK constraints are
+                    rejected (see reject_table/reject_file) and the rest is loaded.
+                    Reject counts appear in deduplication_result.dropped_reasons
+        pipeline_queue_depth: Maximum number of converted batches buffered in
+                    pipelined staging mode
+        conversion_workers: Convert and serialize batches in this many worker processes
+                    (implies pipelined staging). Useful for JSON- and array-heavy data.
+                    Workers are not forked, so scripts need an ``if __name__ == '__main__':`` guard
+        trust_json_columns: json/jsonb columns whose string values are already valid
+                    JSON; they skip client-side validation and the server rejects bad JSON
+        execution_strategy: "auto" (default), "on_conflict" or "merge". Auto uses
+                    INSERT...ON CONFLICT when a unique index matches the conflict columns
+                    and MERGE (PostgreSQL 15+) otherwise
+        update_only: Only update existing rows, never insert (uses MERGE)
+        delete_flag_column: Boolean field in the data; matched target rows whose staged
+                    row has it set to true are deleted (uses MERGE)
+        load_id: Enables durable staging. Rows are staged in checkpointed chunks into an
+                    UNLOGGED table, and retrying with the same load_id and input skips
+                    chunks that were already staged, or the whole load once applied
+        checkpoint_chunk_size: Number of rows per checkpointed chunk in durable mode
+        retry_policy: Retries for deadlocks (40P01) and serialization failures (40001)
+                    during deduplication and upsert. Only the apply step is re-run,
+                    against the still-present staging table. Defaults to RetryPolicy()
+        lock_mode: Coordinate concurrent writers with advisory locks around the apply
+                    phase: "table" serializes writers of the table, "bucket" only
+                    queues writers whose conflict keys hash to the same buckets
+        lock_buckets: Number of key-hash buckets used by "bucket" lock mode
+        plan: Cached table plan (UpsertPlan) or path of a plan file replacing schema
+                    introspection with a single validation query. A stale or missing
+                    plan is rebuilt, and saved when a path was given
+        dry_run: Stage the data and report the conflict strategy, generated SQL,
+                    EXPLAIN plans and estimated insert/update split (DryRunReport)
+                    instead of applying it. Nothing is written to the target; durable
+                    staging (load_id) and lock_mode are not used, and reject_table and
+                    reject_file are not supported
+        dry_run_sample_size: Stage only this many leading rows in a dry run
+                    (default: all rows)
+        explain_analyze: In a dry run, use EXPLAIN ANALYZE. The statements really run
+                    inside a transaction that is rolled back
+        partition_routing: For partitioned targets, group the deduplicated rows by leaf
+                    partition and apply each group directly to its partition. Rows that
+                    fit no existing partition are counted before anything is applied
+                    (rows_unroutable)
+        on_unroutable: "skip" (default) leaves unroutable rows out, "error" fails the
+                    upsert before any partition is written
+        partition_workers: Apply partition groups concurrently from this many
+                    connections opened by connection_factory. Each group then commits
+                    on its own, so the upsert is no longer atomic across partitions:
+                    a group failing with a deadlock or serialization failure is
+                    retried on its own (retry_policy) and the whole apply is not
+        connection_factory: Callable returning a new connection, for partition_workers
+        reject_table: In quarantine staging mode, table (in schema) that rejected rows
+                    are written to with their reason; created if missing
+        reject_file: In quarantine staging mode, NDJSON file rejected rows are appended to
+        watermark_column: Incremental mode. The target's current maximum of this column
+                    is read and rows at or below it are skipped before staging
+                    (rows_skipped_watermark). Rows whose value cannot be compared,
+                    and rows flagged for deletion, are always staged
+        watermark_lookback: Still stage rows within this distance below the watermark
+                    (a timedelta for date/time columns, a number otherwise)
+        watermark_scope: Track the watermark per value of these columns (e.g.
+                    ['account_id']) instead of over the whole table
+        initial_load: "never" (default) always stages. "auto" checks whether the
+                    target is empty (one extra query) and then COPYs the rows,
+                    deduplicated on the client, straight into it without staging or
+                    ON CONFLICT (execution_strategy "COPY"). "truncate" truncates the
+                    target and reloads it with COPY FREEZE in one transaction. The
+                    fast path holds all rows in memory, so streamed input is no
+                    longer streamed; it is not used with dry_run, load_id,
+                    quarantine staging, update_only, delete_flag_column or
+                    partition_routing
+        index_deferral_threshold: Backfill mode. When the staged rows reach this fraction
+                    of the target's estimated size (e.g. 0.2), the target's non-unique
+                    secondary indexes are dropped before the apply phase and rebuilt
+                    after it, also when it fails (indexes_deferred). Definitions are
+                    recorded in a table first, so a crashed run's indexes are rebuilt at
+                    the start of the next deferring load of the table (or by
+                    restore_deferred_indexes). Targets never analyzed (unknown size)
+                    keep their indexes. Unique indexes, including the arbiter, are kept
+        index_rebuild_concurrently: Rebuild deferred indexes with CREATE INDEX
+                    CONCURRENTLY, which does not block writers
+        index_rebuild_workers: Rebuild deferred indexes in parallel from this many
+                    connections opened by connection_factory
+        session_profile: Server settings for the load: "bulk", "latency", "safe" (see
+                    session_tuning.TUNING_PROFILES) or a custom {phase: {setting: value}}
+                    dict with phases "session", "staging", "apply" and "index_build".
+                    Phase settings are applied with SET LOCAL in each transaction of
+                    the phase, so they revert afterwards; the settings applied are
+                    recorded in session_settings
+        single_transaction: Run staging and apply in one transaction, with an
+                    ON COMMIT DROP temp table, so the load works through a
+                    transaction-pooling proxy (e.g. PgBouncer in transaction mode)
+                    where consecutive transactions may use different server
+                    connections. Apply retries roll back to a savepoint. Session-level
+                    settings are not applied, and load_id, partition_workers,
+                    index_deferral_threshold and keep_temp_table are not supported.
+                    On failure the transaction is rolled back (left to the caller
+                    when commit is False)
+        commit: Whether to commit the load. When False it runs in a single
+                    transaction (implies single_transaction) that is left open, so
+                    the caller can commit it together with its own statements. The
+                    empty-target fast path is not used
+        server_routine: Deduplicate, upsert and count with a generated server-side
+                    function (installed lazily in the target's schema, replaced when
+                    outdated) in a single round trip instead of a dozen statements
+                    (execution_strategy "ROUTINE"). Used for the ON CONFLICT and
+                    insert-only strategies without partition_routing, and by roles
+                    allowed to create the function; otherwise the statements are
+                    issued as usual (see drop_server_routines for cleaning up)
+        deadline: Wall-clock limit, as a callable returning the seconds left (e.g.
+                    ``lambda: context.get_remaining_time_in_millis() / 1000``) or
+                    the seconds available from now. The input is applied in chunks
+                    that commit one by one, sized from the measured throughput so
+                    that each finishes before the deadline; when no further chunk
+                    fits, the load stops and the partial result carries a
+                    continuation_token. Not supported with load_id, dry_run,
+                    commit=False, initial_load='truncate', watermark_column or
+                    index_deferral_threshold
+        deadline_policy: Chunk sizing and reserved margin for deadline (DeadlinePolicy)
+        resume_from: Continuation token (or its dumps() string) of an earlier run
+                    stopped by its deadline; the input records it committed are
+                    skipped. The input must be the same, in the same order.
+                    A failing chunk raises ChunkedLoadError, whose partial_result
+                    and continuation_token cover the chunks committed before it.
+                    With a deadline, each chunk's staging and apply transactions
+                    also get a statement_timeout ending shortly before it
+                    (DeadlinePolicy.statement_timeout)
+        throttle_policy: Apply in chunks (as with deadline, which it may be combined
+                    with) and, before each chunk, sample replica replay lag and
+                    active backends. Over a limit the load pauses and chunks shrink;
+                    with headroom they grow back. Decisions are recorded in
+                    throttle_decisions and pauses in throttle_wait_seconds
 
     Returns:
-        UpsertResult: Object containing operation results and statistics
+        UpsertResult: Object containing operation results and statistics, or a
+            DryRunReport when dry_run is set
 
     Raises:
         ValueError: If data is empty or target_table is invalid
@@ -111,99 +359,546 @@ def execute_upsert_workflow(
         API responses by accepting direct data lists, eliminating the need
         for intermediate CSV file creation in lambda/cloud functions.
     """
+    # Options forwarded to each chunk of a deadline-aware load
+    chunk_options = {name: value for name, value in locals().items()
+                     if name not in ('connection', 'data', 'deadline', 'deadline_policy', 'resume_from',
+                                     'throttle_policy')}
     logger.info(f"Starting upsert workflow for table '{target_table}'")
 
     # Step 1: Handle input data
     if isinstance(data, (str, Path)):
-        logger.info(f"Reading CSV file: {data}")
-        data_list = read_csv_to_dict_list(data)
-    else:
+        logger.info(f"Streaming data file: {data}")
+        data = iter_records(data, file_format)
+
+    if resume_from is not None:
+        if isinstance(resume_from, str):
+            resume_from = ContinuationToken.loads(resume_from)
+        data = skip_committed_rows(iter(data), resume_from, target_table, schema)
+
+    if deadline is not None or throttle_policy is not None:
+        return _execute_in_chunks(connection, data, deadline, deadline_policy or DeadlinePolicy(),
+                                  resume_from, throttle_policy, chunk_options)
+
+    if isinstance(data, list):
+        sample_rows = data[:column_sample_size]
         data_list = data
+    else:
+        # Streaming input: discover columns from a sampled prefix, then stream everything
+        records = iter(data)
+        sample_rows = list(islice(records, column_sample_size))
+        data_list = chain(sample_rows, records)
 
-    if not data_list:
+    if not sample_rows:
         raise ValueError("No data provided for upsert operation")
 
-    logger.info(f"Processing {len(data_list)} rows")
+    if execution_strategy not in ('auto', 'on_conflict', 'merge'):
+        raise ValueError(f"Invalid execution_strategy: {execution_strategy!r}")
 
-    # Step 2: Inspect target table schema
-    target_schema = inspect_table_schema(connection, target_table, schema)
-    logger.info("Target table schema inspected")
+    if staging_mode not in STAGING_MODES:
+        raise ValueError(f"Invalid staging_mode: {staging_mode!r}")
 
-    # Step 3: Match and map columns
-    column_mapping = match_columns(data_list, target_schema)
-    matched_columns = column_mapping['matched_columns']
-    logger.info(f"Matched columns: {matched_columns}")
+    if lock_mode is not None and lock_mode not in LOCK_MODES:
+        raise ValueError(f"Invalid lock_mode: {lock_mode!r}")
+
+    if on_new_columns not in NEW_COLUMN_MODES:
+        raise ValueError(f"Invalid on_new_columns: {on_new_columns!r}")
+
+    if on_unroutable not in UNROUTABLE_MODES:
+        raise ValueError(f"Invalid on_unroutable: {on_unroutable!r}")
+
+    if partition_workers > 0 and connection_factory is None:
+        raise ValueError("partition_workers requires a connection_factory")
+
+    if staging_mode == 'quarantine' and load_id and not dry_run:
+        raise ValueError("quarantine staging mode cannot be combined with durable staging (load_id)")
+
+    if (reject_table or reject_file) and staging_mode != 'quarantine':
+        raise ValueError("reject_table and reject_file require staging_mode='quarantine'")
+
+    if (reject_table or reject_file) and dry_run:
+        raise ValueError("reject_table and reject_file cannot be combined with dry_run, which must not write rejects")
+
+    if (watermark_lookback is not None or watermark_scope) and not watermark_column:
+        raise ValueError("watermark_lookback and watermark_scope require a watermark_column")
+
+    if index_rebuild_workers > 0 and connection_factory is None:
+        raise ValueError("index_rebuild_workers requires a connection_factory")
+
+    tuning = resolve_profile(session_profile)
+
+    single_transaction = single_transaction or not commit
+    if single_transaction and (load_id or partition_workers > 0 or index_deferral_threshold is not None
+                               or keep_temp_table):
+        raise ValueError("single_transaction cannot be combined with load_id, partition_workers, "
+                         "index_deferral_threshold or keep_temp_table")
+
+    if not commit and dry_run:
+        raise ValueError("commit=False cannot be combined with dry_run, which rolls back its transaction")
+
+    if initial_load not in INITIAL_LOAD_MODES:
+        raise ValueError(f"Invalid initial_load: {initial_load!r}")
 
-    # Step 4: Create and populate temp table
-    # Create temp table with auto-generated name
-    temp_table_name = create_temp_table(connection, target_table, schema)
-    logger.info(f"Created temp table: {temp_table_name}")
-
-    # Populate temp table
-    rows_inserted = bulk_insert_to_temp(
-        connection=connection,
-        temp_table_name=temp_table_name,
-        data_list=data_list,
-        matched_columns=matched_columns,
-        target_schema=target_schema,
-        batch_size=batch_size
+    bulk_load_possible = commit and not (dry_run or load_id or staging_mode == 'quarantine' or update_only
+                                         or delete_flag_column or partition_routing)
+    if initial_load == 'truncate' and not bulk_load_possible:
+        raise ValueError("initial_load='truncate' cannot be combined with dry_run, load_id, quarantine "
+                         "staging, update_only, delete_flag_column, partition_routing or commit=False")
+
+    if isinstance(data_list, list):
+        logger.info(f"Processing {len(data_list)} rows")
+
+    # Step 2: Inspect target table schema, or validate the cached plan
+    if plan is not None:
+        target_schema = get_plan(connection, target_table, schema, plan).table_schema
+        logger.info("Target table plan loaded")
+    else:
+        target_schema = inspect_table_schema(connection, target_table, schema)
+        logger.info("Target table schema inspected")
+
+    if partition_routing and not target_schema.is_partitioned:
+        raise ValueError(f"partition_routing requires a partitioned target, '{schema}.{target_table}' is not")
+
+    if index_deferral_threshold is not None and commit and not dry_run:
+        # Indexes left dropped by a deferring load that crashed before rebuilding them
+        restored = restore_deferred_indexes(connection, target_table, schema, index_rebuild_concurrently,
+                                            index_rebuild_workers, connection_factory, tuning.get('index_build'))
+        if restored:
+            logger.warning(f"Rebuilt {len(restored)} indexes left deferred by an earlier load: {restored}")
+
+    # Step 3: Match and map columns on the sample; the rest is checked while staging
+    # The delete flag is staged alongside the data even when the target has no such column
+    add_delete_flag = bool(delete_flag_column and delete_flag_column not in target_schema.valid_columns)
+    column_matcher = IncrementalColumnMatcher(
+        target_schema,
+        on_new_columns=on_new_columns,
+        extra_columns=[delete_flag_column] if add_delete_flag else None
     )
-    logger.info(f"Populated temp table with {rows_inserted} rows")
+    column_matcher.observe_rows(sample_rows)
+    matched_columns = column_matcher.matched_columns
+    staged_columns = column_matcher.staged_columns
+    data_list = column_matcher.track(data_list)
 
+    watermark_filter = None
+    if watermark_column:
+        unknown = [col for col in [watermark_column, *(watermark_scope or [])]
+                   if col not in target_schema.valid_columns]
+        if unknown:
+            raise ValueError(f"Watermark columns {unknown} are not columns of '{schema}.{target_table}'")
+        watermark_filter = WatermarkFilter(
+            read_watermarks(connection, target_table, watermark_column, watermark_scope, schema, target_schema),
+            watermark_column,
+            watermark_scope,
+            watermark_lookback,
+            delete_flag_column,
+            target_schema
+        )
+        data_list = watermark_filter.filter(data_list)
+
+    if dry_run and dry_run_sample_size is not None:
+        data_list = islice(data_list, dry_run_sample_size)
+    logger.info(f"Matched columns: {matched_columns}")
+
+    # Step 4: Find conflict strategy
+    if conflict_columns:
+        # Use user-provided conflict columns, bound to their arbiter index when one exists
+        arbiter = find_arbiter_index(target_schema, conflict_columns)
+        conflict_strategy = ConflictStrategy(
+            type="USER_DEFINED",
+            columns=conflict_columns,
+            description=f"User-defined conflict resolution on: {conflict_columns}",
+            index_name=arbiter.name if arbiter else None,
+            index_predicate=arbiter.predicate if arbiter else None
+        )
+        logger.info(f"Using user-defined conflict strategy: {conflict_strategy.description}")
+    else:
+        # Automatic detection
+        conflict_strategy = find_conflict_strategy(
+            target_schema,
+            matched_columns
+        )
+        logger.info(f"Using automatic conflict strategy: {conflict_strategy.type}")
+
+    session_settings = {}
+    if tuning.get('session') and single_transaction:
+        # Session-level settings would outlive the transaction on a pooled server connection
+        logger.info(f"Not applying session settings {tuning['session']} in single-transaction mode")
+    elif tuning.get('session'):
+        session_settings['session'] = apply_session_settings(connection, tuning['session'])
+
+    # Staging runs inside the try, so a failure (including one raised by the input)
+    # rolls back and drops the temp table
+    temp_table_name = None
     try:
-        # Step 5: Find conflict strategy
-        if conflict_columns:
-            # Use user-provided conflict columns
-            conflict_strategy = ConflictStrategy(
-                type="USER_DEFINED",
-                columns=conflict_columns,
-                description=f"User-defined conflict resolution on: {conflict_columns}"
+        # Step 5 (fast path): COPY straight into an empty or truncated target
+        prior_dropped_reasons = {}
+        if initial_load != 'never' and bulk_load_possible and (
+                initial_load == 'truncate' or is_table_empty(connection, target_table, schema)):
+            rows, dedup_result = deduplicate_rows(data_list, conflict_strategy.columns, target_schema)
+            rows_loaded, retry_attempts = run_with_retry(
+                connection,
+                lambda: load_into_empty_table(
+                    connection, rows, target_table, list(staged_columns), target_schema, schema,
+                    truncate=initial_load == 'truncate',
+                    batch_size=batch_size,
+                    trusted_json_columns=trust_json_columns or (),
+                    settings=tuning.get('apply')
+                ),
+                retry_policy or RetryPolicy()
             )
-            logger.info(f"Using user-defined conflict strategy: {conflict_strategy.description}")
-        else:
-            # Automatic detection
-            conflict_strategy = find_conflict_strategy(
+            if rows_loaded is not None:
+                if tuning.get('apply'):
+                    session_settings['apply'] = dict(tuning['apply'])
+                return UpsertResult(
+                    rows_inserted=rows_loaded,
+                    rows_updated=0,
+                    total_affected=rows_loaded,
+                    deduplication_result=dedup_result,
+                    matched_columns=list(matched_columns) or list(sample_rows[0].keys()),
+                    conflict_strategy_type=conflict_strategy.type,
+                    conflict_strategy_description=conflict_strategy.description,
+                    execution_strategy="COPY",
+                    retry_attempts=retry_attempts,
+                    missing_columns=list(column_matcher.missing_columns),
+                    rows_skipped_watermark=watermark_filter.rows_skipped if watermark_filter else 0,
+                    session_settings=session_settings
+                )
+            # The target is not empty after all: stage the deduplicated rows instead
+            data_list = rows
+            prior_dropped_reasons = dedup_result.dropped_reasons
+
+        # Step 5: Create and populate staging table
+        staging_table = None
+        quarantine_result = None
+        if load_id and not dry_run:
+            # Durable mode: stage into a checkpointed UNLOGGED table, then copy to a temp table
+            ensure_checkpoint_table(connection, schema)
+            if is_load_applied(get_checkpoints(connection, load_id, schema)):
+                logger.info(f"Load '{load_id}' was already applied, nothing to do")
+                return UpsertResult(
+                    rows_inserted=0,
+                    rows_updated=0,
+                    total_affected=0,
+                    deduplication_result=DeduplicationResult(
+                        original_count=0, deduplicated_count=0, dropped_count=0, dropped_reasons={}),
+                    matched_columns=list(matched_columns),
+                    conflict_strategy_type=conflict_strategy.type,
+                    conflict_strategy_description=conflict_strategy.description
+                )
+
+            staging_table = create_durable_staging_table(
+                connection,
+                target_table,
+                load_id,
                 target_schema,
-                matched_columns
+                extra_columns={delete_flag_column: 'boolean'} if add_delete_flag else None,
+                schema=schema
             )
-            logger.info(f"Using automatic conflict strategy: {conflict_strategy.type}")
+            if tuning.get('staging'):
+                session_settings['staging'] = dict(tuning['staging'])
+            rows_inserted, chunks_skipped = stage_chunks(
+                connection=connection,
+                staging_table=staging_table,
+                load_id=load_id,
+                target_table=target_table,
+                data_list=data_list,
+                staged_columns=staged_columns,
+                table_schema=target_schema,
+                chunk_size=checkpoint_chunk_size,
+                batch_size=batch_size,
+                schema=schema,
+                trusted_json_columns=trust_json_columns or (),
+                settings=tuning.get('staging')
+            )
+            logger.info(f"Staged {rows_inserted} rows for load '{load_id}' ({chunks_skipped} chunks resumed)")
+            # The temp copy is made inside the apply transaction
+            temp_table_name = None
+        else:
+            # Create temp table with auto-generated name
+            temp_table_name = create_temp_table(
+                connection, target_table, schema, target_schema,
+                on_commit_drop=single_transaction,
+                commit=not single_transaction
+            )
+            logger.info(f"Created temp table: {temp_table_name}")
 
-        # Step 6: Deduplicate temp table
-        dedup_result = deduplicate_temp_table(
-            connection,
-            temp_table_name,
-            conflict_strategy.columns
-        )
-        logger.info(f"Deduplication: {dedup_result.original_count} -> {dedup_result.deduplicated_count}")
-
-        # Step 7: Execute upsert
-        columns_to_update = update_columns or matched_columns or list(data_list[0].keys())
-        inserted_count, updated_count = execute_upsert(
-            connection,
-            temp_table_name,
-            target_table,
-            conflict_strategy,
-            columns_to_update,
-            schema,
-        )
-        logger.info(f"Upsert complete: {inserted_count} inserted, {updated_count} updated\n")
+            if add_delete_flag:
+                _add_delete_flag_column(connection, temp_table_name, delete_flag_column, commit=not single_transaction)
+
+            # Populate temp table
+            if tuning.get('staging'):
+                session_settings['staging'] = apply_local_settings(connection, tuning['staging'])
+            if staging_mode == 'quarantine':
+                quarantine_result = quarantine_stage(
+                    connection=connection,
+                    temp_table_name=temp_table_name,
+                    data_list=data_list,
+                    staged_columns=staged_columns,
+                    table_schema=target_schema,
+                    target_table=target_table,
+                    schema=schema,
+                    batch_size=batch_size,
+                    reject_table=reject_table,
+                    reject_file=reject_file,
+                    workers=conversion_workers,
+                    trusted_json_columns=trust_json_columns or (),
+                    settings=tuning.get('staging'),
+                    commit=not single_transaction
+                )
+                rows_inserted = quarantine_result.rows_staged
+            elif staging_mode == 'pipelined' or conversion_workers > 0:
+                rows_inserted = pipelined_insert_to_temp(
+                    connection=connection,
+                    temp_table_name=temp_table_name,
+                    data_list=data_list,
+                    matched_columns=staged_columns,
+                    target_schema=target_schema,
+                    batch_size=batch_size,
+                    queue_depth=pipeline_queue_depth,
+                    commit=not single_transaction,
+                    workers=conversion_workers,
+                    trusted_json_columns=trust_json_columns or ()
+                )
+            else:
+                rows_inserted = bulk_insert_to_temp(
+                    connection=connection,
+                    temp_table_name=temp_table_name,
+                    data_list=data_list,
+                    matched_columns=staged_columns,
+                    target_schema=target_schema,
+                    batch_size=batch_size,
+                    commit=not single_transaction,
+                    trusted_json_columns=trust_json_columns or ()
+                )
+            logger.info(f"Populated temp table with {rows_inserted} rows")
+
+        if column_matcher.late_columns:
+            logger.info(f"Columns first seen after the sample: {column_matcher.late_columns} "
+                        f"({'staged' if on_new_columns == 'widen' else 'not staged'})")
+
+        # Step 6: Pick the statement applying the staged rows
+        if execution_strategy == 'auto':
+            strategy_name = choose_execution_strategy(
+                connection, target_schema, conflict_strategy, update_only, delete_flag_column)
+        else:
+            strategy_name = execution_strategy.upper()
+        logger.info(f"Using {strategy_name} execution strategy")
+
+        columns_to_update = update_columns or list(matched_columns) or list(sample_rows[0].keys())
+
+        routine = None
+        if server_routine and not dry_run:
+            if strategy_name == "ON_CONFLICT" and not partition_routing:
+                routine = build_server_routine(target_schema, conflict_strategy, columns_to_update)
+                logger.info(f"Using server routine {routine.name}")
+            else:
+                logger.info(f"Server routines do not support {strategy_name}"
+                            f"{' with partition routing' if partition_routing else ''}, issuing statements")
+
+        lock_wait_seconds = 0.0
+        routing = None
+
+        def apply_to_table(apply_connection, source_table, table_schema_name, table_name):
+            """Lock and apply a deduplicated source table to the target (or one of its partitions).
+
+            Returns (inserted, updated, deleted, lock wait seconds); it may run in a
+            partition worker thread, so it does not touch the workflow's state.
+            """
+            if apply_connection is not connection:
+                apply_local_settings(apply_connection, tuning.get('apply'))
+            lock_wait = 0.0
+            if lock_mode:
+                # Keyed on the target table, so partition groups coordinate with whole-table writers
+                lock_wait = acquire_apply_locks(
+                    apply_connection, source_table, target_table, conflict_strategy.columns,
+                    lock_mode, lock_buckets, schema)
+
+            if strategy_name == "MERGE":
+                return *execute_merge(
+                    apply_connection,
+                    source_table,
+                    table_name,
+                    conflict_strategy.columns,
+                    columns_to_update,
+                    table_schema_name,
+                    update_only=update_only,
+                    delete_flag_column=delete_flag_column,
+                ), lock_wait
+            if update_only or delete_flag_column:
+                raise PgsqlUpserterError("update_only and delete_flag_column require the MERGE execution strategy")
+
+            inserted, updated = execute_upsert(
+                apply_connection,
+                source_table,
+                table_name,
+                conflict_strategy,
+                columns_to_update,
+                table_schema_name,
+            )
+            return inserted, updated, 0, lock_wait
+
+        def apply_staged_rows():
+            """Deduplicate and upsert in one transaction, which a retry rolls back as a unit."""
+            nonlocal temp_table_name, routing, lock_wait_seconds, routine
+            if tuning.get('apply'):
+                session_settings['apply'] = apply_local_settings(connection, tuning['apply'])
+            if staging_table:
+                temp_table_name = copy_staging_to_temp(connection, staging_table)
+
+            if routine is not None:
+                # Deduplicate, apply and count in one call
+                if lock_mode:
+                    lock_wait_seconds += acquire_apply_locks(
+                        connection, temp_table_name, target_table, conflict_strategy.columns,
+                        lock_mode, lock_buckets, schema)
+                try:
+                    dedup_result, inserted_count, updated_count = run_server_routine(
+                        connection, routine, temp_table_name)
+                    deleted_count = 0
+                except PermissionError as e:
+                    # E.g. a DML-only role: the transaction is intact, issue the statements instead
+                    logger.warning(f"{e}; issuing statements instead")
+                    routine = None
+            if routine is None:
+                dedup_result = deduplicate_temp_table(
+                    connection,
+                    temp_table_name,
+                    conflict_strategy.columns
+                )
+            if quarantine_result and quarantine_result.rows_rejected:
+                _add_dropped_rows(dedup_result, quarantine_result.rejected_reasons)
+            if prior_dropped_reasons:
+                _add_dropped_rows(dedup_result, prior_dropped_reasons)
+            logger.info(f"Deduplication: {dedup_result.original_count} -> {dedup_result.deduplicated_count}")
+
+            if partition_routing:
+                # Apply each leaf partition's rows directly to it
+                routing = route_to_partitions(
+                    connection, temp_table_name, target_schema, staged_columns,
+                    on_unroutable=on_unroutable, durable=partition_workers > 0)
+                if routing.durable:
+                    # Worker connections read the group tables; from here on the apply is not atomic
+                    connection.commit()
+                try:
+                    inserted_count, updated_count, deleted_count, lock_wait = apply_partition_groups(
+                        connection, routing, apply_to_table, partition_workers, connection_factory,
+                        retry_policy=retry_policy)
+                finally:
+                    drop_routing_tables(connection, routing)
+                lock_wait_seconds += lock_wait
+            elif routine is None:
+                inserted_count, updated_count, deleted_count, lock_wait = apply_to_table(
+                    connection, temp_table_name, schema, target_table)
+                lock_wait_seconds += lock_wait
+
+            if staging_table:
+                # Commits the upsert together with the checkpoint update
+                mark_load_applied(connection, load_id, staging_table, schema)
+
+            return dedup_result, inserted_count, updated_count, deleted_count
+
+        if dry_run:
+            # Explain and estimate instead of applying; everything after staging is rolled back
+            apply_local_settings(connection, tuning.get('apply'))
+            return run_dry_run(
+                connection,
+                temp_table_name,
+                target_table,
+                conflict_strategy,
+                strategy_name,
+                columns_to_update,
+                rows_staged=rows_inserted,
+                sampled=dry_run_sample_size is not None and rows_inserted >= dry_run_sample_size,
+                matched_columns=list(matched_columns),
+                missing_columns=column_matcher.missing_columns,
+                schema=schema,
+                update_only=update_only,
+                delete_flag_column=delete_flag_column,
+                analyze=explain_analyze
+            )
+
+        indexes_deferred = []
+        if index_deferral_threshold is not None and should_defer_indexes(
+                rows_inserted, estimate_table_rows(connection, target_schema), index_deferral_threshold):
+            indexes_deferred = [index.name for index in defer_indexes(connection, target_schema)]
+
+        # Step 7: Deduplicate and execute upsert, retrying deadlocks and serialization failures
+        def rebuild_deferred_indexes():
+            if tuning.get('index_build'):
+                session_settings['index_build'] = dict(tuning['index_build'])
+            try:
+                restore_deferred_indexes(connection, target_table, schema, index_rebuild_concurrently,
+                                         index_rebuild_workers, connection_factory, tuning.get('index_build'))
+            finally:
+                release_index_deferral(connection, target_table, schema)
+
+        apply_retry_policy = retry_policy or RetryPolicy()
+        if partition_routing and partition_workers > 0:
+            # Groups commit on their own and are retried individually by their workers;
+            # re-running the whole apply would repeat the committed ones
+            apply_retry_policy = RetryPolicy(max_attempts=1)
+        try:
+            (dedup_result, inserted_count, updated_count, deleted_count), retry_attempts = run_with_retry(
+                connection, apply_staged_rows, apply_retry_policy, savepoint=single_transaction)
+        except BaseException:
+            if indexes_deferred:
+                # Indexes are restored even when the apply fails, without masking its error
+                connection.rollback()
+                try:
+                    rebuild_deferred_indexes()
+                except PgsqlUpserterError as e:
+                    logger.error(str(e))
+            raise
+
+        if indexes_deferred:
+            connection.commit()  # The rebuild runs outside the apply transaction
+            rebuild_deferred_indexes()
+        if watermark_filter:
+            logger.info(f"Skipped {watermark_filter.rows_skipped} rows at or below the watermark")
+        logger.info(f"Upsert complete: {inserted_count} inserted, {updated_count} updated, "
+                    f"{deleted_count} deleted\n")
 
         # Step 8: Create final result
         result = UpsertResult(
             rows_inserted=inserted_count,
             rows_updated=updated_count,
-            total_affected=inserted_count + updated_count,
+            total_affected=inserted_count + updated_count + deleted_count,
             deduplication_result=dedup_result,
-            matched_columns=matched_columns or list(data_list[0].keys()),
+            matched_columns=list(matched_columns) or list(sample_rows[0].keys()),
             conflict_strategy_type=conflict_strategy.type,
-            conflict_strategy_description=conflict_strategy.description
+            conflict_strategy_description=conflict_strategy.description,
+            rows_deleted=deleted_count,
+            execution_strategy="ROUTINE" if routine else strategy_name,
+            retry_attempts=retry_attempts,
+            lock_wait_seconds=lock_wait_seconds,
+            missing_columns=list(column_matcher.missing_columns),
+            rows_unroutable=routing.unroutable if routing else 0,
+            partition_rows=dict(routing.groups) if routing else {},
+            rows_skipped_watermark=watermark_filter.rows_skipped if watermark_filter else 0,
+            indexes_deferred=indexes_deferred,
+            session_settings=session_settings
         )
 
+        if single_transaction:
+            # Dropped within the transaction, so the caller's commit (or ours) leaves nothing behind
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {temp_table_name}")
+            if commit:
+                connection.commit()
+
         return result
 
+    except BaseException:
+        if commit:
+            # The transaction is ours: do not leave it open or aborted, e.g. on a pooled connection
+            try:
+                connection.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f"Failed to roll back after the upsert failed: {e}")
+        raise
+
     finally:
-        # Clean up temp table unless requested to keep
-        if not keep_temp_table:
+        # Clean up temp table unless requested to keep (single-transaction tables drop on commit)
+        if not keep_temp_table and temp_table_name and not single_transaction:
             try:
                 with connection.cursor() as cursor:
                     cursor.execute(f"DROP TABLE IF EXISTS {temp_table_name}")
@@ -213,6 +908,134 @@ def execute_upsert_workflow(
                 logger.warning(f"Failed to clean up temp table {temp_table_name}: {e}")
 
 
+def _execute_in_chunks(
+    connection: psycopg2.extensions.connection,
+    data: Iterable[dict[str, Any]],
+    deadline: Callable[[], float] | float | None,
+    policy: DeadlinePolicy,
+    resume_from: ContinuationToken | None,
+    throttle_policy: ThrottlePolicy | None,
+    options: dict[str, Any]
+) -> UpsertResult:
+    """Run the workflow over committed chunks of the input until it is exhausted or the deadline nears."""
+    unsupported = [name for name, active in (
+        ('load_id', options['load_id']),
+        ('dry_run', options['dry_run']),
+        ('commit=False', not options['commit']),
+        ("initial_load='truncate'", options['initial_load'] == 'truncate'),
+        ('watermark_column', options['watermark_column']),
+        ('index_deferral_threshold', options['index_deferral_threshold'] is not None),
+    ) if active]
+    if unsupported:
+        raise ValueError(f"deadline and throttle_policy cannot be combined with {', '.join(unsupported)}")
+
+    target_table, schema = options['target_table'], options['schema']
+    remaining = remaining_time_function(deadline) if deadline is not None else lambda: math.inf
+    throttle = Throttle(connection, throttle_policy) if throttle_policy else None
+    # Inspect once; every chunk then validates the plan with a single query
+    options = {**options, 'plan': get_plan(connection, target_table, schema, options['plan'])}
+    tuning = resolve_profile(options['session_profile'])
+
+    def run_chunk(chunk: list[dict[str, Any]]) -> UpsertResult:
+        chunk_options = options
+        if deadline is not None and policy.statement_timeout:
+            # Backstop for a single statement running into the deadline
+            timeout = remaining() - policy.margin_seconds / 2
+            chunk_options = {**options, 'session_profile': with_statement_timeout(tuning, timeout)}
+        return execute_upsert_workflow(connection, chunk, **chunk_options)
+
+    results, rows_committed, finished, error = run_chunks(iter(data), run_chunk, remaining, policy, throttle)
+
+    rows_committed += resume_from.rows_committed if resume_from else 0
+    chunks_committed = len(results) + (resume_from.chunks_committed if resume_from else 0)
+    continuation_token = None
+    if not finished:
+        continuation_token = ContinuationToken(target_table, schema, rows_committed, chunks_committed)
+        if error is None:
+            logger.info(f"Deadline reached, resume after {rows_committed} rows")
+    result = _combine_results(results, chunks_committed, continuation_token)
+    if throttle:
+        result.throttle_decisions = throttle.decisions
+        result.throttle_wait_seconds = throttle.paused_seconds
+    if error is not None:
+        raise ChunkedLoadError(
+            f"Chunk {len(results) + 1} of the load into '{schema}.{target_table}' failed after "
+            f"{rows_committed} committed rows: {error}",
+            partial_result=result,
+            continuation_token=continuation_token
+        ) from error
+    return result
+
+
+def _combine_results(
+    results: list[UpsertResult],
+    chunks_committed: int,
+    continuation_token: ContinuationToken | None
+) -> UpsertResult:
+    """Sum the results of the chunks of a deadline-aware load."""
+    dedup_result = DeduplicationResult(original_count=0, deduplicated_count=0, dropped_count=0, dropped_reasons={})
+    combined = UpsertResult(
+        rows_inserted=0,
+        rows_updated=0,
+        total_affected=0,
+        deduplication_result=dedup_result,
+        matched_columns=[],
+        conflict_strategy_type=results[0].conflict_strategy_type if results else "NONE",
+        conflict_strategy_description=(results[0].conflict_strategy_description if results
+                                       else "No chunk was applied before the deadline"),
+        chunks_committed=chunks_committed,
+        continuation_token=continuation_token
+    )
+    for result in results:
+        combined.rows_inserted += result.rows_inserted
+        combined.rows_updated += result.rows_updated
+        combined.rows_deleted += result.rows_deleted
+        combined.total_affected += result.total_affected
+        chunk_dedup = result.deduplication_result
+        dedup_result.original_count += chunk_dedup.original_count
+        dedup_result.deduplicated_count += chunk_dedup.deduplicated_count
+        dedup_result.dropped_count += chunk_dedup.dropped_count
+        for reason, count in chunk_dedup.dropped_reasons.items():
+            dedup_result.dropped_reasons[reason] = dedup_result.dropped_reasons.get(reason, 0) + count
+        combined.matched_columns += [col for col in result.matched_columns if col not in combined.matched_columns]
+        combined.missing_columns += [col for col in result.missing_columns if col not in combined.missing_columns]
+        combined.execution_strategy = result.execution_strategy  # Later chunks are not initial loads
+        combined.retry_attempts += result.retry_attempts
+        combined.lock_wait_seconds += result.lock_wait_seconds
+        combined.rows_unroutable += result.rows_unroutable
+        for partition, count in result.partition_rows.items():
+            combined.partition_rows[partition] = combined.partition_rows.get(partition, 0) + count
+        combined.session_settings = result.session_settings
+    return combined
+
+
+def _add_delete_flag_column(
+    connection,
+    temp_table_name: str,
+    delete_flag_column: str,
+    commit: bool = True
+) -> None:
+    """Add a boolean delete flag column to the temp table for MERGE deletes."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {temp_table_name} ADD COLUMN {delete_flag_column} boolean")
+            if commit:
+                connection.commit()
+    except psycopg2.Error as e:
+        if commit:
+            connection.rollback()
+        raise PgsqlUpserterError(f"Failed to add delete flag column '{delete_flag_column}': {e}")
+
+
+def _add_dropped_rows(dedup_result: DeduplicationResult, dropped_reasons: dict[str, int]) -> None:
+    """Count rows dropped before deduplication (quarantined, deduplicated on the client) in its result."""
+    dropped = sum(dropped_reasons.values())
+    dedup_result.original_count += dropped
+    dedup_result.dropped_count += dropped
+    for reason, count in dropped_reasons.items():
+        dedup_result.dropped_reasons[reason] = dedup_result.dropped_reasons.get(reason, 0) + count
+
+
 class UpsertEngine:
     """Main interface for PostgreSQL upsert operations.
 
@@ -264,8 +1087,9 @@ class UpsertEngine:
         update_columns: list[str] | None = None,
         batch_size: int = 1000,
         keep_temp_table: bool = False,
-        schema: str = 'public'
-    ) -> UpsertResult:
+        schema: str = 'public',
+        **workflow_options
+    ) -> UpsertResult | DryRunReport:
         """Execute complete upsert workflow with automatic conflict detection.
 
         This function orchestrates the complete upsert process including:
@@ -287,9 +1111,12 @@ class UpsertEngine:
             batch_size: Number of rows to process in each batch during temp table population
             temp_table_prefix: Prefix for temporary table name (default: "_temp_")
             keep_temp_table: Whether to preserve temporary table after operation
+            **workflow_options: Additional keyword arguments forwarded to
+                            execute_upsert_workflow (e.g. execution_strategy, update_only)
 
         Returns:
-            UpsertResult: Object containing operation results and statistics
+            UpsertResult: Object containing operation results and statistics, or a
+                DryRunReport when dry_run is set in workflow_options
 
         Raises:
             ValueError: If data is empty or target_table is invalid
@@ -318,5 +1145,6 @@ class UpsertEngine:
             update_columns=update_columns,
             batch_size=batch_size,
             keep_temp_table=keep_temp_table,
-            schema=schema
+            schema=schema,
+            **workflow_options
         )
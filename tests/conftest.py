@@ -0,0 +1,97 @@
+"""Shared fixtures.
+
+Tests marked ``db`` run against the PostgreSQL server in the
+``PGSQL_UPSERTER_TEST_DSN`` environment variable (e.g.
+``host=localhost user=postgres dbname=postgres``) and are skipped without it.
+They create and drop their own tables in the ``public`` schema.
+"""
+
+import os
+
+import pytest
+
+from pgsql_upserter.schema_inspector import ColumnInfo, TableSchema, UniqueConstraint, UniqueIndex
+
+TEST_DSN_VARIABLE = "PGSQL_UPSERTER_TEST_DSN"
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get(TEST_DSN_VARIABLE):
+        return
+    skip_db = pytest.mark.skip(reason=f"{TEST_DSN_VARIABLE} is not set")
+    for item in items:
+        if "db" in item.keywords:
+            item.add_marker(skip_db)
+
+
+@pytest.fixture
+def dsn():
+    return os.environ[TEST_DSN_VARIABLE]
+
+
+@pytest.fixture
+def connection(dsn):
+    """A psycopg2 connection to the test server, rolled back and closed afterwards."""
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    yield conn
+    if not conn.closed:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def execute(connection):
+    """Run setup SQL and commit it."""
+    def run(sql: str, params=None) -> list[tuple]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else []
+        connection.commit()
+        return rows
+    return run
+
+
+@pytest.fixture
+def make_schema():
+    """Build a TableSchema without a database.
+
+    Columns are given as name -> data type. ``primary_key`` and each entry of
+    ``unique`` become constraints; ``unique_indexes`` are passed through as is.
+    """
+    def build(
+        columns: dict[str, str],
+        primary_key: list[str] | None = None,
+        unique: list[list[str]] | None = None,
+        unique_indexes: list[UniqueIndex] | None = None,
+        auto_generated: list[str] | None = None,
+        table_name: str = 'metrics',
+        schema_name: str = 'public'
+    ) -> TableSchema:
+        column_infos = [
+            ColumnInfo(
+                name=name,
+                data_type=data_type,
+                is_nullable=name not in (primary_key or []),
+                default_value=None,
+                is_auto_generated=name in (auto_generated or []),
+                ordinal_position=position
+            )
+            for position, (name, data_type) in enumerate(columns.items(), start=1)
+        ]
+        pk = UniqueConstraint(name=f"{table_name}_pkey", columns=primary_key, is_primary=True) if primary_key else None
+        constraints = [pk] if pk else []
+        constraints += [
+            UniqueConstraint(name=f"{table_name}_{'_'.join(cols)}_key", columns=cols, is_primary=False)
+            for cols in unique or []
+        ]
+        return TableSchema(
+            table_name=table_name,
+            schema_name=schema_name,
+            columns=column_infos,
+            unique_constraints=constraints,
+            primary_key=pk,
+            unique_indexes=list(unique_indexes or [])
+        )
+    return build
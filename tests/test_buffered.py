@@ -0,0 +1,187 @@
+import threading
+
+import pytest
+
+from pgsql_upserter import buffered
+from pgsql_upserter.buffered import BufferedUpserter, _group_by_columns
+from pgsql_upserter.conflict_resolver import build_deduplication_result
+from pgsql_upserter.exceptions import PgsqlUpserterError, SchemaIntrospectionError
+from pgsql_upserter.plan_cache import UpsertPlan
+from pgsql_upserter.upsert_engine import UpsertResult
+
+
+class FakeConnection:
+    rollbacks = 0
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+
+
+class FakeWorkflow:
+    """Stands in for execute_upsert_workflow, recording the rows of every call."""
+
+    def __init__(self):
+        self.calls: list[tuple[str, list[dict]]] = []
+        self.failures = 0  # Calls left to fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, connection, rows, target_table, **options) -> UpsertResult:
+        self.entered.set()
+        self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise PgsqlUpserterError("flush failed")
+        self.calls.append((target_table, [dict(row) for row in rows]))
+        return UpsertResult(
+            rows_inserted=len(rows), rows_updated=0, total_affected=len(rows),
+            deduplication_result=build_deduplication_result(len(rows), 0, len(rows)),
+            matched_columns=list(rows[0]), conflict_strategy_type="PRIMARY_KEY", conflict_strategy_description=""
+        )
+
+    @property
+    def rows(self) -> list[dict]:
+        return [row for _, rows in self.calls for row in rows]
+
+
+@pytest.fixture
+def workflow(monkeypatch, make_schema):
+    plan = UpsertPlan(table_schema=make_schema({'id': 'integer', 'a': 'integer', 'b': 'text'}, primary_key=['id']),
+                      fingerprint='test', server_version=160000, temp_table_columns_sql=None)
+    fake = FakeWorkflow()
+    monkeypatch.setattr(buffered, 'get_plan', lambda connection, table, schema, cached=None: cached or plan)
+    monkeypatch.setattr(buffered, 'execute_upsert_workflow', fake)
+    return fake
+
+
+def upserter(**options) -> BufferedUpserter:
+    return BufferedUpserter(FakeConnection(), **{'max_age': 60, **options})
+
+
+def test_group_by_columns_keeps_first_appearance_order():
+    rows = [{'id': 1, 'a': 1}, {'id': 2}, {'a': 3, 'id': 3}]
+    assert _group_by_columns(rows) == [[{'id': 1, 'a': 1}, {'a': 3, 'id': 3}], [{'id': 2}]]
+
+
+def test_rows_are_coalesced_on_the_conflict_key(workflow):
+    with upserter() as buffer:
+        buffer.add('metrics', [{'id': 1, 'a': 1}, {'id': '1', 'b': 'x'}])
+        buffer.add('metrics', [{'id': 2, 'a': 2}, {'id': 1, 'a': 5}, {'id': None, 'a': 9}, {'id': None, 'a': 9}])
+        assert buffer.buffered_rows == 4
+        buffer.flush()
+        assert buffer.buffered_rows == 0
+
+    assert workflow.calls == [
+        ('metrics', [{'id': 1, 'a': 5, 'b': 'x'}]),
+        ('metrics', [{'id': 2, 'a': 2}, {'id': None, 'a': 9}, {'id': None, 'a': 9}]),
+    ]
+    stats = buffer.stats
+    assert (stats.rows_received, stats.rows_coalesced, stats.rows_flushed, stats.flushes) == (6, 2, 4, 1)
+
+
+def test_size_and_age_limits_trigger_flushes(workflow):
+    with upserter(max_rows=3) as buffer:
+        buffer.add('metrics', [{'id': i} for i in range(3)])
+        assert workflow.entered.wait(5)
+    assert len(workflow.rows) == 3
+
+    workflow.entered.clear()
+    with upserter(max_age=0.05) as buffer:
+        buffer.add('metrics', [{'id': 10}])
+        assert workflow.entered.wait(5)
+
+
+def test_failed_flushes_are_requeued_under_newer_rows(workflow):
+    workflow.failures = 1
+    with upserter() as buffer:
+        buffer.add('metrics', [{'id': 1, 'a': 1, 'b': 'old'}])
+        with pytest.raises(PgsqlUpserterError, match="Flush failed"):
+            buffer.flush()
+        assert buffer.buffered_rows == 1
+        buffer.add('metrics', [{'id': 1, 'a': 2, 'b': 'new'}, {'id': 2, 'a': 3, 'b': 'x'}])
+        buffer.flush()
+
+    assert workflow.rows == [{'id': 1, 'a': 2, 'b': 'new'}, {'id': 2, 'a': 3, 'b': 'x'}]
+    assert buffer.stats.flush_failures == 1
+
+
+def test_rows_are_dead_lettered_after_max_flush_attempts(workflow):
+    workflow.failures = 10
+    dead = []
+    buffer = upserter(max_flush_attempts=2, dead_letter=lambda table, rows, error: dead.append((table, rows)))
+    buffer.add('metrics', [{'id': 1}])
+    for _ in range(2):
+        with pytest.raises(PgsqlUpserterError):
+            buffer.flush()
+    assert dead == [('metrics', [{'id': 1}])]
+    assert buffer.buffered_rows == 0
+    assert buffer.stats.rows_dead_lettered == 1
+    buffer.close()
+
+
+def test_close_reports_unwritten_rows(workflow):
+    workflow.failures = 10
+    buffer = upserter(max_flush_attempts=None)
+    buffer.add('metrics', [{'id': 1}])
+    with pytest.raises(PgsqlUpserterError, match="1 rows not written"):
+        buffer.close()
+    with pytest.raises(PgsqlUpserterError, match="closed"):
+        buffer.add('metrics', [{'id': 2}])
+
+
+def test_add_blocks_while_flushing_falls_behind(workflow):
+    workflow.release.clear()
+    buffer = upserter(max_rows=2, max_buffered_rows=2, backpressure_timeout=0.1)
+    try:
+        buffer.add('metrics', [{'id': 1}, {'id': 2}])
+        assert workflow.entered.wait(5)
+        buffer.add('metrics', [{'id': 3}, {'id': 4}])
+        with pytest.raises(PgsqlUpserterError, match="flushing cannot keep up"):
+            buffer.add('metrics', [{'id': 5}])
+        assert buffer.stats.backpressure_waits == 1
+
+        # Room frees up once the running flush completes
+        threading.Timer(0.1, workflow.release.set).start()
+        buffer.backpressure_timeout = 5
+        buffer.add('metrics', [{'id': 5}])
+    finally:
+        workflow.release.set()
+        buffer.close()
+    assert sorted(row['id'] for row in workflow.rows) == [1, 2, 3, 4, 5]
+
+
+def test_failed_table_inspection_is_rolled_back(monkeypatch):
+    def get_plan(connection, table, schema, cached=None):
+        raise SchemaIntrospectionError("no such table")
+
+    monkeypatch.setattr(buffered, 'get_plan', get_plan)
+    buffer = upserter()
+    with pytest.raises(SchemaIntrospectionError, match="no such table"):
+        buffer.add('missing', [{'id': 1}])
+    assert buffer.connection.rollbacks == 1
+    assert buffer.buffered_rows == 0
+    buffer.close()
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        BufferedUpserter(FakeConnection(), max_rows=0)
+    with pytest.raises(ValueError):
+        BufferedUpserter(FakeConnection(), dry_run=True)
+
+
+@pytest.mark.db
+def test_buffered_rows_reach_the_table(connection, execute):
+    execute("DROP TABLE IF EXISTS test_buffered; CREATE TABLE test_buffered (id int PRIMARY KEY, a int, b text)")
+    try:
+        with BufferedUpserter(connection, max_rows=100, max_age=0.05) as buffer:
+            for i in range(250):
+                buffer.add('test_buffered', [{'id': i % 50, 'a': i}, {'id': i % 50, 'b': f'b{i}'}])
+        assert buffer.stats.rows_received == 500
+        assert execute("SELECT count(*), sum(a), count(b) FROM test_buffered") == [(50, sum(range(200, 250)), 50)]
+    finally:
+        execute("DROP TABLE IF EXISTS test_buffered")
@@ -0,0 +1,78 @@
+import pytest
+
+from pgsql_upserter.column_matcher import IncrementalColumnMatcher, match_columns
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.fixture
+def schema(make_schema):
+    return make_schema({'id': 'integer', 'spend': 'numeric', 'clicks': 'integer', 'loaded_at': 'timestamptz'},
+                       primary_key=['id'], auto_generated=['loaded_at'])
+
+
+def test_match_columns_is_case_insensitive(schema):
+    result = match_columns([{'ID': 1, 'Spend': 2, 'loaded_at': 'x', 'extra': 3}, {'clicks': 4}], schema,
+                           ignore_columns=['CLICKS'])
+    assert result == {
+        'matched_columns': ['id', 'spend'],
+        'ignored_columns': ['loaded_at', 'clicks'],
+        'missing_columns': ['extra'],
+        'column_map': {'id': 'ID', 'spend': 'Spend'},
+    }
+
+
+def test_track_rekeys_rows_and_treats_case_variants_as_aliases(schema):
+    matcher = IncrementalColumnMatcher(schema)
+    matcher.observe_rows([{'ID': 1, 'Spend': 2}])
+    rows = list(matcher.track([{'ID': 1, 'Spend': 2}, {'ID': 2, 'spend': 3}]))
+    assert rows == [{'id': 1, 'spend': 2}, {'id': 2, 'spend': 3}]
+    assert matcher.matched_columns == ['id', 'spend']
+    assert matcher.late_columns == []
+
+
+def test_widen_mode_stages_late_columns(schema):
+    matcher = IncrementalColumnMatcher(schema, extra_columns=['_del'])
+    matcher.observe_rows([{'id': 1}])
+    staged = matcher.staged_columns
+    rows = list(matcher.track([{'id': 1}, {'id': 2, 'Clicks': 5, 'other': 1}]))
+    assert rows[1] == {'id': 2, 'clicks': 5, 'other': 1}
+    assert matcher.matched_columns == ['id', 'clicks']
+    # Updated in place, so staging functions holding the list see the new column
+    assert staged is matcher.staged_columns
+    assert staged == ['_del', 'id', 'clicks']
+    assert matcher.late_columns == ['Clicks']
+    assert matcher.missing_columns == ['other']
+    assert matcher.column_map == {'id': 'id', 'clicks': 'Clicks'}
+
+
+def test_report_mode_leaves_late_columns_unstaged(schema):
+    matcher = IncrementalColumnMatcher(schema, on_new_columns='report')
+    matcher.observe_rows([{'id': 1}])
+    list(matcher.track([{'id': 2, 'spend': 1}, {'id': 3, 'SPEND': 2}]))
+    assert matcher.matched_columns == ['id']
+    assert matcher.late_columns == ['spend']
+    assert matcher.missing_columns == ['spend', 'SPEND']
+
+
+def test_invalid_mode(schema):
+    with pytest.raises(ValueError):
+        IncrementalColumnMatcher(schema, on_new_columns='ignore')
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("staging_mode", ['values', 'pipelined'])
+def test_workflow_stages_renamed_and_late_columns(connection, execute, staging_mode):
+    execute("""
+        DROP TABLE IF EXISTS test_columns;
+        CREATE TABLE test_columns (id int PRIMARY KEY, spend numeric, clicks int)
+    """)
+    try:
+        rows = [{'ID': i, 'Spend': i} for i in range(5)] + [{'ID': 5, 'Spend': 5, 'Clicks': 7}]
+        result = execute_upsert_workflow(connection, rows, 'test_columns', column_sample_size=2, batch_size=2,
+                                         staging_mode=staging_mode)
+        assert result.rows_inserted == 6
+        assert result.matched_columns == ['id', 'spend', 'clicks']
+        assert execute("SELECT id, spend::int, clicks FROM test_columns WHERE id IN (0, 5) ORDER BY id") == [
+            (0, 0, None), (5, 5, 7)]
+    finally:
+        execute("DROP TABLE IF EXISTS test_columns")
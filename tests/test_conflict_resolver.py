@@ -0,0 +1,57 @@
+from pgsql_upserter.conflict_resolver import (
+    build_deduplication_result,
+    build_upsert_sql,
+    find_arbiter_index,
+    find_conflict_strategy,
+)
+from pgsql_upserter.schema_inspector import UniqueIndex
+
+
+def index(name: str, columns: list[str], is_primary: bool = False, predicate: str | None = None,
+          size_bytes: int = 8192) -> UniqueIndex:
+    return UniqueIndex(name=name, columns=columns, is_primary=is_primary, predicate=predicate, size_bytes=size_bytes)
+
+
+def test_narrowest_usable_index_wins_over_the_primary_key(make_schema):
+    schema = make_schema({'id': 'integer', 'ad_id': 'integer', 'day': 'date'}, unique_indexes=[
+        index('metrics_pkey', ['id'], is_primary=True),
+        index('metrics_ad_day', ['ad_id', 'day']),
+        index('metrics_ad', ['ad_id'], size_bytes=16384),
+    ])
+    strategy = find_conflict_strategy(schema, ['ad_id', 'day'])
+    assert (strategy.type, strategy.columns, strategy.index_name) == ("UNIQUE_INDEX", ['ad_id'], 'metrics_ad')
+
+    strategy = find_conflict_strategy(schema, ['id', 'ad_id', 'day'])
+    assert (strategy.type, strategy.index_name) == ("PRIMARY_KEY", 'metrics_pkey')
+
+
+def test_full_index_beats_partial_and_partial_keeps_its_predicate(make_schema):
+    schema = make_schema({'ad_id': 'integer', 'day': 'date'}, unique_indexes=[
+        index('metrics_ad_live', ['ad_id'], predicate="day IS NOT NULL"),
+        index('metrics_ad_day', ['ad_id', 'day']),
+    ])
+    assert find_conflict_strategy(schema, ['ad_id', 'day']).index_name == 'metrics_ad_day'
+
+    strategy = find_conflict_strategy(schema, ['ad_id'])
+    assert strategy.index_predicate == "day IS NOT NULL"
+    assert "ON CONFLICT (ad_id) WHERE (day IS NOT NULL)" in build_upsert_sql("staged", "metrics", strategy, ['ad_id'])
+
+
+def test_insert_only_without_usable_index(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'])
+    strategy = find_conflict_strategy(schema, ['v'])
+    assert (strategy.type, strategy.columns) == ("INSERT_ONLY", [])
+
+
+def test_arbiter_must_match_the_column_set_exactly(make_schema):
+    schema = make_schema({'a': 'integer', 'b': 'integer'}, primary_key=['a', 'b'])
+    assert find_arbiter_index(schema, ['b', 'a']).name == 'metrics_pkey'
+    assert find_arbiter_index(schema, ['a']) is None
+    assert find_arbiter_index(schema, []) is None
+
+
+def test_deduplication_result_splits_null_keys_and_duplicates():
+    result = build_deduplication_result(original_count=10, null_count=2, deduplicated_count=5)
+    assert (result.original_count, result.deduplicated_count, result.dropped_count) == (10, 5, 5)
+    assert result.dropped_reasons == {'null_or_empty_conflict_columns': 2, 'duplicate_conflict_keys': 3}
+    assert build_deduplication_result(4, 0, 4).dropped_reasons == {}
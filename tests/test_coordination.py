@@ -0,0 +1,42 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from pgsql_upserter.coordination import acquire_apply_locks
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+def test_invalid_lock_mode():
+    with pytest.raises(ValueError):
+        acquire_apply_locks(None, 'staged', 'metrics', ['id'], 'row')
+
+
+@pytest.fixture
+def locked_table(execute):
+    execute("DROP TABLE IF EXISTS test_locks; CREATE TABLE test_locks (id int PRIMARY KEY, v int)")
+    yield 'test_locks'
+    execute("DROP TABLE IF EXISTS test_locks")
+
+
+@pytest.mark.db
+def test_bucket_mode_waits_for_a_table_lock_holder(connection, dsn, locked_table):
+    result = execute_upsert_workflow(connection, [{'id': i, 'v': 1} for i in range(10)], locked_table,
+                                     lock_mode='bucket', lock_buckets=4)
+    assert result.rows_inserted == 10
+
+    holder = psycopg2.connect(dsn)
+    try:
+        with holder.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('pgsql_upserter:public.test_locks'), -1)")
+        release = threading.Timer(0.5, holder.commit)
+        release.start()
+        start = time.monotonic()
+        result = execute_upsert_workflow(connection, [{'id': 1, 'v': 2}], locked_table, lock_mode='bucket')
+        release.join()
+    finally:
+        holder.close()
+    assert result.rows_updated == 1
+    assert result.lock_wait_seconds >= 0.3
+    assert time.monotonic() - start >= 0.3
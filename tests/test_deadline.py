@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+from pgsql_upserter.deadline import (
+    ChunkSizer,
+    ContinuationToken,
+    DeadlinePolicy,
+    run_chunks,
+    skip_committed_rows,
+    with_statement_timeout,
+)
+from pgsql_upserter.exceptions import ChunkedLoadError
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+POLICY = DeadlinePolicy(margin_seconds=5, initial_chunk_rows=1000, min_chunk_rows=100, max_chunk_rows=50_000,
+                        target_chunk_seconds=10, safety_factor=2, max_growth=4)
+
+
+def test_first_chunk_uses_the_initial_size_unless_inside_the_margin():
+    sizer = ChunkSizer(POLICY)
+    assert sizer.next_size(60) == 1000
+    assert sizer.next_size(5) == 0
+    assert sizer.next_size(-1) == 0
+
+
+def test_chunks_fit_the_target_time_and_grow_gradually():
+    sizer = ChunkSizer(POLICY)
+    sizer.record(1000, 1.0)  # 2 ms per row with the safety factor
+    assert sizer.next_size(60) == 4000  # 5000 would fit, growth is capped at 4x
+    sizer.record(4000, 4.0)
+    assert sizer.next_size(60) == 5000
+    assert sizer.next_size(7) == 1000  # Only 2s left after the margin
+
+    sizer.record(0, 1.0)  # Ignored
+    assert sizer.seconds_per_row == 0.001
+
+
+def test_minimal_chunks_run_only_when_they_fit():
+    sizer = ChunkSizer(POLICY)
+    sizer.record(100, 1.0)  # 20 ms per row with the safety factor
+    assert sizer.next_size(5 + 2.5) == 125
+    assert sizer.next_size(5 + 1.9) == 0
+    assert sizer.next_size(5 + 2) == 100
+
+
+def test_continuation_tokens_round_trip():
+    token = ContinuationToken('metrics', 'public', rows_committed=2500, chunks_committed=3)
+    assert ContinuationToken.loads(token.dumps()) == token
+
+
+@pytest.mark.parametrize("text", [
+    'not json',
+    '[1, 2]',
+    json.dumps({'target_table': 'metrics'}),
+    json.dumps({'version': 1, 'target_table': 'metrics'}),
+    json.dumps({'version': 1, 'target_table': 'metrics', 'schema': 'public', 'rows_committed': 1,
+                'chunks_committed': 1, 'extra': True}),
+    json.dumps({'version': 99, 'target_table': 'metrics', 'schema': 'public', 'rows_committed': 1,
+                'chunks_committed': 1}),
+])
+def test_malformed_tokens_are_rejected(text):
+    with pytest.raises(ValueError):
+        ContinuationToken.loads(text)
+
+
+def test_committed_rows_are_skipped_for_the_same_table_only():
+    token = ContinuationToken('metrics', 'public', rows_committed=2, chunks_committed=1)
+    assert list(skip_committed_rows(iter(range(5)), token, 'metrics', 'public')) == [2, 3, 4]
+    with pytest.raises(ValueError, match="public.metrics"):
+        skip_committed_rows(iter(range(5)), token, 'metrics', 'reporting')
+
+
+def test_statement_timeout_covers_staging_and_apply():
+    tuning = with_statement_timeout({'apply': {'work_mem': '64MB'}, 'cleanup': {'jit': 'off'}}, 2.5)
+    assert tuning == {'apply': {'work_mem': '64MB', 'statement_timeout': '2500ms'},
+                      'staging': {'statement_timeout': '2500ms'}, 'cleanup': {'jit': 'off'}}
+    assert with_statement_timeout({}, 0)['staging'] == {'statement_timeout': '1ms'}
+
+
+def test_run_chunks_until_the_input_is_exhausted():
+    results, rows_committed, exhausted, error = run_chunks(iter(range(10_000)), len, lambda: 60, POLICY)
+    assert (results[:2], sum(results), rows_committed, exhausted, error) == ([1000, 4000], 10_000, 10_000, True, None)
+
+
+def test_run_chunks_stops_before_the_deadline():
+    time_left = iter([60, 60, 4])
+    results, rows_committed, exhausted, error = run_chunks(iter(range(10_000)), len, lambda: next(time_left), POLICY)
+    assert (results, rows_committed, exhausted, error) == ([1000, 4000], 5000, False, None)
+
+
+def test_run_chunks_stops_at_a_failed_chunk():
+    def run_chunk(chunk):
+        if chunk[0] >= 1000:
+            raise RuntimeError("chunk failed")
+        return len(chunk)
+
+    records = iter(range(10_000))
+    results, rows_committed, exhausted, error = run_chunks(records, run_chunk, lambda: 60, POLICY)
+    assert (results, rows_committed, exhausted, str(error)) == ([1000], 1000, False, "chunk failed")
+    assert next(records) == 5000  # Later chunks were not started
+
+
+@pytest.fixture
+def deadline_table(execute):
+    execute("DROP TABLE IF EXISTS test_deadline; "
+            "CREATE TABLE test_deadline (id int PRIMARY KEY, v int CHECK (v <> 250))")
+    yield 'test_deadline'
+    execute("DROP TABLE IF EXISTS test_deadline")
+
+
+@pytest.mark.db
+def test_stopped_loads_resume_from_their_token(connection, execute, deadline_table):
+    rows = [{'id': i % 400, 'v': i + 1000} for i in range(500)]
+    # Without the statement timeout, remaining() is only called to size chunks
+    policy = DeadlinePolicy(margin_seconds=5, initial_chunk_rows=120, max_growth=1, statement_timeout=False)
+    time_left = iter([60, 60, 1])
+    result = execute_upsert_workflow(connection, rows, deadline_table, deadline=lambda: next(time_left),
+                                     deadline_policy=policy)
+    assert (result.chunks_committed, result.rows_inserted) == (2, 240)
+    assert result.continuation_token == ContinuationToken(deadline_table, 'public', 240, 2)
+
+    result = execute_upsert_workflow(connection, rows, deadline_table, deadline=60, deadline_policy=policy,
+                                     resume_from=result.continuation_token.dumps())
+    assert result.continuation_token is None
+    assert (result.rows_inserted, result.rows_updated) == (160, 100)
+    assert result.chunks_committed > 2
+    assert execute("SELECT count(*), min(v), max(v) FROM test_deadline") == [(400, 1100, 1499)]
+
+    with pytest.raises(ValueError):
+        execute_upsert_workflow(connection, rows, deadline_table, deadline=60, dry_run=True)
+
+
+@pytest.mark.db
+def test_failed_chunks_report_the_committed_prefix(connection, execute, deadline_table):
+    rows = [{'id': i, 'v': i} for i in range(500)]
+    policy = DeadlinePolicy(initial_chunk_rows=100, min_chunk_rows=100, max_growth=1)
+    with pytest.raises(ChunkedLoadError) as excinfo:
+        execute_upsert_workflow(connection, rows, deadline_table, deadline=60, deadline_policy=policy)
+    token = excinfo.value.continuation_token
+    assert token.rows_committed == excinfo.value.partial_result.rows_inserted == 200
+    assert execute("SELECT count(*) FROM test_deadline") == [(200,)]
+
+    rows[250]['v'] = -1
+    result = execute_upsert_workflow(connection, rows, deadline_table, deadline=60, deadline_policy=policy,
+                                     resume_from=token)
+    assert (result.rows_inserted, result.chunks_committed) == (300, 5)
+    assert result.session_settings['apply']['statement_timeout'].endswith('ms')
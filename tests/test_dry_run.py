@@ -0,0 +1,46 @@
+import pytest
+
+from pgsql_upserter.dry_run import DryRunReport
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.fixture
+def dry_run_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_dry_run;
+        CREATE TABLE test_dry_run (id int PRIMARY KEY, v text);
+        INSERT INTO test_dry_run SELECT g, 'old' FROM generate_series(1, 100) g;
+    """)
+    yield 'test_dry_run'
+    execute("DROP TABLE IF EXISTS test_dry_run")
+
+
+ROWS = [{'id': i, 'v': 'new'} for i in range(50, 250)] + [{'id': 60, 'v': 'dup'}, {'id': None, 'v': 'x'}]
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("explain_analyze", [False, True])
+def test_dry_run_reports_without_writing(connection, execute, dry_run_table, explain_analyze):
+    report = execute_upsert_workflow(connection, ROWS, dry_run_table, dry_run=True, explain_analyze=explain_analyze)
+    assert isinstance(report, DryRunReport)
+    assert (report.execution_strategy, report.rows_staged, report.sampled) == ("ON_CONFLICT", 202, False)
+    assert (report.estimated_inserts, report.estimated_updates) == (149, 51)
+    assert report.deduplication_result.dropped_reasons == {
+        'null_or_empty_conflict_columns': 1, 'duplicate_conflict_keys': 1}
+    assert report.analyzed == explain_analyze
+    assert (report.apply.actual_time_ms is not None) == explain_analyze
+    assert "ON CONFLICT" in report.apply.sql
+
+    assert execute("SELECT count(*), count(*) FILTER (WHERE v = 'old') FROM test_dry_run") == [(100, 100)]
+    assert execute("SELECT count(*) FROM pg_tables WHERE tablename LIKE 'temp_staging%'") == [(0,)]
+
+
+@pytest.mark.db
+def test_dry_run_sample_and_merge(connection, dry_run_table):
+    report = execute_upsert_workflow(connection, ROWS, dry_run_table, dry_run=True, dry_run_sample_size=20)
+    assert (report.rows_staged, report.sampled) == (20, True)
+
+    report = execute_upsert_workflow(connection, ROWS, dry_run_table, dry_run=True, conflict_columns=['v'],
+                                     execution_strategy='merge', update_only=True)
+    assert report.execution_strategy == "MERGE"
+    assert report.apply.sql.split()[0] == "MERGE"
@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+
+from pgsql_upserter.durable_staging import CHECKPOINT_TABLE, chunk_hash, purge_checkpoints
+from pgsql_upserter.exceptions import PgsqlUpserterError
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+def test_chunk_hash_ignores_key_order_but_not_values_or_row_order():
+    rows = [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'b'}]
+    assert chunk_hash(rows) == chunk_hash([{'v': 'a', 'id': 1}, {'v': 'b', 'id': 2}])
+    assert chunk_hash(rows) != chunk_hash([{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'c'}])
+    assert chunk_hash(rows) != chunk_hash(rows[::-1])
+    assert chunk_hash([{'id': 1}]) != chunk_hash([{'id': '1'}])
+
+
+@pytest.fixture
+def durable_table(execute):
+    execute("DROP TABLE IF EXISTS test_durable; CREATE TABLE test_durable (id int PRIMARY KEY, v int)")
+    yield 'test_durable'
+    execute("DROP TABLE IF EXISTS test_durable")
+
+
+def load(connection, rows, load_id):
+    return execute_upsert_workflow(connection, rows, 'test_durable', load_id=load_id, checkpoint_chunk_size=10)
+
+
+@pytest.mark.db
+def test_failed_load_resumes_from_its_staged_chunks(connection, execute, durable_table):
+    load_id = f"test-{uuid.uuid4().hex}"
+    rows = [{'id': i, 'v': i} for i in range(25)]
+    bad = list(rows)
+    bad[15] = {'id': 15, 'v': 'oops'}
+    with pytest.raises(PgsqlUpserterError):
+        load(connection, bad, load_id)
+    staged = execute(f"SELECT chunk_index, state FROM {CHECKPOINT_TABLE} WHERE load_id = %s ORDER BY 1", (load_id,))
+    assert staged == [(0, 'staged')]
+
+    result = load(connection, rows, load_id)
+    assert result.rows_inserted == 25
+    # Applied loads are recognized and not applied twice
+    assert load(connection, rows, load_id).rows_inserted == 0
+    execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE load_id = %s", (load_id,))
+
+
+@pytest.mark.db
+def test_resume_rejects_changed_or_truncated_input(connection, execute, durable_table):
+    load_id = f"test-{uuid.uuid4().hex}"
+    rows = [{'id': i, 'v': i} for i in range(25)]
+    bad = list(rows)
+    bad[24] = {'id': 24, 'v': 'oops'}
+    with pytest.raises(PgsqlUpserterError):
+        load(connection, bad, load_id)
+
+    changed = list(rows)
+    changed[3] = {'id': 3, 'v': 99}
+    with pytest.raises(PgsqlUpserterError, match="differs from chunk 0"):
+        load(connection, changed, load_id)
+    with pytest.raises(PgsqlUpserterError, match="ended after 1 chunks"):
+        load(connection, rows[:10], load_id)
+
+    execute(f"UPDATE {CHECKPOINT_TABLE} SET updated_at = now() - interval '8 days' WHERE load_id = %s", (load_id,))
+    purge_checkpoints(connection)
+    assert execute(f"SELECT count(*) FROM {CHECKPOINT_TABLE} WHERE load_id = %s", (load_id,)) == [(2,)]
+    assert purge_checkpoints(connection, include_unapplied=True) >= 1
+    assert execute(f"SELECT count(*) FROM {CHECKPOINT_TABLE} WHERE load_id = %s", (load_id,)) == [(0,)]
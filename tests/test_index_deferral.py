@@ -0,0 +1,113 @@
+import psycopg2
+import pytest
+
+from pgsql_upserter.index_deferral import (
+    DEFERRED_INDEX_TABLE,
+    defer_indexes,
+    estimate_table_rows,
+    release_index_deferral,
+    restore_deferred_indexes,
+    should_defer_indexes,
+)
+from pgsql_upserter.schema_inspector import inspect_table_schema
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.mark.parametrize("staged, target, threshold, expected", [
+    (600, 1000, 0.5, True),
+    (500, 1000, 0.5, True),
+    (499, 1000, 0.5, False),
+    (10, 0, 0.5, True),
+    (0, 0, 0.5, False),
+    (10 ** 6, None, 0.1, False),
+])
+def test_should_defer_indexes(staged, target, threshold, expected):
+    assert should_defer_indexes(staged, target, threshold) is expected
+
+
+@pytest.fixture
+def indexed_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_deferral CASCADE;
+        CREATE TABLE test_deferral (id int PRIMARY KEY, a int, b text, c int CONSTRAINT test_deferral_c_key UNIQUE);
+        CREATE INDEX test_deferral_a ON test_deferral (a);
+        CREATE INDEX test_deferral_b_lower ON test_deferral (lower(b)) WHERE a > 0;
+        INSERT INTO test_deferral SELECT g, g, 'x' || g, g FROM generate_series(1, 1000) g;
+    """)
+    yield 'test_deferral'
+    execute("DROP TABLE IF EXISTS test_deferral CASCADE")
+    if execute("SELECT to_regclass(%s) IS NOT NULL", (DEFERRED_INDEX_TABLE,)) == [(True,)]:
+        execute(f"DELETE FROM {DEFERRED_INDEX_TABLE} WHERE target_table = 'public.test_deferral'")
+
+
+def index_state(execute) -> tuple[list[str], int]:
+    names = [row[0] for row in execute("SELECT indexname FROM pg_indexes WHERE tablename = 'test_deferral' ORDER BY 1")]
+    records = execute(f"SELECT count(*) FROM {DEFERRED_INDEX_TABLE} WHERE target_table = 'public.test_deferral'")
+    return names, records[0][0]
+
+
+ALL_INDEXES = ['test_deferral_a', 'test_deferral_b_lower', 'test_deferral_c_key', 'test_deferral_pkey']
+ROWS = [{'id': i, 'a': -i, 'b': 'y', 'c': i} for i in range(1, 600)]
+
+
+@pytest.mark.db
+def test_unanalyzed_target_keeps_its_indexes(connection, indexed_table):
+    schema = inspect_table_schema(connection, indexed_table)
+    assert estimate_table_rows(connection, schema) is None
+    result = execute_upsert_workflow(connection, ROWS, indexed_table, index_deferral_threshold=0.1)
+    assert result.indexes_deferred == []
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("options", [{}, {'index_rebuild_concurrently': True, 'index_rebuild_workers': 2}])
+def test_large_loads_defer_and_rebuild_plain_indexes(connection, dsn, execute, indexed_table, options):
+    execute("ANALYZE test_deferral")
+    if options:
+        options['connection_factory'] = lambda: psycopg2.connect(dsn)
+    result = execute_upsert_workflow(connection, ROWS, indexed_table, index_deferral_threshold=0.2, **options)
+    assert sorted(result.indexes_deferred) == ['public.test_deferral_a', 'public.test_deferral_b_lower']
+    assert result.rows_updated == 599
+    assert index_state(execute) == (ALL_INDEXES, 0)
+
+    result = execute_upsert_workflow(connection, ROWS[:10], indexed_table, index_deferral_threshold=0.2)
+    assert result.indexes_deferred == []
+
+
+@pytest.mark.db
+def test_indexes_left_dropped_by_a_crash_are_restored_by_the_next_deferring_load(connection, dsn, execute,
+                                                                                 indexed_table):
+    execute("ANALYZE test_deferral")
+    crashed = psycopg2.connect(dsn)
+    defer_indexes(crashed, inspect_table_schema(crashed, indexed_table))
+    crashed.close()
+    assert index_state(execute) == (['test_deferral_c_key', 'test_deferral_pkey'], 2)
+
+    # Loads that do not defer leave the records alone
+    execute_upsert_workflow(connection, [{'id': 1, 'a': 2}], indexed_table)
+    assert index_state(execute) == (['test_deferral_c_key', 'test_deferral_pkey'], 2)
+
+    result = execute_upsert_workflow(connection, [{'id': 1, 'a': 2}], indexed_table, index_deferral_threshold=0.2)
+    assert result.indexes_deferred == []
+    assert index_state(execute) == (ALL_INDEXES, 0)
+
+
+@pytest.mark.db
+def test_live_deferrals_are_left_to_their_session(connection, dsn, execute, indexed_table):
+    execute("ANALYZE test_deferral")
+    schema = inspect_table_schema(connection, indexed_table)
+    connection.commit()
+    deferring = psycopg2.connect(dsn)
+    try:
+        assert len(defer_indexes(deferring, schema)) == 2
+        assert restore_deferred_indexes(connection, indexed_table) == []
+        assert defer_indexes(connection, schema) == []
+        assert index_state(execute) == (['test_deferral_c_key', 'test_deferral_pkey'], 2)
+
+        assert len(restore_deferred_indexes(deferring, indexed_table)) == 2
+        release_index_deferral(deferring, indexed_table)
+        assert index_state(execute) == (ALL_INDEXES, 0)
+        assert len(defer_indexes(connection, schema)) == 2
+    finally:
+        deferring.close()
+        restore_deferred_indexes(connection, indexed_table)
+        release_index_deferral(connection, indexed_table)
@@ -0,0 +1,78 @@
+import pytest
+
+from pgsql_upserter.initial_load import conflict_key, deduplicate_rows
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+def test_conflict_key_is_the_staged_text():
+    assert conflict_key({'id': 1, 'day': '2025-01-01'}, ['id', 'day'], {'id': 'integer'}) == ('1', '2025-01-01')
+    assert conflict_key({'id': True}, ['id'], {'id': 'boolean'}) == ('t',)
+    assert conflict_key({'meta': {'k': 1}}, ['meta'], {'meta': 'jsonb'}) == ('{"k":1}',)
+
+
+@pytest.mark.parametrize("value", [None, '', 'null', 'NULL'])
+def test_conflict_key_is_none_when_part_of_it_is_null(value):
+    assert conflict_key({'id': value, 'day': '2025-01-01'}, ['id', 'day'], {}) is None
+    assert conflict_key({'day': '2025-01-01'}, ['id', 'day'], {}) is None
+
+
+def test_deduplicate_rows_keeps_the_last_occurrence(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'])
+    rows = [{'id': 1, 'v': 'a'}, {'id': '2', 'v': 'b'}, {'id': None, 'v': 'c'}, {'id': '1', 'v': 'd'}]
+    kept, result = deduplicate_rows(iter(rows), ['id'], schema)
+    assert kept == [{'id': '1', 'v': 'd'}, {'id': '2', 'v': 'b'}]
+    assert (result.original_count, result.deduplicated_count, result.dropped_count) == (4, 2, 2)
+    assert result.dropped_reasons == {'null_or_empty_conflict_columns': 1, 'duplicate_conflict_keys': 1}
+
+
+def test_deduplicate_rows_without_conflict_columns_keeps_everything():
+    rows = [{'v': 'a'}, {'v': 'a'}]
+    kept, result = deduplicate_rows(rows, [])
+    assert kept == rows
+    assert (result.deduplicated_count, result.dropped_count, result.dropped_reasons) == (2, 0, {})
+
+
+@pytest.fixture
+def initial_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_initial;
+        CREATE TABLE test_initial (id int PRIMARY KEY, v text, tags text[], meta jsonb)
+    """)
+    yield 'test_initial'
+    execute("DROP TABLE IF EXISTS test_initial")
+
+
+ROWS = [{'id': i % 50, 'v': f'v{i}', 'tags': ['a', 'b'], 'meta': {'i': i}} for i in range(100)] + [{'id': None}]
+
+
+@pytest.mark.db
+def test_auto_copies_into_an_empty_target_only(connection, execute, initial_table):
+    result = execute_upsert_workflow(connection, iter(ROWS), initial_table, initial_load='auto')
+    assert (result.execution_strategy, result.rows_inserted) == ("COPY", 50)
+    assert result.deduplication_result.dropped_reasons == {
+        'null_or_empty_conflict_columns': 1, 'duplicate_conflict_keys': 50}
+    assert execute("SELECT v, tags, meta FROM test_initial WHERE id = 1") == [('v51', ['a', 'b'], {'i': 51})]
+
+    result = execute_upsert_workflow(connection, ROWS, initial_table, initial_load='auto')
+    assert (result.execution_strategy, result.rows_inserted, result.rows_updated) == ("ON_CONFLICT", 0, 50)
+
+
+@pytest.mark.db
+def test_keys_the_client_cannot_compare_fall_back_to_upsert(connection, initial_table):
+    result = execute_upsert_workflow(connection, [{'id': '1', 'v': 'a'}, {'id': '01', 'v': 'b'}], initial_table,
+                                     initial_load='auto')
+    assert (result.execution_strategy, result.rows_inserted) == ("ON_CONFLICT", 1)
+    assert result.deduplication_result.dropped_reasons == {'duplicate_conflict_keys': 1}
+
+
+@pytest.mark.db
+def test_truncate_replaces_the_contents(connection, execute, initial_table):
+    execute_upsert_workflow(connection, ROWS, initial_table)
+    result = execute_upsert_workflow(connection, ROWS[:10], initial_table, initial_load='truncate')
+    assert (result.execution_strategy, result.rows_inserted) == ("COPY", 10)
+    assert execute("SELECT count(*), min(v), max(v) FROM test_initial") == [(10, 'v0', 'v9')]
+
+
+def test_truncate_refuses_incompatible_options():
+    with pytest.raises(ValueError, match="cannot be combined"):
+        execute_upsert_workflow(None, ROWS, 'test_initial', initial_load='truncate', dry_run=True)
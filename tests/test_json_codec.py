@@ -0,0 +1,47 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from pgsql_upserter import json_codec
+from pgsql_upserter.temp_staging import _convert_value_for_postgres
+
+BACKENDS = [name for name in json_codec.JSON_BACKENDS if name != 'orjson' or json_codec.orjson is not None]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    previous = json_codec.get_backend()
+    json_codec.set_backend(request.param)
+    yield request.param
+    json_codec.set_backend(previous)
+
+
+def test_set_backend_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        json_codec.set_backend('simplejson')
+
+
+def test_dumps_round_trips(backend):
+    value = {'a': [1, 2.5, None, True], 'b': {'nested': 'é'}}
+    assert json.loads(json_codec.dumps(value)) == value
+
+
+def test_dumps_falls_back_for_types_orjson_rejects(backend):
+    with pytest.raises(TypeError):
+        json_codec.dumps({'amount': Decimal('1.5')})
+
+
+def test_is_valid_json(backend):
+    assert json_codec.is_valid_json('{"a": 1}')
+    assert json_codec.is_valid_json('"text"')
+    assert not json_codec.is_valid_json('{"a": ')
+    assert not json_codec.is_valid_json('plain text')
+
+
+def test_json_column_conversion(backend):
+    assert json.loads(_convert_value_for_postgres({'k': 1}, 'jsonb')) == {'k': 1}
+    assert _convert_value_for_postgres('{"k": 1}', 'jsonb') == '{"k": 1}'
+    assert _convert_value_for_postgres('plain text', 'json') == '"plain text"'
+    # Trusted columns pass strings through for the server to validate
+    assert _convert_value_for_postgres('plain text', 'json', trust_json=True) == 'plain text'
@@ -0,0 +1,88 @@
+import pytest
+
+from pgsql_upserter.conflict_resolver import (
+    ConflictStrategy,
+    build_merge_sql,
+    choose_execution_strategy,
+)
+from pgsql_upserter.exceptions import PgsqlUpserterError
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+class FakeConnection:
+    def __init__(self, server_version: int):
+        self.server_version = server_version
+
+
+def key_strategy(columns: list[str]) -> ConflictStrategy:
+    return ConflictStrategy(type="USER_DEFINED", columns=columns, description="test")
+
+
+def test_on_conflict_when_an_arbiter_index_matches(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'])
+    assert choose_execution_strategy(FakeConnection(160000), schema, key_strategy(['id'])) == "ON_CONFLICT"
+
+
+def test_merge_without_arbiter_index_or_for_update_only_and_deletes(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'])
+    connection = FakeConnection(160000)
+    assert choose_execution_strategy(connection, schema, key_strategy(['v'])) == "MERGE"
+    assert choose_execution_strategy(connection, schema, key_strategy(['id']), update_only=True) == "MERGE"
+    assert choose_execution_strategy(connection, schema, key_strategy(['id']), delete_flag_column='_del') == "MERGE"
+
+
+def test_insert_only_never_uses_merge(make_schema):
+    schema = make_schema({'id': 'integer'})
+    strategy = ConflictStrategy(type="INSERT_ONLY", columns=[], description="test")
+    assert choose_execution_strategy(FakeConnection(160000), schema, strategy, update_only=True) == "ON_CONFLICT"
+
+
+def test_servers_before_15_fall_back_or_refuse(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'])
+    connection = FakeConnection(140000)
+    assert choose_execution_strategy(connection, schema, key_strategy(['v'])) == "ON_CONFLICT"
+    with pytest.raises(PgsqlUpserterError):
+        choose_execution_strategy(connection, schema, key_strategy(['id']), update_only=True)
+
+
+def test_merge_sql_clauses():
+    sql = build_merge_sql("staged", "metrics", ['id'], ['id', 'v', '_del'], delete_flag_column='_del')
+    assert "ON t.id = s.id" in sql
+    assert "WHEN MATCHED AND s._del THEN DELETE" in sql
+    assert "UPDATE SET v = s.v" in sql
+    assert "WHEN NOT MATCHED AND s._del IS NOT TRUE THEN INSERT (id, v) VALUES (s.id, s.v)" in sql
+
+
+def test_merge_sql_update_only_skips_inserts():
+    sql = build_merge_sql("staged", "metrics", ['id'], ['id', 'v'], update_only=True)
+    assert "NOT MATCHED" not in sql
+    with pytest.raises(PgsqlUpserterError):
+        build_merge_sql("staged", "metrics", ['id'], ['id'], update_only=True)
+
+
+@pytest.mark.db
+def test_merge_applies_updates_inserts_and_deletes(connection, execute):
+    execute("""
+        DROP TABLE IF EXISTS test_merge;
+        CREATE TABLE test_merge (acct int, day date, spend numeric);
+        INSERT INTO test_merge VALUES (1, '2025-01-01', 1), (2, '2025-01-01', 2), (3, '2025-01-01', 3);
+    """)
+    try:
+        rows = [
+            {'acct': 1, 'day': '2025-01-01', 'spend': 10},
+            {'acct': 2, 'day': '2025-01-01', 'spend': 20, '_del': True},
+            {'acct': 9, 'day': '2025-01-01', 'spend': 90},
+        ]
+        result = execute_upsert_workflow(connection, rows, 'test_merge', conflict_columns=['acct', 'day'],
+                                         delete_flag_column='_del')
+        assert result.execution_strategy == "MERGE"
+        assert (result.rows_inserted, result.rows_updated, result.rows_deleted) == (1, 1, 1)
+        assert execute("SELECT acct, spend::int FROM test_merge ORDER BY acct") == [(1, 10), (3, 3), (9, 90)]
+
+        result = execute_upsert_workflow(connection, [{'acct': 1, 'day': '2025-01-01', 'spend': 11},
+                                                      {'acct': 7, 'day': '2025-01-01', 'spend': 1}],
+                                         'test_merge', conflict_columns=['acct', 'day'], update_only=True)
+        assert (result.rows_inserted, result.rows_updated) == (0, 1)
+        assert execute("SELECT acct, spend::int FROM test_merge ORDER BY acct") == [(1, 11), (3, 3), (9, 90)]
+    finally:
+        execute("DROP TABLE IF EXISTS test_merge")
@@ -0,0 +1,43 @@
+import logging
+import subprocess
+import sys
+
+import pytest
+
+import pgsql_upserter
+
+
+def test_import_has_no_side_effects():
+    code = (
+        "import logging, sys; import pgsql_upserter; "
+        "print(sorted(m for m in sys.modules if m.startswith('pgsql_upserter.') or m == 'psycopg2')); "
+        "print(logging.getLogger('pgsql_upserter').handlers)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.splitlines() == ["['pgsql_upserter.exceptions']", "[<NullHandler (NOTSET)>]"]
+
+
+@pytest.mark.parametrize("name", pgsql_upserter.__all__)
+def test_public_names_resolve(name):
+    assert getattr(pgsql_upserter, name) is not None
+    assert name in dir(pgsql_upserter)
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        pgsql_upserter.not_a_name
+
+
+def test_configure_logging_installs_one_handler():
+    package_logger = logging.getLogger('pgsql_upserter')
+    handlers, level, propagate = list(package_logger.handlers), package_logger.level, package_logger.propagate
+    try:
+        pgsql_upserter.configure_logging(logging.DEBUG)
+        assert pgsql_upserter.configure_logging(logging.WARNING) is package_logger
+        console = [h for h in package_logger.handlers if getattr(h, '_pgsql_upserter', False)]
+        assert len(console) == 1 and console[0].level == logging.WARNING
+        assert not package_logger.propagate
+    finally:
+        package_logger.handlers[:] = handlers
+        package_logger.setLevel(level)
+        package_logger.propagate = propagate
@@ -0,0 +1,89 @@
+import uuid
+
+import psycopg2
+import pytest
+
+from pgsql_upserter.exceptions import PgsqlUpserterError
+from pgsql_upserter.partitioning import _routing_expression
+from pgsql_upserter.schema_inspector import PartitionInfo, inspect_table_schema
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+def test_routing_expression_numbers_partitions_in_order():
+    partitions = [
+        PartitionInfo('p1', 'public', "FOR VALUES IN (1)", "(id = 1)"),
+        PartitionInfo('p2', 'public', "DEFAULT", None),
+    ]
+    assert _routing_expression(partitions) == "CASE WHEN (id = 1) THEN 0 WHEN true THEN 1 END"
+
+
+@pytest.fixture
+def partitioned_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_parts CASCADE;
+        CREATE TABLE test_parts (date_start date, ad_id int, spend numeric, PRIMARY KEY (date_start, ad_id))
+            PARTITION BY RANGE (date_start);
+        CREATE TABLE test_parts_2025_01 PARTITION OF test_parts
+            FOR VALUES FROM ('2025-01-01') TO ('2025-02-01');
+        CREATE TABLE test_parts_2025_02 PARTITION OF test_parts
+            FOR VALUES FROM ('2025-02-01') TO ('2025-03-01') PARTITION BY LIST (ad_id);
+        CREATE TABLE test_parts_2025_02_a PARTITION OF test_parts_2025_02 FOR VALUES IN (1, 2);
+        CREATE TABLE test_parts_2025_02_b PARTITION OF test_parts_2025_02 DEFAULT;
+        INSERT INTO test_parts VALUES ('2025-01-05', 1, 1);
+    """)
+    yield 'test_parts'
+    execute("DROP TABLE IF EXISTS test_parts CASCADE")
+
+
+ROWS = [
+    {'date_start': '2025-01-05', 'ad_id': 1, 'spend': 9},
+    {'date_start': '2025-02-03', 'ad_id': 2, 'spend': 3},
+    {'date_start': '2025-02-03', 'ad_id': 7, 'spend': 4},
+    {'date_start': '2025-04-01', 'ad_id': 7, 'spend': 4},
+]
+
+
+@pytest.mark.db
+def test_schema_lists_leaf_partitions(connection, partitioned_table):
+    schema = inspect_table_schema(connection, partitioned_table)
+    assert (schema.partition_strategy, schema.partition_key) == ('range', ['date_start'])
+    assert [p.name for p in schema.partitions] == [
+        'test_parts_2025_01', 'test_parts_2025_02_a', 'test_parts_2025_02_b']
+
+
+@pytest.mark.db
+def test_rows_are_applied_per_leaf_partition(connection, execute, partitioned_table):
+    result = execute_upsert_workflow(connection, ROWS, partitioned_table, partition_routing=True)
+    assert (result.rows_inserted, result.rows_updated, result.rows_unroutable) == (2, 1, 1)
+    assert result.partition_rows == {
+        'public.test_parts_2025_01': 1, 'public.test_parts_2025_02_a': 1, 'public.test_parts_2025_02_b': 1}
+    assert execute("SELECT tableoid::regclass::text, ad_id, spend::int FROM test_parts ORDER BY 2, 1") == [
+        ('test_parts_2025_01', 1, 9), ('test_parts_2025_02_a', 2, 3), ('test_parts_2025_02_b', 7, 4)]
+
+    with pytest.raises(PgsqlUpserterError, match="fit no existing partition"):
+        execute_upsert_workflow(connection, ROWS, partitioned_table, partition_routing=True, on_unroutable='error')
+    assert execute("SELECT count(*) FROM pg_tables WHERE tablename LIKE 'pgsql_upserter_part%'") == [(0,)]
+
+
+@pytest.mark.db
+def test_parallel_and_durable_partition_applies(connection, dsn, execute, partitioned_table):
+    rows = [dict(row, spend=100) for row in ROWS[:3]] + [{'date_start': '2025-01-09', 'ad_id': 5, 'spend': 1}]
+    result = execute_upsert_workflow(connection, rows, partitioned_table, partition_routing=True,
+                                     partition_workers=2, connection_factory=lambda: psycopg2.connect(dsn),
+                                     lock_mode='bucket')
+    assert (result.rows_inserted, result.rows_updated) == (3, 1)
+
+    result = execute_upsert_workflow(connection, ROWS[:3], partitioned_table, partition_routing=True,
+                                     execution_strategy='merge', load_id=f"test-{uuid.uuid4().hex}")
+    assert (result.rows_inserted, result.rows_updated) == (0, 3)
+    assert execute("SELECT count(*), sum(spend)::int FROM test_parts") == [(4, 17)]
+
+
+@pytest.mark.db
+def test_routing_requires_a_partitioned_target(connection, execute):
+    execute("DROP TABLE IF EXISTS test_plain; CREATE TABLE test_plain (id int PRIMARY KEY)")
+    try:
+        with pytest.raises(ValueError, match="requires a partitioned target"):
+            execute_upsert_workflow(connection, [{'id': 1}], 'test_plain', partition_routing=True)
+    finally:
+        execute("DROP TABLE IF EXISTS test_plain")
@@ -0,0 +1,85 @@
+import datetime
+import decimal
+
+import psycopg2
+import pytest
+
+from pgsql_upserter.exceptions import PgsqlUpserterError, SchemaIntrospectionError
+from pgsql_upserter.pipeline import execute_pipelined_upsert
+from pgsql_upserter.plan_cache import build_plan, table_fingerprint
+from pgsql_upserter.schema_inspector import database_errors, inspect_table_schema
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+psycopg = pytest.importorskip("psycopg")
+
+
+def test_database_errors_of_non_psycopg2_connections_include_psycopg():
+    assert database_errors(object()) == (psycopg2.Error, psycopg.Error)
+
+
+@pytest.fixture
+def pipeline_connection(dsn, execute):
+    ddl = "(id int PRIMARY KEY, k text, d date, n numeric(10,2), j jsonb, arr int[], b boolean)"
+    execute(f"""
+        DROP TABLE IF EXISTS test_pipeline_a, test_pipeline_b, test_pipeline_log;
+        CREATE TABLE test_pipeline_a {ddl};
+        CREATE TABLE test_pipeline_b {ddl};
+        CREATE TABLE test_pipeline_log (a text, b int);
+        INSERT INTO test_pipeline_a (id, k) SELECT g, 'x' FROM generate_series(1, 5) g;
+        INSERT INTO test_pipeline_b (id, k) SELECT g, 'x' FROM generate_series(1, 5) g;
+    """)
+    conn = psycopg.connect(dsn)
+    yield conn
+    conn.close()
+    execute("DROP TABLE IF EXISTS test_pipeline_a, test_pipeline_b, test_pipeline_log")
+
+
+ROWS = [
+    {'id': str(i % 12) if i % 2 else i % 12, 'k': i if i % 3 else 'txt',
+     'd': '2024-01-02' if i % 2 else datetime.date(2024, 1, 3), 'n': decimal.Decimal('1.5') if i % 2 else '2.25',
+     'j': {'a': i}, 'arr': [1, 2], 'b': False}
+    for i in range(30)
+] + [{'id': None, 'k': 'null key'}]
+
+
+@pytest.mark.db
+def test_pipeline_matches_the_psycopg2_workflow(connection, execute, pipeline_connection):
+    expected = execute_upsert_workflow(connection, ROWS, 'test_pipeline_a', initial_load='never')
+    result = execute_pipelined_upsert(pipeline_connection, ROWS, 'test_pipeline_b', batch_size=7)
+    assert result.execution_strategy == 'PIPELINE'
+    assert (result.rows_inserted, result.rows_updated) == (expected.rows_inserted, expected.rows_updated) == (7, 5)
+    assert result.deduplication_result == expected.deduplication_result
+    assert execute("""
+        SELECT (SELECT array_agg(t ORDER BY id)::text FROM test_pipeline_a t)
+             = (SELECT array_agg(t ORDER BY id)::text FROM test_pipeline_b t)
+    """) == [(True,)]
+
+    result = execute_pipelined_upsert(pipeline_connection, [{'a': 'x', 'b': '1'}, {'a': 'x', 'b': 2}],
+                                      'test_pipeline_log')
+    assert (result.conflict_strategy_type, result.rows_inserted) == ('INSERT_ONLY', 2)
+
+
+@pytest.mark.db
+def test_pipeline_with_a_plan_and_after_a_failed_load(connection, pipeline_connection):
+    plan = build_plan(connection, 'test_pipeline_b')
+    connection.commit()
+    result = execute_pipelined_upsert(pipeline_connection, ROWS, 'test_pipeline_b', plan=plan)
+    assert (result.rows_inserted, result.rows_updated) == (7, 5)
+
+    with pytest.raises(PgsqlUpserterError, match="Pipelined upsert"):
+        execute_pipelined_upsert(pipeline_connection, [{'id': 1, 'd': 'not a date'}], 'test_pipeline_b')
+    result = execute_pipelined_upsert(pipeline_connection, [{'id': 1, 'k': 'after error'}], 'test_pipeline_b')
+    assert result.rows_updated == 1
+
+
+@pytest.mark.db
+def test_psycopg3_errors_are_wrapped(dsn):
+    with psycopg.connect(dsn) as conn:
+        with pytest.raises(psycopg.Error):
+            conn.execute("SELECT 1/0")
+        # The transaction is now aborted, so every query fails
+        with pytest.raises(SchemaIntrospectionError):
+            inspect_table_schema(conn, 'pg_class', 'pg_catalog')
+        with pytest.raises(PgsqlUpserterError):
+            table_fingerprint(conn, 'pg_class', 'pg_catalog')
+        assert table_fingerprint(conn, 'pg_class', 'pg_catalog') is not None
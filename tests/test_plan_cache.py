@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from pgsql_upserter.plan_cache import PLAN_FORMAT_VERSION, UpsertPlan, get_plan, load_plan, save_plan
+from pgsql_upserter.schema_inspector import UniqueIndex
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.fixture
+def plan(make_schema):
+    schema = make_schema({'id': 'integer', 'v': 'text'}, primary_key=['id'],
+                         unique_indexes=[UniqueIndex('metrics_pkey', ['id'], True, None, 8192)])
+    return UpsertPlan(table_schema=schema, fingerprint='abc', server_version=160000,
+                      temp_table_columns_sql="id integer, v text")
+
+
+def test_plan_file_round_trips(plan, tmp_path):
+    path = tmp_path / "metrics.plan.json"
+    save_plan(plan, path)
+    assert load_plan(path) == plan
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_missing_unreadable_or_outdated_plans_are_ignored(plan, tmp_path):
+    path = tmp_path / "metrics.plan.json"
+    assert load_plan(path) is None
+
+    path.write_text("{not json", encoding='utf-8')
+    assert load_plan(path) is None
+
+    save_plan(plan, path)
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['format_version'] = PLAN_FORMAT_VERSION - 1
+    path.write_text(json.dumps(data), encoding='utf-8')
+    assert load_plan(path) is None
+
+
+@pytest.mark.db
+def test_plan_is_rebuilt_when_the_table_changes(connection, execute, tmp_path):
+    path = tmp_path / "plan.json"
+    execute("DROP TABLE IF EXISTS test_plans; CREATE TABLE test_plans (id int PRIMARY KEY, v text)")
+    try:
+        first = get_plan(connection, 'test_plans', plan=path)
+        assert load_plan(path) == first
+        assert get_plan(connection, 'test_plans', plan=first) is first
+
+        execute("ALTER TABLE test_plans ADD COLUMN w int")
+        rebuilt = get_plan(connection, 'test_plans', plan=path)
+        assert rebuilt.fingerprint != first.fingerprint
+        assert 'w' in rebuilt.table_schema.valid_columns
+        assert load_plan(path) == rebuilt
+
+        result = execute_upsert_workflow(connection, [{'id': 1, 'v': 'a', 'w': 2}], 'test_plans', plan=path)
+        assert result.rows_inserted == 1
+    finally:
+        execute("DROP TABLE IF EXISTS test_plans")
@@ -0,0 +1,99 @@
+import decimal
+import json
+
+import pytest
+
+from pgsql_upserter import quarantine
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+ROWS = [
+    {'id': 1, 'd': '2025-01-01', 'amt': '1.5', 'name': 'a', 'tags': ['x'], 'meta': {'k': 1}},
+    {'id': 2, 'd': '2025-13-45', 'amt': '2', 'name': 'b'},
+    {'id': 3, 'd': '2025-01-02', 'amt': '-1', 'name': 'c'},
+    {'id': 4, 'd': '2025-01-02', 'amt': '1', 'name': None},
+    {'id': 5, 'd': '2025-01-02', 'amt': '1', 'name': 'toolongname'},
+    {'id': 'x6', 'd': None, 'amt': None, 'name': 'e'},
+    {'id': 1, 'd': '2025-02-01', 'amt': '3', 'name': 'a2'},
+]
+
+EXPECTED_REJECTS = [
+    (2, 'rejected_invalid_value', 'd: date/time field value out of range: "2025-13-45"'),
+    (3, 'rejected_check_constraint', 'violates check constraint test_quarantine_amt_check'),
+    (4, 'rejected_not_null', 'name: null value violates not-null constraint'),
+    (5, 'rejected_invalid_value', 'name: value too long for type character varying(5)'),
+    (6, 'rejected_invalid_value', 'id: invalid input syntax for type integer: "x6"'),
+]
+
+
+@pytest.fixture
+def quarantine_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_quarantine, test_quarantine_rejects;
+        CREATE TABLE test_quarantine (
+            id int PRIMARY KEY, d date, amt numeric(6,2) CHECK (amt >= 0), name varchar(5) NOT NULL,
+            tags text[], meta jsonb
+        );
+    """)
+    yield 'test_quarantine'
+    execute("DROP TABLE IF EXISTS test_quarantine, test_quarantine_rejects")
+
+
+@pytest.fixture(params=['pg_input_is_valid', 'cast_helper'])
+def validation(request, monkeypatch):
+    if request.param == 'cast_helper':
+        monkeypatch.setattr(quarantine, 'INPUT_VALIDATION_MIN_SERVER_VERSION', 10 ** 9)
+    return request.param
+
+
+@pytest.mark.db
+def test_bad_rows_are_rejected_and_the_rest_loaded(connection, execute, quarantine_table, validation, tmp_path):
+    native = connection.server_version >= quarantine.INPUT_VALIDATION_MIN_SERVER_VERSION
+    if validation == 'pg_input_is_valid' and not native:
+        pytest.skip("pg_input_is_valid needs PostgreSQL 16")
+    reject_file = tmp_path / "rejects.ndjson"
+    result = execute_upsert_workflow(connection, ROWS, quarantine_table, staging_mode='quarantine',
+                                     reject_table='test_quarantine_rejects', reject_file=reject_file)
+    assert (result.rows_inserted, result.rows_updated) == (1, 0)
+    assert result.deduplication_result.dropped_reasons == {
+        'duplicate_conflict_keys': 1, 'rejected_invalid_value': 3, 'rejected_not_null': 1,
+        'rejected_check_constraint': 1}
+    assert execute("SELECT id, d::text, amt, name FROM test_quarantine") == [
+        (1, '2025-02-01', decimal.Decimal('3.00'), 'a2')]
+
+    assert execute("""
+        SELECT row_number, reject_kind, reason FROM test_quarantine_rejects ORDER BY row_number
+    """) == EXPECTED_REJECTS
+    records = [json.loads(line) for line in reject_file.read_text(encoding='utf-8').splitlines()]
+    assert [(r['row_number'], r['reject_kind'], r['reason']) for r in records] == EXPECTED_REJECTS
+    assert records[0]['target_table'] == 'public.test_quarantine'
+    assert records[0]['row']['d'] == '2025-13-45'
+    assert execute("SELECT count(*) FROM pg_tables WHERE tablename LIKE '%raw%'") == [(0,)]
+
+
+@pytest.mark.db
+def test_check_constraints_with_quoted_names_and_percent_signs(connection, execute):
+    execute("""
+        DROP TABLE IF EXISTS test_quarantine_checks;
+        CREATE TABLE test_quarantine_checks (
+            id int PRIMARY KEY,
+            code text CONSTRAINT "code's prefix" CHECK (code LIKE 'A%'),
+            n int CHECK (n > 0)
+        );
+    """)
+    try:
+        rows = [{'id': 1, 'code': 'A1', 'n': 1}, {'id': 2, 'code': 'B1', 'n': 1},
+                {'id': 3, 'code': 'A2', 'n': 'x'}, {'id': 4, 'code': 'A3', 'n': 0}]
+        result = execute_upsert_workflow(connection, rows, 'test_quarantine_checks', staging_mode='quarantine')
+        assert result.rows_inserted == 1
+        assert result.deduplication_result.dropped_reasons == {
+            'rejected_check_constraint': 2, 'rejected_invalid_value': 1}
+    finally:
+        execute("DROP TABLE IF EXISTS test_quarantine_checks")
+
+
+def test_reject_options_require_quarantine_staging():
+    with pytest.raises(ValueError, match="require staging_mode='quarantine'"):
+        execute_upsert_workflow(None, [{'id': 1}], 'test_quarantine', reject_table='rejects')
+    with pytest.raises(ValueError, match="dry_run"):
+        execute_upsert_workflow(None, [{'id': 1}], 'test_quarantine', staging_mode='quarantine', dry_run=True,
+                                reject_file='rejects.ndjson')
@@ -0,0 +1,91 @@
+import gzip
+
+import pytest
+
+from pgsql_upserter.exceptions import PgsqlUpserterError
+from pgsql_upserter.readers import detect_file_format, iter_records
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("data.csv", ('csv', False)),
+    ("data.CSV.gz", ('csv', True)),
+    ("data.ndjson", ('ndjson', False)),
+    ("data.jsonl.gz", ('ndjson', True)),
+    ("export.2025.parquet", ('parquet', False)),
+    ("data.pq", ('parquet', False)),
+])
+def test_detect_file_format_from_extension(name, expected):
+    assert detect_file_format(name) == expected
+
+
+def test_unknown_extension_is_rejected():
+    with pytest.raises(PgsqlUpserterError, match="pass file_format explicitly"):
+        detect_file_format("data.txt")
+
+
+def test_json_files_are_ndjson_unless_they_hold_an_array(tmp_path):
+    lines = tmp_path / "lines.json"
+    lines.write_text('{"id": 1}\n{"id": 2}\n', encoding='utf-8')
+    assert detect_file_format(lines) == ('ndjson', False)
+
+    array = tmp_path / "array.json.gz"
+    with gzip.open(array, 'wt', encoding='utf-8') as f:
+        f.write('\ufeff\n  [{"id": 1}]')
+    with pytest.raises(PgsqlUpserterError, match="JSON array"):
+        detect_file_format(array)
+
+    # Unreadable files are reported by the reader, not while detecting
+    assert detect_file_format(tmp_path / "missing.json") == ('ndjson', False)
+
+
+def test_csv_records_stream_as_strings(tmp_path):
+    path = tmp_path / "data.csv.gz"
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        f.write('id,name\n1,"a, b"\n2,\n')
+    assert list(iter_records(path)) == [{'id': '1', 'name': 'a, b'}, {'id': '2', 'name': ''}]
+
+
+def test_ndjson_records_skip_blank_lines(tmp_path):
+    path = tmp_path / "data.ndjson"
+    path.write_text('{"id": 1, "tags": ["x"]}\n\n{"id": 2, "tags": null}\n', encoding='utf-8')
+    assert list(iter_records(path)) == [{'id': 1, 'tags': ['x']}, {'id': 2, 'tags': None}]
+
+
+def test_ndjson_errors_name_the_line(tmp_path):
+    path = tmp_path / "data.ndjson"
+    path.write_text('{"id": 1}\n{"id": \n', encoding='utf-8')
+    with pytest.raises(PgsqlUpserterError, match="line 2"):
+        list(iter_records(path))
+
+    path.write_text('{"id": 1}\n[1, 2]\n', encoding='utf-8')
+    with pytest.raises(PgsqlUpserterError, match="Line 2 .* not a JSON object"):
+        list(iter_records(path))
+
+
+def test_explicit_format_overrides_the_extension(tmp_path):
+    path = tmp_path / "export.txt"
+    path.write_text('{"id": 1}\n', encoding='utf-8')
+    assert list(iter_records(path, file_format='ndjson')) == [{'id': 1}]
+
+
+def test_parquet_records_stream_by_row_group(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "data.parquet"
+    pq.write_table(pa.table({'id': [1, 2, 3], 'name': ['a', None, 'c']}), path, row_group_size=2)
+    assert list(iter_records(path)) == [{'id': 1, 'name': 'a'}, {'id': 2, 'name': None}, {'id': 3, 'name': 'c'}]
+
+
+@pytest.mark.db
+def test_workflow_streams_a_file_path(connection, execute, tmp_path):
+    path = tmp_path / "data.ndjson.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.writelines(f'{{"id": {i}, "name": "n{i}"}}\n' for i in range(2500))
+    execute("DROP TABLE IF EXISTS test_readers; CREATE TABLE test_readers (id int PRIMARY KEY, name text)")
+    try:
+        result = execute_upsert_workflow(connection, path, 'test_readers', batch_size=1000)
+        assert result.rows_inserted == 2500
+        assert execute("SELECT count(*), max(name) FROM test_readers") == [(2500, 'n999')]
+    finally:
+        execute("DROP TABLE IF EXISTS test_readers")
@@ -0,0 +1,118 @@
+import pytest
+
+from pgsql_upserter.exceptions import ConcurrencyError, PgsqlUpserterError
+from pgsql_upserter.retry import RetryPolicy, retryable_sqlstate, run_with_retry
+
+
+class DatabaseError(Exception):
+    def __init__(self, pgcode: str | None):
+        super().__init__(f"SQLSTATE {pgcode}")
+        self.pgcode = pgcode
+
+
+class FakeCursor:
+    def __init__(self, statements: list[str]):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql: str) -> None:
+        self.statements.append(sql)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self.statements)
+
+    def rollback(self) -> None:
+        self.statements.append("ROLLBACK")
+
+
+class FlakyStep:
+    """Fails with the given SQLSTATEs, one per call, then returns 'done'."""
+
+    def __init__(self, *pgcodes: str):
+        self.pgcodes = list(pgcodes)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.pgcodes:
+            raise DatabaseError(self.pgcodes.pop(0))
+        return 'done'
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr('pgsql_upserter.retry.time.sleep', lambda seconds: None)
+
+
+def test_retryable_sqlstate_walks_the_exception_chain():
+    assert retryable_sqlstate(DatabaseError('40P01')) == '40P01'
+    assert retryable_sqlstate(DatabaseError('23505')) is None
+    assert retryable_sqlstate(ValueError('plain')) is None
+
+    try:
+        try:
+            raise DatabaseError('40001')
+        except DatabaseError as e:
+            raise PgsqlUpserterError("wrapped") from e
+    except PgsqlUpserterError as wrapped:
+        assert retryable_sqlstate(wrapped) == '40001'
+
+
+def test_policy_delay_is_bounded():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    assert all(0 <= policy.delay(attempt) <= 0.3 for attempt in range(1, 10))
+
+
+def test_retries_roll_back_the_transaction():
+    connection = FakeConnection()
+    step = FlakyStep('40P01', '40001')
+    assert run_with_retry(connection, step, RetryPolicy()) == ('done', 2)
+    assert connection.statements == ["ROLLBACK", "ROLLBACK"]
+
+
+def test_non_retryable_errors_propagate_unchanged():
+    connection = FakeConnection()
+    step = FlakyStep('23505')
+    with pytest.raises(DatabaseError):
+        run_with_retry(connection, step, RetryPolicy())
+    assert step.calls == 1
+    assert connection.statements == []
+
+
+def test_gives_up_after_max_attempts():
+    connection = FakeConnection()
+    step = FlakyStep('40P01', '40P01', '40P01')
+    with pytest.raises(ConcurrencyError, match="after 3 attempts"):
+        run_with_retry(connection, step, RetryPolicy(max_attempts=3))
+    assert step.calls == 3
+
+
+def test_savepoint_mode_retries_deadlocks_within_the_transaction():
+    connection = FakeConnection()
+    step = FlakyStep('40P01')
+    assert run_with_retry(connection, step, RetryPolicy(), savepoint=True) == ('done', 1)
+    assert connection.statements == [
+        "SAVEPOINT pgsql_upserter_retry",
+        "ROLLBACK TO SAVEPOINT pgsql_upserter_retry",
+        "SAVEPOINT pgsql_upserter_retry",
+        "RELEASE SAVEPOINT pgsql_upserter_retry",
+    ]
+
+
+def test_savepoint_mode_does_not_retry_serialization_failures():
+    connection = FakeConnection()
+    step = FlakyStep('40001')
+    with pytest.raises(ConcurrencyError, match="retry the whole transaction"):
+        run_with_retry(connection, step, RetryPolicy(), savepoint=True)
+    assert step.calls == 1
+    assert "ROLLBACK" not in connection.statements
@@ -0,0 +1,113 @@
+import re
+
+import psycopg2
+import pytest
+
+from pgsql_upserter.conflict_resolver import ConflictStrategy
+from pgsql_upserter.server_routine import ROUTINE_PREFIX, build_server_routine, drop_server_routines
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.fixture
+def schema(make_schema):
+    return make_schema({'id': 'integer', 'code': 'text', 'v': 'numeric'}, primary_key=['id'], table_name='metrics',
+                       schema_name='reporting')
+
+
+def pk_strategy(columns=('id',), predicate=None) -> ConflictStrategy:
+    return ConflictStrategy(type="PRIMARY_KEY", columns=list(columns), description="test", index_predicate=predicate)
+
+
+def test_routine_name_is_stable_per_target_key_and_columns(schema):
+    routine = build_server_routine(schema, pk_strategy(), ['id', 'v'])
+    assert re.fullmatch(rf"reporting\.{ROUTINE_PREFIX}[0-9a-f]{{16}}", routine.name)
+    assert routine.signature == f"{routine.name}(regclass)"
+    assert build_server_routine(schema, pk_strategy(), ['id', 'v']) == routine
+    assert build_server_routine(schema, pk_strategy(), ['id', 'v', 'code']).name != routine.name
+    assert build_server_routine(schema, pk_strategy(predicate="v > 0"), ['id', 'v']).name != routine.name
+
+
+def test_routine_deduplicates_upserts_and_counts(schema):
+    sql = build_server_routine(schema, pk_strategy(('id', 'code')), ['id', 'code', 'v']).create_sql
+    assert f"CREATE OR REPLACE FUNCTION reporting.{ROUTINE_PREFIX}" in sql
+    assert "SELECT DISTINCT ON (id, code) id, code, v" in sql
+    assert "ORDER BY id, code, ctid DESC" in sql
+    # Text keys also treat empty strings as NULL, like deduplicate_temp_table
+    assert "WHERE NOT (id IS NULL OR (code IS NULL OR code = ''))" in sql
+    assert "ON CONFLICT (id, code)" in sql
+    assert "RETURNING (xmax = 0) AS inserted" in sql
+
+
+def test_insert_only_routine_and_percent_signs(schema):
+    strategy = ConflictStrategy(type="INSERT_ONLY", columns=[], description="test")
+    sql = build_server_routine(schema, strategy, ['id', 'v']).create_sql
+    assert "DISTINCT ON" not in sql
+    assert "FROM %1$s" in sql
+
+    sql = build_server_routine(schema, pk_strategy(predicate="code LIKE 'a%'"), ['id', 'code']).create_sql
+    assert "LIKE 'a%%'" in sql
+
+
+@pytest.fixture
+def routine_schema(execute):
+    execute("""
+        DROP SCHEMA IF EXISTS test_routines CASCADE;
+        CREATE SCHEMA test_routines;
+        CREATE TABLE test_routines.metrics (id int PRIMARY KEY, v int);
+    """)
+    yield 'test_routines'
+    execute("DROP SCHEMA IF EXISTS test_routines CASCADE")
+
+
+ROWS = [{'id': i % 50, 'v': i} for i in range(100)] + [{'id': None, 'v': 0}]
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("single_transaction", [False, True])
+def test_routine_applies_like_the_statements(connection, execute, routine_schema, single_transaction):
+    result = execute_upsert_workflow(connection, ROWS[:60], 'metrics', schema=routine_schema, server_routine=True,
+                                     single_transaction=single_transaction)
+    assert result.execution_strategy == 'ROUTINE'
+    assert (result.rows_inserted, result.rows_updated) == (50, 0)
+
+    result = execute_upsert_workflow(connection, ROWS, 'metrics', schema=routine_schema, server_routine=True,
+                                     single_transaction=single_transaction)
+    assert (result.rows_inserted, result.rows_updated) == (0, 50)
+    assert result.deduplication_result.dropped_reasons == {
+        'null_or_empty_conflict_columns': 1, 'duplicate_conflict_keys': 50}
+    assert execute("SELECT min(v), max(v) FROM test_routines.metrics") == [(50, 99)]
+
+    assert drop_server_routines(connection, routine_schema) == 1
+    assert drop_server_routines(connection, routine_schema) == 0
+
+
+@pytest.mark.db
+def test_roles_that_cannot_install_fall_back_to_statements(connection, dsn, execute, routine_schema):
+    if not execute("SELECT rolsuper OR rolcreaterole FROM pg_roles WHERE rolname = current_user")[0][0]:
+        pytest.skip("creating a DML-only role needs CREATEROLE")
+    execute("""
+        DROP ROLE IF EXISTS pgsql_upserter_test_dml;
+        CREATE ROLE pgsql_upserter_test_dml LOGIN;
+        GRANT USAGE ON SCHEMA test_routines TO pgsql_upserter_test_dml;
+        GRANT SELECT, INSERT, UPDATE ON test_routines.metrics TO pgsql_upserter_test_dml;
+    """)
+    execute(execute("SELECT format('GRANT TEMP ON DATABASE %I TO pgsql_upserter_test_dml', current_database())")[0][0])
+    restricted = psycopg2.connect(dsn, user='pgsql_upserter_test_dml')
+    try:
+        for single_transaction in (False, True):
+            result = execute_upsert_workflow(restricted, ROWS, 'metrics', schema=routine_schema, server_routine=True,
+                                             single_transaction=single_transaction)
+            assert result.execution_strategy == 'ON_CONFLICT'
+            assert result.deduplication_result.deduplicated_count == 50
+            assert restricted.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+        # Once a privileged role installed the routine, the restricted one uses it
+        execute_upsert_workflow(connection, ROWS, 'metrics', schema=routine_schema, server_routine=True)
+        result = execute_upsert_workflow(restricted, ROWS, 'metrics', schema=routine_schema, server_routine=True)
+        assert result.execution_strategy == 'ROUTINE'
+    finally:
+        restricted.close()
+        execute("DROP SCHEMA IF EXISTS test_routines CASCADE")
+        execute(execute("SELECT format('REVOKE ALL ON DATABASE %I FROM pgsql_upserter_test_dml', "
+                        "current_database())")[0][0])
+        execute("DROP ROLE pgsql_upserter_test_dml")
@@ -0,0 +1,52 @@
+import pytest
+
+from pgsql_upserter.exceptions import PgsqlUpserterError
+from pgsql_upserter.session_tuning import PHASES, TUNING_PROFILES, apply_local_settings, resolve_profile
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+@pytest.mark.parametrize("name", sorted(TUNING_PROFILES))
+def test_named_profiles_resolve(name):
+    resolved = resolve_profile(name)
+    assert resolved == TUNING_PROFILES[name]
+    assert set(resolved) <= set(PHASES)
+
+
+def test_custom_profiles_are_stringified_and_empty_phases_dropped():
+    assert resolve_profile({'apply': {'work_mem': '32MB', 'jit': False}, 'staging': {}}) == {
+        'apply': {'work_mem': '32MB', 'jit': 'False'}}
+    assert resolve_profile(None) == {}
+
+
+def test_unknown_profiles_and_phases_are_rejected():
+    with pytest.raises(ValueError, match="Unknown session profile"):
+        resolve_profile('turbo')
+    with pytest.raises(ValueError, match="phases"):
+        resolve_profile({'commit': {'synchronous_commit': 'off'}})
+
+
+@pytest.mark.db
+def test_settings_are_local_to_the_transaction(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW work_mem")
+        before = cursor.fetchone()[0]
+    assert apply_local_settings(connection, {'work_mem': '77MB'}) == {'work_mem': '77MB'}
+    connection.commit()
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW work_mem")
+        assert cursor.fetchone()[0] == before
+
+    with pytest.raises(PgsqlUpserterError):
+        apply_local_settings(connection, {'work_mem': 'lots'})
+
+
+@pytest.mark.db
+def test_workflow_reports_the_applied_settings(connection, execute):
+    execute("DROP TABLE IF EXISTS test_tuning; CREATE TABLE test_tuning (id int PRIMARY KEY)")
+    try:
+        result = execute_upsert_workflow(connection, [{'id': 1}], 'test_tuning',
+                                         session_profile={'apply': {'work_mem': '48MB'}})
+        assert result.rows_inserted == 1
+        assert result.session_settings == {'apply': {'work_mem': '48MB'}}
+    finally:
+        execute("DROP TABLE IF EXISTS test_tuning")
@@ -0,0 +1,88 @@
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    commits = 0
+
+    def commit(self):
+        self.commits += 1
+        return super().commit()
+
+
+@pytest.fixture
+def counting_connection(dsn, execute):
+    execute("""
+        DROP TABLE IF EXISTS test_single;
+        CREATE TABLE test_single (id int PRIMARY KEY, a text, f boolean);
+        INSERT INTO test_single VALUES (0, 'x', false);
+    """)
+    conn = psycopg2.connect(dsn, connection_factory=CountingConnection)
+    yield conn
+    conn.close()
+    execute("DROP TABLE IF EXISTS test_single")
+
+
+def temp_tables(conn) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_class WHERE relpersistence = 't' AND relkind = 'r'")
+        count = cursor.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("staging_mode", ['values', 'pipelined', 'quarantine'])
+def test_staging_and_apply_share_one_transaction(counting_connection, execute, staging_mode):
+    rows = [{'id': i, 'a': staging_mode} for i in range(50)] + [{'id': 1, 'a': 'dup'}]
+    result = execute_upsert_workflow(counting_connection, rows, 'test_single', staging_mode=staging_mode,
+                                     single_transaction=True, session_profile='latency')
+    assert (result.rows_inserted, result.rows_updated) == (49, 1)
+    assert execute("SELECT count(*), count(DISTINCT xmin::text) FROM test_single") == [(50, 1)]
+    assert temp_tables(counting_connection) == 0
+
+
+@pytest.mark.db
+def test_commit_false_leaves_the_transaction_to_the_caller(counting_connection, execute):
+    with counting_connection.cursor() as cursor:
+        cursor.execute("INSERT INTO test_single VALUES (999, 'caller', false)")
+    result = execute_upsert_workflow(counting_connection, [{'id': 0, 'a': 'nc'}], 'test_single', commit=False)
+    assert result.rows_updated == 1
+    assert counting_connection.commits == 0
+    assert counting_connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    counting_connection.rollback()
+    assert execute("SELECT a FROM test_single ORDER BY id") == [('x',)]
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("options", [{}, {'single_transaction': True}, {'staging_mode': 'pipelined'}])
+def test_failing_input_leaves_no_transaction_or_temp_table(connection, execute, options):
+    execute("DROP TABLE IF EXISTS test_single_fail; CREATE TABLE test_single_fail (id int PRIMARY KEY, v text)")
+
+    def rows():
+        for i in range(5000):
+            if i == 3000:
+                raise RuntimeError("bad input")
+            yield {'id': i, 'v': str(i)}
+
+    try:
+        with pytest.raises(Exception):
+            execute_upsert_workflow(connection, rows(), 'test_single_fail', batch_size=500, **options)
+        assert connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        assert temp_tables(connection) == 0
+        assert execute("SELECT count(*) FROM test_single_fail") == [(0,)]
+    finally:
+        execute("DROP TABLE IF EXISTS test_single_fail")
+
+
+@pytest.mark.db
+def test_delete_flags_and_durable_staging(counting_connection):
+    result = execute_upsert_workflow(counting_connection, [{'id': 0, 'f': True}], 'test_single',
+                                     delete_flag_column='f', single_transaction=True)
+    assert result.rows_deleted == 1
+    with pytest.raises(ValueError):
+        execute_upsert_workflow(counting_connection, [{'id': 1}], 'test_single', single_transaction=True, load_id='x')
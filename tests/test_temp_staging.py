@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+from pgsql_upserter.temp_staging import _serialize_copy_chunk, _staged_boolean, iter_batches
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+ROWS = [
+    {'id': 1, 'name': 'tab\there', 'note': 'line\nbreak \\ slash', 'tags': ['a', 'b "q"', None],
+     'active': True, 'day': datetime.date(2025, 1, 2)},
+    {'id': 2, 'name': None, 'note': '', 'tags': [], 'active': 'false', 'day': '2025-01-03'},
+    {'id': 3, 'name': 'null', 'note': 'ok', 'tags': None, 'active': None, 'day': None},
+]
+
+COLUMN_TYPES = {'id': 'integer', 'name': 'text', 'note': 'text', 'tags': 'text[]', 'active': 'boolean', 'day': 'date'}
+
+
+def test_copy_chunk_escapes_text_and_renders_nulls():
+    block = _serialize_copy_chunk(ROWS, list(COLUMN_TYPES), COLUMN_TYPES).decode('utf-8')
+    lines = block.split('\n')
+    assert lines[-1] == ''
+    assert lines[0] == '1\ttab\\there\tline\\nbreak \\\\ slash\t{"a","b \\\\"q\\\\"",NULL}\tt\t2025-01-02'
+    assert lines[1].split('\t')[:3] == ['2', '\\N', '\\N']
+    assert lines[2].split('\t')[1] == '\\N'
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), ('t', True), ('TRUE', True), (' on ', True), ('ye', True), ('1', True), (1, True),
+    (False, False), ('f', False), ('No', False), ('of', False), ('0', False), (0, False),
+    (None, None), ('', None), ('null', None), ('o', None), ('maybe', None), (2, None), (1.0, None),
+])
+def test_staged_boolean_follows_postgres_boolean_input(value, expected):
+    assert _staged_boolean(value) is expected
+
+
+def test_iter_batches():
+    assert list(iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches([], 2)) == []
+
+
+@pytest.fixture
+def staging_table(execute):
+    execute("""
+        DROP TABLE IF EXISTS test_staging;
+        CREATE TABLE test_staging (id int PRIMARY KEY, name text, note text, tags text[], active boolean, day date)
+    """)
+    yield 'test_staging'
+    execute("DROP TABLE IF EXISTS test_staging")
+
+
+@pytest.mark.db
+@pytest.mark.parametrize("options", [
+    {'staging_mode': 'values'},
+    {'staging_mode': 'pipelined'},
+    {'staging_mode': 'pipelined', 'conversion_workers': 2},
+])
+def test_staging_modes_store_the_same_values(connection, execute, staging_table, options):
+    rows = ROWS + [{'id': i, 'name': f'n{i}'} for i in range(10, 2010)]
+    result = execute_upsert_workflow(connection, rows, staging_table, batch_size=500, **options)
+    assert result.rows_inserted == 2003
+    assert execute("SELECT id, name, note, tags, active, day FROM test_staging WHERE id < 10 ORDER BY id") == [
+        (1, 'tab\there', 'line\nbreak \\ slash', ['a', 'b "q"', None], True, datetime.date(2025, 1, 2)),
+        (2, None, None, [], False, datetime.date(2025, 1, 3)),
+        (3, None, 'ok', None, None, None),
+    ]
@@ -0,0 +1,94 @@
+import math
+
+import psycopg2.extensions
+import pytest
+
+from pgsql_upserter import throttle as throttle_module
+from pgsql_upserter.deadline import DeadlinePolicy
+from pgsql_upserter.throttle import LoadSample, Throttle, ThrottlePolicy, sample_load
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+
+POLICY = ThrottlePolicy(max_replay_lag_seconds=10, max_replay_lag_bytes=1000, max_active_backends=4,
+                        pause_seconds=1, max_pause_seconds=5)
+
+
+def sample(lag_seconds=None, lag_bytes=None, active_backends=0) -> LoadSample:
+    return LoadSample(lag_seconds, lag_bytes, active_backends)
+
+
+class Samples(list):
+    sleeps: list[float]
+
+
+@pytest.fixture
+def samples(monkeypatch):
+    """Samples returned by sample_load, in order; sleeps are recorded instead of taken."""
+    queue = Samples()
+    queue.sleeps = []
+    monkeypatch.setattr(throttle_module, 'sample_load', lambda connection: queue.pop(0))
+    monkeypatch.setattr(throttle_module.time, 'sleep', queue.sleeps.append)
+    return queue
+
+
+def test_pressure_is_the_largest_ratio_of_the_checked_metrics():
+    throttle = Throttle(None, POLICY)
+    assert throttle.pressure(sample(5, 100, 1)) == 0.5
+    assert throttle.pressure(sample(None, 2000, 1)) == 2.0
+    assert throttle.pressure(sample()) == 0.0
+
+    throttle = Throttle(None, ThrottlePolicy(max_replay_lag_seconds=None, max_active_backends=0))
+    assert throttle.pressure(sample(1000, 10 ** 9, 0)) == 0.0
+    assert throttle.pressure(sample(1000, 10 ** 9, 1)) == math.inf
+
+
+def test_scale_shrinks_over_a_limit_and_grows_back_with_headroom(samples):
+    throttle = Throttle(None, ThrottlePolicy(max_active_backends=4, pause_seconds=0, min_scale=0.3))
+    samples.extend([sample(active_backends=n) for n in (1, 4, 8, 3, 1, 1, 1)])
+    scales = [throttle.before_chunk() for _ in range(7)]
+    assert scales == pytest.approx([1.0, 0.5, 0.3, 0.3, 0.45, 0.675, 1.0])
+    assert [decision.action for decision in throttle.decisions] == [
+        'hold', 'shrink', 'shrink', 'hold', 'grow', 'grow', 'grow']
+    assert samples.sleeps == []
+
+
+def test_pauses_until_the_pressure_drops(samples):
+    throttle = Throttle(None, POLICY)
+    samples.extend([sample(lag_seconds=30), sample(lag_seconds=12), sample(lag_seconds=2)])
+    assert throttle.before_chunk() == 0.5
+    decision = throttle.decisions[0]
+    assert (decision.action, decision.pressure, decision.paused_seconds) == ('pause', 3.0, 2)
+    assert decision.sample == sample(lag_seconds=30)
+    assert samples.sleeps == [1, 1]
+    assert throttle.paused_seconds == 2
+
+
+@pytest.mark.parametrize("max_wait, paused", [(math.inf, 5), (2.5, 2), (0.5, 0)])
+def test_pauses_are_bounded_by_policy_and_caller(samples, max_wait, paused):
+    throttle = Throttle(None, POLICY)
+    samples.extend([sample(active_backends=10)] * 10)
+    throttle.before_chunk(max_wait=max_wait)
+    assert throttle.decisions[0].paused_seconds == paused
+    assert throttle.decisions[0].action == ('pause' if paused else 'shrink')
+
+
+@pytest.mark.db
+def test_sample_load_ends_its_transaction(connection):
+    load = sample_load(connection)
+    assert load.active_backends >= 0
+    assert connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+@pytest.mark.db
+def test_throttled_workflow_records_a_decision_per_chunk(connection, execute):
+    execute("DROP TABLE IF EXISTS test_throttle; CREATE TABLE test_throttle (id int PRIMARY KEY, v int)")
+    try:
+        result = execute_upsert_workflow(
+            connection, [{'id': i, 'v': i} for i in range(1000)], 'test_throttle',
+            throttle_policy=ThrottlePolicy(max_active_backends=10 ** 6), deadline=60,
+            deadline_policy=DeadlinePolicy(initial_chunk_rows=300, max_growth=1))
+        assert (result.rows_inserted, result.chunks_committed) == (1000, 4)
+        assert [decision.action for decision in result.throttle_decisions] == ['hold'] * 4
+        assert result.throttle_wait_seconds == 0
+        assert execute("SELECT count(*) FROM test_throttle") == [(1000,)]
+    finally:
+        execute("DROP TABLE IF EXISTS test_throttle")
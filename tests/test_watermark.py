@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from pgsql_upserter.upsert_engine import execute_upsert_workflow
+from pgsql_upserter.watermark import WatermarkFilter, _coerce_like, read_watermarks
+
+UTC = timezone.utc
+
+
+def test_coerce_like_converts_to_the_watermark_type():
+    assert _coerce_like('2025-01-02T03:04:05', datetime(2025, 1, 1)) == datetime(2025, 1, 2, 3, 4, 5)
+    assert _coerce_like(date(2025, 1, 2), datetime(2025, 1, 1)) == datetime(2025, 1, 2)
+    # Naive values take the time zone of a timestamptz watermark
+    assert _coerce_like('2025-01-02 00:00', datetime(2025, 1, 1, tzinfo=UTC)) == datetime(2025, 1, 2, tzinfo=UTC)
+    assert _coerce_like('2025-01-02T10:00:00', date(2025, 1, 1)) == date(2025, 1, 2)
+    assert _coerce_like('1.5', Decimal('1')) == Decimal('1.5')
+    assert _coerce_like(7, 3) == Decimal('7')
+    assert _coerce_like('x', 'y') == 'x'
+
+
+def test_rows_at_or_below_the_watermark_are_skipped():
+    watermark_filter = WatermarkFilter({(): date(2025, 1, 10)}, 'day')
+    rows = [{'day': '2025-01-09'}, {'day': '2025-01-10'}, {'day': '2025-01-11'}, {'day': None},
+            {'day': ''}, {'day': 'not a date'}, {}]
+    assert list(watermark_filter.filter(rows)) == rows[2:]
+    assert watermark_filter.rows_skipped == 2
+
+
+def test_lookback_and_delete_flags():
+    watermark_filter = WatermarkFilter({(): datetime(2025, 1, 10, tzinfo=UTC)}, 'updated_at',
+                                       lookback=timedelta(days=2), delete_flag_column='_del')
+    assert watermark_filter.is_loaded({'updated_at': '2025-01-08T00:00:00+00:00'})
+    assert not watermark_filter.is_loaded({'updated_at': '2025-01-09T00:00:00+00:00'})
+    assert not watermark_filter.is_loaded({'updated_at': '2025-01-01T00:00:00+00:00', '_del': True})
+    for flag in ('true', 'T', ' yes ', '1', 1):
+        assert not watermark_filter.is_loaded({'updated_at': '2025-01-01T00:00:00+00:00', '_del': flag})
+    for flag in (False, 'false', 'f', '0', 'o', ''):
+        assert watermark_filter.is_loaded({'updated_at': '2025-01-01T00:00:00+00:00', '_del': flag})
+
+    numeric_filter = WatermarkFilter({(): 100}, 'version', lookback=10)
+    assert numeric_filter.is_loaded({'version': '90'})
+    assert not numeric_filter.is_loaded({'version': 91.5})
+
+
+def test_lookback_must_match_the_watermark_type():
+    with pytest.raises(ValueError, match="use a timedelta"):
+        WatermarkFilter({(): datetime(2025, 1, 10)}, 'updated_at', lookback=3)
+    with pytest.raises(ValueError):
+        WatermarkFilter({(): 100}, 'version', lookback=timedelta(days=1))
+
+
+def test_scoped_watermarks_use_staged_key_text(make_schema):
+    schema = make_schema({'account_id': 'integer', 'day': 'date'})
+    watermarks = {('1',): date(2025, 1, 10), ('2',): date(2025, 1, 5)}
+    watermark_filter = WatermarkFilter(watermarks, 'day', scope_columns=['account_id'], table_schema=schema)
+    assert watermark_filter.is_loaded({'account_id': '1', 'day': '2025-01-07'})
+    assert watermark_filter.is_loaded({'account_id': 2, 'day': date(2025, 1, 5)})
+    assert not watermark_filter.is_loaded({'account_id': 2, 'day': '2025-01-07'})
+    # Scopes the target has no rows for, or with a NULL scope value, are always staged
+    assert not watermark_filter.is_loaded({'account_id': 3, 'day': '2000-01-01'})
+    assert not watermark_filter.is_loaded({'account_id': None, 'day': '2000-01-01'})
+
+
+@pytest.mark.db
+def test_incremental_load_skips_loaded_rows(connection, execute, make_schema):
+    execute("""
+        DROP TABLE IF EXISTS test_watermark;
+        CREATE TABLE test_watermark (account_id int, day date, spend numeric, UNIQUE (account_id, day));
+        INSERT INTO test_watermark VALUES (1, '2025-01-10', 1), (2, '2025-01-05', 1), (NULL, '2025-01-20', 1);
+    """)
+    try:
+        schema = make_schema({'account_id': 'integer', 'day': 'date', 'spend': 'numeric'})
+        assert read_watermarks(connection, 'test_watermark', 'day', ['account_id'], table_schema=schema) == {
+            ('1',): date(2025, 1, 10), ('2',): date(2025, 1, 5)}
+
+        rows = [{'account_id': account, 'day': f'2025-01-{day:02d}', 'spend': 2}
+                for account in (1, 2, 3) for day in range(1, 13)]
+        result = execute_upsert_workflow(connection, rows, 'test_watermark', watermark_column='day',
+                                         watermark_scope=['account_id'], watermark_lookback=timedelta(days=1))
+        assert result.rows_skipped_watermark == 9 + 4
+        assert (result.rows_inserted, result.rows_updated) == (21, 2)
+    finally:
+        execute("DROP TABLE IF EXISTS test_watermark")